@@ -41,6 +41,7 @@ let prevReq = null;
 let prevTok = null;
 let availableModels = [];
 let suppressSelectionSync = false;
+let stateStreamOpen = false;
 
 function escHtml(s) {
   return String(s ?? "")
@@ -235,6 +236,20 @@ function renderOtherUsers(items) {
     .join("")}</div>`;
 }
 
+// Top models across all users, counted by the state service as selections
+// change; older state services without the endpoint just leave the pill as is.
+async function loadModelPopularity() {
+  const pill = document.getElementById("popular-models-pill");
+  let stats;
+  try {
+    stats = await (await stateFetch("/selections/stats?limit=3")).json();
+  } catch {
+    return;
+  }
+  const top = (stats.models || []).map((item) => `${item.model} (${fmtNum(item.users)})`);
+  pill.textContent = `Most selected: ${top.length ? top.join(", ") : "none"}`;
+}
+
 async function loadSharedState() {
   const catalogPill = document.getElementById("catalog-status-pill");
   const selectionPill = document.getElementById("my-selection-pill");
@@ -270,6 +285,7 @@ async function loadSharedState() {
     suppressSelectionSync = false;
 
     renderOtherUsers(others.items || []);
+    loadModelPopularity();
   } catch {
     catalogPill.textContent = "Catalog: unavailable";
     selectionPill.textContent = "My selection: unavailable";
@@ -277,6 +293,28 @@ async function loadSharedState() {
   }
 }
 
+function subscribeStateStream() {
+  if (!stateServiceConfigured() || typeof EventSource === "undefined") return;
+  const source = new EventSource("/api/state/stream");
+  let pending = null;
+  const reload = () => {
+    if (pending) return;
+    pending = setTimeout(() => {
+      pending = null;
+      loadSharedState();
+    }, 250);
+  };
+
+  source.addEventListener("open", () => {
+    stateStreamOpen = true;
+    reload();
+  });
+  source.addEventListener("error", () => {
+    stateStreamOpen = false;
+  });
+  ["catalog", "selection", "reset"].forEach((type) => source.addEventListener(type, reload));
+}
+
 async function fetchHealth() {
   try {
     const resp = await apiFetch("/health");
@@ -335,7 +373,54 @@ function parsePrometheus(text) {
   return metrics;
 }
 
+function timeLabel(date) {
+  return date.toLocaleTimeString([], { hour: "2-digit", minute: "2-digit", second: "2-digit" });
+}
+
+function setHistory(history, chart, labels, values) {
+  if (!chart) return;
+  history.labels.splice(0, history.labels.length, ...labels.slice(-MAX_POINTS));
+  history.datasets[0].data.splice(0, history.datasets[0].data.length, ...values.slice(-MAX_POINTS));
+  chart.update("none");
+}
+
+function renderMetricTotals(totalReq, totalTok, totalErr) {
+  document.getElementById("req-val").textContent = fmtNum(totalReq);
+  document.getElementById("tok-val").textContent = fmtNum(totalTok);
+  document.getElementById("err-val").textContent = fmtNum(totalErr);
+  document.getElementById("err-val").className = `value ${totalErr > 0 ? "health-err" : ""}`;
+}
+
+// Totals and per-scrape deltas aggregated by the state service, which scrapes
+// the gateway once per interval for every dashboard. Returns false when it has
+// no summary to offer, so the caller can fall back to parsing /metrics here.
+async function fetchMetricsSummary() {
+  if (!stateServiceConfigured()) return false;
+  let summary;
+  try {
+    summary = await (await stateFetch("/metrics/summary")).json();
+  } catch {
+    return false;
+  }
+  if (!summary.totals) return false;
+
+  const { requests, tokens, errors } = summary.totals;
+  renderMetricTotals(requests, tokens, errors);
+
+  const points = summary.history || [];
+  const labels = points.map((point) => timeLabel(new Date(point.at)));
+  setHistory(reqHistory, reqChart, labels, points.map((point) => point.requests));
+  setHistory(tokHistory, tokChart, labels, points.map((point) => point.tokens));
+
+  const latest = points[points.length - 1];
+  const every = `per ${summary.interval_seconds}s scrape`;
+  document.getElementById("req-sub").textContent = `+${fmtNum(latest?.requests ?? 0)} ${every}`;
+  document.getElementById("tok-sub").textContent = `+${fmtNum(latest?.tokens ?? 0)} ${every}`;
+  return true;
+}
+
 async function fetchMetrics() {
+  if (await fetchMetricsSummary()) return;
   try {
     const resp = await apiFetch("/metrics");
     const text = await resp.text();
@@ -348,16 +433,9 @@ async function fetchMetrics() {
       (m["litellm_input_tokens"] ?? 0) + (m["litellm_output_tokens"] ?? 0);
     const totalErr = m["litellm_llm_api_failed_requests_metric_total"] ?? 0;
 
-    document.getElementById("req-val").textContent = fmtNum(totalReq);
-    document.getElementById("tok-val").textContent = fmtNum(totalTok);
-    document.getElementById("err-val").textContent = fmtNum(totalErr);
-    document.getElementById("err-val").className = `value ${totalErr > 0 ? "health-err" : ""}`;
+    renderMetricTotals(totalReq, totalTok, totalErr);
 
-    const label = new Date().toLocaleTimeString([], {
-      hour: "2-digit",
-      minute: "2-digit",
-      second: "2-digit",
-    });
+    const label = timeLabel(new Date());
     const deltaReq = prevReq !== null ? Math.max(0, totalReq - prevReq) : 0;
     const deltaTok = prevTok !== null ? Math.max(0, totalTok - prevTok) : 0;
 
@@ -430,7 +508,8 @@ function fmtNum(n) {
 
 async function refresh() {
   await Promise.allSettled([fetchHealth(), fetchModels(), fetchMetrics(), fetchLogs()]);
-  await loadSharedState();
+  // Shared state arrives over the change stream while it is connected.
+  if (!stateStreamOpen) await loadSharedState();
   document.getElementById("last-updated").textContent =
     `Last updated: ${new Date().toLocaleTimeString()}`;
 }
@@ -471,6 +550,7 @@ document.addEventListener("DOMContentLoaded", () => {
 
   updateModelSelectionState();
   refresh();
+  subscribeStateStream();
 
   setInterval(() => {
     if (document.getElementById("auto-refresh-cb").checked) refresh();
@@ -72,6 +72,7 @@ module "state_service" {
   resource_group_name          = module.aigateway.resource_group_name
   container_image              = var.state_service_container_image
   external_enabled             = var.state_service_external_enabled
+  gateway_metrics_url          = "${module.aigateway.gateway_url}/metrics"
   redis_url                    = var.enable_redis_cache ? format("rediss://:%s@%s:6380/0", module.aigateway.redis_primary_access_key, module.aigateway.redis_hostname) : ""
   state_service_shared_token   = var.state_service_shared_token
   registry_username            = var.state_service_registry_username
@@ -78,7 +78,7 @@ resource "azurerm_container_app" "state_service" {
 
       readiness_probe {
         transport = "HTTP"
-        path      = "/healthz"
+        path      = "/readyz"
         port      = 8080
       }
 
@@ -92,6 +92,16 @@ resource "azurerm_container_app" "state_service" {
         value = var.redis_url
       }
 
+      env {
+        name  = "REDIS_CLUSTER"
+        value = var.redis_cluster ? "1" : "0"
+      }
+
+      env {
+        name  = "GATEWAY_METRICS_URL"
+        value = var.gateway_metrics_url
+      }
+
       dynamic "env" {
         for_each = local.use_shared_token ? [1] : []
         content {
@@ -47,6 +47,18 @@ variable "redis_url" {
   sensitive   = true
 }
 
+variable "redis_cluster" {
+  type        = bool
+  description = "Connect to redis_url with the Redis Cluster client and hash-tagged keys (run the cluster-keyspace migration first)"
+  default     = false
+}
+
+variable "gateway_metrics_url" {
+  type        = string
+  description = "Optional gateway /metrics URL to scrape for /state/metrics/summary (empty = disabled)"
+  default     = ""
+}
+
 variable "state_key_prefix" {
   type        = string
   description = "Namespace prefix for state keys"
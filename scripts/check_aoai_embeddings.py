@@ -1,9 +1,65 @@
 #!/usr/bin/env python3
+"""Find which Azure OpenAI embedding deployments answer, and how fast they can go.
+
+Without options, lists deployments and models on every endpoint and sends
+one-input smoke requests to the preferred and every embedding-looking
+deployment, then ranks the healthy ones by median latency. Endpoints are
+discovered and probed concurrently over one keep-alive pool, at most
+--per-endpoint-concurrency requests in flight and --per-endpoint-rate request
+starts per second per endpoint, and the whole run stops at --deadline.
+
+Endpoints come from --endpoint (repeatable), AZURE_OPENAI_ENDPOINTS
+(comma-separated) or AZURE_OPENAI_ENDPOINT. AZURE_OPENAI_API_KEYS may list
+one key per endpoint in the same order; otherwise AZURE_OPENAI_API_KEY is
+used for all of them.
+
+Options:
+  --samples N              Smoke requests per deployment (default 3)
+  --deadline S             Stop discovery after S seconds (default 60)
+  --benchmark              Sweep batch size, input length and concurrency against
+                           AZURE_OPENAI_EMBEDDING_DEPLOYMENT (or --deployment) on
+                           the first endpoint and
+                           report latency percentiles, embeddings/sec, tokens/sec
+                           and the throughput-optimal batch size. 429s are retried
+                           after Retry-After and count against throughput
+  --gateway                Also benchmark through the gateway (GATEWAY_URL, AIGATEWAY_KEY)
+  --batch-sizes 1,16,...   Inputs per request (1 to 2048)
+  --input-tokens 16,256    Approximate tokens per input
+  --concurrency 1,4        Requests in flight
+  --rounds N               Requests per in-flight slot per cell (default 3)
+  --format json            Print one JSON document instead of the text report, in
+                           discovery and --benchmark mode alike
+  --mock                   Run against scripts/mock_openai_server.py
+
+Usage:
+  python3 scripts/check_aoai_embeddings.py
+  python3 scripts/check_aoai_embeddings.py --endpoint https://eastus... --endpoint https://swedencentral...
+  python3 scripts/check_aoai_embeddings.py --benchmark --gateway --batch-sizes 16,256,1024
+"""
+import argparse
+import asyncio
 import json
 import os
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
 from pathlib import Path
-from urllib import error, request
+from urllib import parse
+
+from embedding_bench import (
+    Target,
+    embedding_dimension,
+    optimal_batches,
+    post_embeddings,
+    print_cell,
+    print_header,
+    print_optimal,
+    sweep,
+)
+from http_pool import HTTPPool, percentile
+
+MAX_BATCH_SIZE = 2048
 
 
 def load_dotenv(path: Path) -> None:
@@ -20,34 +76,6 @@ def load_dotenv(path: Path) -> None:
             os.environ[key] = value
 
 
-def http_json(method: str, url: str, api_key: str, payload: dict | None = None):
-    body = None
-    headers = {
-        "api-key": api_key,
-    }
-    if payload is not None:
-        body = json.dumps(payload).encode("utf-8")
-        headers["Content-Type"] = "application/json"
-
-    req = request.Request(url=url, method=method, data=body, headers=headers)
-    try:
-        with request.urlopen(req, timeout=30) as resp:
-            text = resp.read().decode("utf-8", errors="replace")
-            try:
-                return resp.status, json.loads(text)
-            except json.JSONDecodeError:
-                return resp.status, {"raw": text}
-    except error.HTTPError as exc:
-        text = exc.read().decode("utf-8", errors="replace")
-        try:
-            data = json.loads(text)
-        except json.JSONDecodeError:
-            data = {"raw": text}
-        return exc.code, data
-    except Exception as exc:  # noqa: BLE001
-        return 0, {"error": str(exc)}
-
-
 def get_message(data: dict) -> str:
     if not isinstance(data, dict):
         return str(data)
@@ -59,100 +87,427 @@ def get_message(data: dict) -> str:
     return str(data)
 
 
-def main() -> int:
-    root = Path(__file__).resolve().parents[1]
-    load_dotenv(root / ".env.local")
-
-    endpoint = os.getenv("AZURE_OPENAI_ENDPOINT", "").rstrip("/")
-    api_key = os.getenv("AZURE_OPENAI_API_KEY", "")
-    api_version = os.getenv("AZURE_OPENAI_API_VERSION", "2023-05-15")
-    preferred = os.getenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT", "text-embedding-3-large")
+def int_list(value: str) -> list[int]:
+    try:
+        items = sorted({int(item) for item in value.split(",") if item.strip()})
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected comma-separated integers, got '{value}'") from None
+    if not items or items[0] < 1:
+        raise argparse.ArgumentTypeError(f"expected positive integers, got '{value}'")
+    return items
 
-    if not endpoint:
-        print("Missing AZURE_OPENAI_ENDPOINT")
-        return 1
-    if not api_key:
-        print("Missing AZURE_OPENAI_API_KEY (set it in .env.local)")
-        return 1
 
-    print(f"Endpoint: {endpoint}")
-    print(f"API version (embeddings): {api_version}")
-    print(f"Preferred embedding deployment: {preferred}")
-    print()
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Azure OpenAI embedding deployment probe and benchmark")
+    parser.add_argument("--endpoint", action="append", default=[], help="Azure OpenAI endpoint (repeatable)")
+    parser.add_argument("--samples", type=int, default=3, help="smoke requests per deployment")
+    parser.add_argument("--deadline", type=float, default=60.0, help="seconds for the whole discovery run")
+    parser.add_argument("--timeout", type=float, default=30.0, help="seconds per request")
+    parser.add_argument("--per-endpoint-concurrency", type=int, default=4)
+    parser.add_argument("--per-endpoint-rate", type=float, default=10.0, help="request starts/sec (0: unlimited)")
+    parser.add_argument("--benchmark", action="store_true", help="sweep batch size / input length / concurrency")
+    parser.add_argument("--deployment", help="deployment to benchmark (default: preferred deployment)")
+    parser.add_argument("--gateway", action="store_true", help="also benchmark through the LiteLLM gateway")
+    parser.add_argument("--batch-sizes", type=int_list, default=[1, 16, 128, 512, 2048])
+    parser.add_argument("--input-tokens", type=int_list, default=[16, 256])
+    parser.add_argument("--concurrency", type=int_list, default=[1, 4])
+    parser.add_argument("--rounds", type=int, default=3, help="requests per in-flight slot per cell")
+    parser.add_argument("--max-retries", type=int, default=5, help="429 retries per request")
+    parser.add_argument(
+        "--max-request-tokens", type=int, default=300_000, help="skip cells with more input tokens per request"
+    )
+    parser.add_argument("--dimensions", type=int, help="expected vector length (default: from the smoke request)")
+    parser.add_argument("--format", choices=("text", "json"), default="text")
+    parser.add_argument("--mock", action="store_true", help="run against a local mock server")
+    parser.add_argument("--mock-latency-ms", type=float, default=20.0)
+    parser.add_argument("--mock-embedding-tps", type=int, default=0, help="mock token quota per second (0: none)")
+    args = parser.parse_args()
+    if args.batch_sizes[-1] > MAX_BATCH_SIZE:
+        parser.error(f"--batch-sizes: at most {MAX_BATCH_SIZE} inputs per request")
+    return args
 
-    candidates = []
 
-    dep_url = f"{endpoint}/openai/deployments?api-version=2023-03-15-preview"
-    dep_code, dep_data = http_json("GET", dep_url, api_key)
-    print(f"Deployments API: HTTP {dep_code}")
+def benchmark(args: argparse.Namespace, endpoint: str, api_key: str, api_version: str, deployment: str) -> int:
+    text = args.format == "text"
+    targets = [
+        Target(
+            "direct",
+            f"{endpoint}/openai/deployments/{deployment}/embeddings?api-version={api_version}",
+            {"api-key": api_key},
+            {},
+        )
+    ]
+    if args.gateway:
+        gateway_url = os.getenv("GATEWAY_URL", "").rstrip("/")
+        gateway_key = os.getenv("AIGATEWAY_KEY", "")
+        if not gateway_url or not gateway_key:
+            print("--gateway needs GATEWAY_URL and AIGATEWAY_KEY")
+            return 1
+        auth_header = gateway_key if gateway_key.lower().startswith("bearer ") else f"Bearer {gateway_key}"
+        targets.append(
+            Target("gateway", f"{gateway_url}/v1/embeddings", {"Authorization": auth_header}, {"model": deployment})
+        )
 
-    if dep_code == 200 and isinstance(dep_data, dict):
-        dep_items = dep_data.get("data") or dep_data.get("value") or []
-        for item in dep_items:
-            if not isinstance(item, dict):
+    pool = HTTPPool(timeout=120.0)
+    checked: list[tuple[Target, int | None]] = []
+    smoke: dict[str, dict] = {}
+    try:
+        for target in targets:
+            code, data, _, _ = post_embeddings(pool, target.url, target.headers, dict(target.extra, input="smoke test"))
+            dimension = embedding_dimension(data) if 200 <= code < 300 else None
+            smoke[target.name] = {"status": code, "dimension": dimension}
+            if dimension is None:
+                reason = get_message(data)
+                smoke[target.name]["error"] = reason
+                if text:
+                    print(f"- {target.name}: HTTP {code} (FAIL), skipping benchmark: {reason}")
                 continue
-            deployment_name = item.get("id") or item.get("name") or ""
-            model_name = item.get("model")
-            if isinstance(model_name, dict):
-                model_name = model_name.get("name") or ""
-            if not isinstance(model_name, str):
-                model_name = ""
-
-            if deployment_name:
-                print(f"- deployment={deployment_name} model={model_name or 'unknown'}")
-
-            text = f"{deployment_name} {model_name}".lower()
-            if "embedding" in text:
-                candidates.append(deployment_name)
-    else:
-        print(f"Deployments API error: {get_message(dep_data)}")
+            if args.dimensions and dimension != args.dimensions:
+                smoke[target.name]["error"] = f"dimension {dimension} != expected {args.dimensions}"
+                if text:
+                    print(f"- {target.name}: HTTP {code}, dimension={dimension}, expected {args.dimensions}; skipping")
+                continue
+            if text:
+                print(f"- {target.name}: HTTP {code} (OK), dimension={dimension}")
+            checked.append((target, dimension))
 
-    print()
+        if text:
+            print()
+            print_header()
+        cells = sweep(
+            pool,
+            checked,
+            args.batch_sizes,
+            args.input_tokens,
+            args.concurrency,
+            args.rounds,
+            args.max_retries,
+            args.max_request_tokens,
+            on_cell=print_cell if text else None,
+        )
+    finally:
+        pool.close()
 
-    model_url = f"{endpoint}/openai/models?api-version=2024-10-21"
-    model_code, model_data = http_json("GET", model_url, api_key)
-    print(f"Models API: HTTP {model_code}")
-    if model_code == 200 and isinstance(model_data, dict):
-        model_items = model_data.get("data") or model_data.get("value") or []
-        model_ids = []
-        for item in model_items:
-            if isinstance(item, dict):
-                model_id = item.get("id") or item.get("name")
-                if model_id:
-                    model_ids.append(str(model_id))
-        if model_ids:
-            print("Available model IDs:")
-            for model_id in model_ids:
-                print(f"- {model_id}")
+    best = optimal_batches(cells)
+    if text:
+        print()
+        print_optimal(best)
     else:
-        print(f"Models API error: {get_message(model_data)}")
+        print(json.dumps({"deployment": deployment, "smoke": smoke, "cells": cells, "optimal": best}, indent=2))
+    return 0 if checked and best else 1
 
-    print()
 
-    probe_list = [preferred] + candidates
-    seen = set()
-    probe_list = [x for x in probe_list if x and not (x in seen or seen.add(x))]
+def endpoint_credentials(cli_endpoints: list[str]) -> list[tuple[str, str]]:
+    """``(endpoint, api_key)`` pairs from --endpoint / AZURE_OPENAI_ENDPOINTS / AZURE_OPENAI_ENDPOINT."""
+    raw = cli_endpoints or os.getenv("AZURE_OPENAI_ENDPOINTS", "").split(",")
+    endpoints = [item.strip().rstrip("/") for item in raw if item.strip()]
+    if not endpoints and os.getenv("AZURE_OPENAI_ENDPOINT"):
+        endpoints = [os.environ["AZURE_OPENAI_ENDPOINT"].rstrip("/")]
+    keys = [item.strip() for item in os.getenv("AZURE_OPENAI_API_KEYS", "").split(",") if item.strip()]
+    if len(keys) != len(endpoints):
+        keys = [os.getenv("AZURE_OPENAI_API_KEY", "")] * len(endpoints)
+    return list(zip(endpoints, keys))
+
+
+def parse_deployments(data: object) -> list[tuple[str, str]]:
+    """``(deployment, model)`` pairs from a deployments API response."""
+    deployments = []
+    items = (data.get("data") or data.get("value") or []) if isinstance(data, dict) else []
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        deployment_name = item.get("id") or item.get("name") or ""
+        model_name = item.get("model")
+        if isinstance(model_name, dict):
+            model_name = model_name.get("name") or ""
+        if not isinstance(model_name, str):
+            model_name = ""
+        if deployment_name:
+            deployments.append((deployment_name, model_name))
+    return deployments
+
+
+def parse_model_ids(data: object) -> list[str]:
+    items = (data.get("data") or data.get("value") or []) if isinstance(data, dict) else []
+    model_ids = []
+    for item in items:
+        if isinstance(item, dict):
+            model_id = item.get("id") or item.get("name")
+            if model_id:
+                model_ids.append(str(model_id))
+    return model_ids
+
+
+class EndpointLimiter:
+    """At most ``concurrency`` requests in flight and ``rate`` request starts per second."""
+
+    def __init__(self, concurrency: int, rate: float) -> None:
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.interval = 1 / rate if rate > 0 else 0.0
+        self.next_start = 0.0
+
+    async def __aenter__(self) -> None:
+        await self.semaphore.acquire()
+        if self.interval:
+            now = time.monotonic()
+            start = max(now, self.next_start)
+            self.next_start = start + self.interval
+            if start > now:
+                await asyncio.sleep(start - now)
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.semaphore.release()
+
+
+@dataclass
+class ProbeResult:
+    deployment: str
+    model: str = ""
+    status: int | None = None
+    dimension: int | None = None
+    latencies: list[float] = field(default_factory=list)
+    error: str | None = None
+
+    @property
+    def healthy(self) -> bool:
+        return self.error is None and bool(self.latencies)
+
 
-    if not probe_list:
+@dataclass
+class EndpointReport:
+    endpoint: str
+    deployments_status: int | None = None
+    deployments: list[tuple[str, str]] = field(default_factory=list)
+    deployments_error: str | None = None
+    models_status: int | None = None
+    model_ids: list[str] = field(default_factory=list)
+    models_error: str | None = None
+    # Filled in as discovery proceeds so a run cut off by the deadline still reports what it saw.
+    probes: list[ProbeResult] = field(default_factory=list)
+    finished: bool = False
+
+
+class Discovery:
+    """Runs the blocking pool requests on worker threads, throttled per endpoint."""
+
+    def __init__(self, pool: HTTPPool, executor: ThreadPoolExecutor, concurrency: int, rate: float) -> None:
+        self.pool = pool
+        self.executor = executor
+        self.concurrency = concurrency
+        self.rate = rate
+        self.limiters: dict[str, EndpointLimiter] = {}
+
+    async def call(self, endpoint: str, api_key: str, method: str, url: str, payload: dict | None = None):
+        limiter = self.limiters.setdefault(endpoint, EndpointLimiter(self.concurrency, self.rate))
+        async with limiter:
+            started = time.perf_counter()
+            code, data = await asyncio.get_running_loop().run_in_executor(
+                self.executor, self.pool.request, method, url, {"api-key": api_key}, payload
+            )
+            return code, data, time.perf_counter() - started
+
+    async def probe(self, report: EndpointReport, api_key: str, api_version: str, result: ProbeResult, samples: int):
+        url = f"{report.endpoint}/openai/deployments/{parse.quote(result.deployment)}/embeddings?api-version={api_version}"
+        for _ in range(samples):
+            code, data, elapsed = await self.call(report.endpoint, api_key, "POST", url, {"input": "smoke test"})
+            result.status = code
+            if not 200 <= code < 300:
+                result.error = get_message(data)
+                return
+            dimension = embedding_dimension(data)
+            if dimension is None or (result.dimension is not None and dimension != result.dimension):
+                result.error = f"unexpected embeddings response (dimension={dimension})"
+                return
+            result.dimension = dimension
+            result.latencies.append(elapsed)
+
+    async def discover(self, report: EndpointReport, api_key: str, api_version: str, preferred: str, samples: int):
+        dep_url = f"{report.endpoint}/openai/deployments?api-version=2023-03-15-preview"
+        model_url = f"{report.endpoint}/openai/models?api-version=2024-10-21"
+        (dep_code, dep_data, _), (model_code, model_data, _) = await asyncio.gather(
+            self.call(report.endpoint, api_key, "GET", dep_url),
+            self.call(report.endpoint, api_key, "GET", model_url),
+        )
+        report.deployments_status, report.models_status = dep_code, model_code
+        if dep_code == 200 and isinstance(dep_data, dict):
+            report.deployments = parse_deployments(dep_data)
+        else:
+            report.deployments_error = get_message(dep_data)
+        if model_code == 200 and isinstance(model_data, dict):
+            report.model_ids = parse_model_ids(model_data)
+        else:
+            report.models_error = get_message(model_data)
+
+        models = dict(report.deployments)
+        candidates = [name for name, model in report.deployments if "embedding" in f"{name} {model}".lower()]
+        seen: set[str] = set()
+        probe_list = [x for x in [preferred] + candidates if x and not (x in seen or seen.add(x))]
+        report.probes = [ProbeResult(name, models.get(name, "")) for name in probe_list]
+        await asyncio.gather(*(self.probe(report, api_key, api_version, result, samples) for result in report.probes))
+        report.finished = True
+
+
+async def discover_all(
+    args: argparse.Namespace, endpoints: list[tuple[str, str]], api_version: str, preferred: str
+) -> list[EndpointReport]:
+    """Discover and probe every endpoint concurrently; give up on whatever is left at the deadline."""
+    workers = max(1, len(endpoints) * args.per_endpoint_concurrency)
+    executor = ThreadPoolExecutor(max_workers=workers)
+    # Requests still running at the deadline are abandoned, not waited for, so
+    # no single request may outlive it.
+    pool = HTTPPool(timeout=min(args.timeout, args.deadline))
+    discovery = Discovery(pool, executor, args.per_endpoint_concurrency, args.per_endpoint_rate)
+    reports = [EndpointReport(endpoint) for endpoint, _ in endpoints]
+    tasks = [
+        asyncio.create_task(discovery.discover(report, api_key, api_version, preferred, args.samples))
+        for report, (_, api_key) in zip(reports, endpoints)
+    ]
+    try:
+        _, pending = await asyncio.wait(tasks, timeout=args.deadline)
+        for task in pending:
+            task.cancel()
+        for report in reports:
+            if report.finished:
+                continue
+            for result in report.probes:
+                if result.error is None and len(result.latencies) < args.samples:
+                    result.error = f"deadline of {args.deadline:g}s exceeded"
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+        pool.close()
+    return reports
+
+
+def print_report(report: EndpointReport) -> None:
+    print(f"Endpoint: {report.endpoint}")
+    if report.deployments_status is None:
+        print("Discovery did not finish before the deadline.")
+        print()
+        return
+    print(f"Deployments API: HTTP {report.deployments_status}")
+    for deployment_name, model_name in report.deployments:
+        print(f"- deployment={deployment_name} model={model_name or 'unknown'}")
+    if report.deployments_error is not None:
+        print(f"Deployments API error: {report.deployments_error}")
+    print(f"Models API: HTTP {report.models_status}")
+    if report.model_ids:
+        print("Available model IDs:")
+        for model_id in report.model_ids:
+            print(f"- {model_id}")
+    if report.models_error is not None:
+        print(f"Models API error: {report.models_error}")
+
+    if not report.probes:
         print("No embedding deployment candidates found to probe.")
+    else:
+        print("Probing embedding endpoint by deployment:")
+    for result in report.probes:
+        status = "OK" if result.healthy else "FAIL"
+        dimension = f", dimension={result.dimension}" if result.dimension else ""
+        print(f"- {result.deployment}: HTTP {result.status or 0} ({status}){dimension}")
+        if result.error:
+            print(f"  reason: {result.error}")
+    print()
+
+
+def rank_healthy(reports: list[EndpointReport]) -> list[tuple[EndpointReport, ProbeResult]]:
+    """Healthy deployments, fastest first by median smoke latency."""
+    healthy = [(report, result) for report in reports for result in report.probes if result.healthy]
+    healthy.sort(key=lambda item: percentile(sorted(item[1].latencies), 0.50))
+    return healthy
+
+
+def print_ranking(healthy: list[tuple[EndpointReport, ProbeResult]]) -> None:
+    if not healthy:
+        print("No healthy embedding deployments.")
+        return
+    print("Healthy deployments by median latency:")
+    print(f"{'#':>2} {'endpoint':<44} {'deployment':<28} {'dim':>5} {'n':>3} {'p50 ms':>8} {'min ms':>8}")
+    for rank, (report, result) in enumerate(healthy, 1):
+        ordered = sorted(result.latencies)
+        host = parse.urlparse(report.endpoint).netloc or report.endpoint
+        print(
+            f"{rank:>2} {host[:44]:<44} {result.deployment[:28]:<28} {result.dimension or 0:>5} "
+            f"{len(ordered):>3} {percentile(ordered, 0.50) * 1000:>8.1f} {ordered[0] * 1000:>8.1f}"
+        )
+
+
+def discovery_json(
+    reports: list[EndpointReport], healthy: list[tuple[EndpointReport, ProbeResult]], api_version: str, preferred: str
+) -> str:
+    ranking = [
+        {
+            "endpoint": report.endpoint,
+            "deployment": result.deployment,
+            "dimension": result.dimension,
+            "samples": len(result.latencies),
+            "p50_ms": round(percentile(sorted(result.latencies), 0.50) * 1000, 1),
+            "min_ms": round(min(result.latencies) * 1000, 1),
+        }
+        for report, result in healthy
+    ]
+    endpoints = [
+        dict(asdict(report), probes=[dict(asdict(result), healthy=result.healthy) for result in report.probes])
+        for report in reports
+    ]
+    return json.dumps(
+        {"api_version": api_version, "preferred": preferred, "endpoints": endpoints, "ranking": ranking}, indent=2
+    )
+
+
+def main() -> int:
+    args = parse_args()
+    root = Path(__file__).resolve().parents[1]
+    load_dotenv(root / ".env.local")
+    if args.mock:
+        from mock_openai_server import start_mock_server
+
+        mock = start_mock_server(
+            latency=args.mock_latency_ms / 1000, embedding_tokens_per_sec=args.mock_embedding_tps
+        )
+        os.environ["AZURE_OPENAI_ENDPOINT"] = os.environ["GATEWAY_URL"] = mock.url
+        os.environ["AZURE_OPENAI_API_KEY"] = os.environ["AIGATEWAY_KEY"] = "mock"
+
+    endpoints = endpoint_credentials(args.endpoint)
+    api_version = os.getenv("AZURE_OPENAI_API_VERSION", "2023-05-15")
+    preferred = os.getenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT", "text-embedding-3-large")
+
+    if not endpoints:
+        print("Missing AZURE_OPENAI_ENDPOINT")
         return 1
+    if not all(api_key for _, api_key in endpoints):
+        print("Missing AZURE_OPENAI_API_KEY (set it in .env.local)")
+        return 1
+
+    if args.benchmark:
+        endpoint, api_key = endpoints[0]
+        deployment = args.deployment or preferred
+        if args.format == "text":
+            print(f"Endpoint: {endpoint}")
+            print(f"Benchmarking deployment: {deployment}")
+            print()
+        return benchmark(args, endpoint, api_key, api_version, deployment)
 
-    print("Probing embedding endpoint by deployment:")
-    any_ok = False
-    for deployment in probe_list:
-        emb_url = (
-            f"{endpoint}/openai/deployments/{deployment}/embeddings"
-            f"?api-version={api_version}"
+    text = args.format == "text"
+    if text:
+        print(f"Endpoints: {', '.join(endpoint for endpoint, _ in endpoints)}")
+        print(f"API version (embeddings): {api_version}")
+        print(f"Preferred embedding deployment: {preferred}")
+        print(
+            f"Deadline: {args.deadline:.0f}s, per endpoint: {args.per_endpoint_concurrency} in flight, "
+            f"{args.per_endpoint_rate:g} req/s"
         )
-        code, data = http_json("POST", emb_url, api_key, {"input": "smoke test"})
-        ok = 200 <= code < 300
-        status = "OK" if ok else "FAIL"
-        print(f"- {deployment}: HTTP {code} ({status})")
-        if not ok:
-            print(f"  reason: {get_message(data)}")
-        any_ok = any_ok or ok
-
-    return 0 if any_ok else 1
+        print()
+
+    reports = asyncio.run(discover_all(args, endpoints, api_version, preferred))
+    healthy = rank_healthy(reports)
+    if text:
+        for report in reports:
+            print_report(report)
+        print_ranking(healthy)
+    else:
+        print(discovery_json(reports, healthy, api_version, preferred))
+    return 0 if healthy else 1
 
 
 if __name__ == "__main__":
@@ -0,0 +1,281 @@
+"""Embedding throughput sweep used by ``check_aoai_embeddings.py --benchmark``.
+
+Every cell of the sweep (batch size x input length x concurrency) runs
+``concurrency`` closed-loop workers that each send ``rounds`` embedding
+requests over a shared ``HTTPPool``. 429 responses are retried after
+``retry-after-ms`` / ``Retry-After`` (exponential backoff when neither is
+sent) and the wait counts against the cell's throughput, so a batch size
+that only looks fast until the deployment throttles it does not win.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable
+
+from http_pool import HTTPPool, percentile, retry_after_seconds, usage_tokens
+
+# Common English words are one token each for the OpenAI tokenizers, so an
+# input of N words is close to N tokens.
+WORDS = (
+    "the of and to in is for on that with as by at from this be are or an it not which have "
+    "but all were when we there can more if no out so what up its about into than them only "
+    "other new some could time these two may then first any like now over such our even most"
+).split()
+
+
+@dataclass(frozen=True)
+class Target:
+    """One way of reaching the embedding model: direct to Azure OpenAI or via the gateway."""
+
+    name: str
+    url: str
+    headers: dict
+    # Payload fields sent with every request besides ``input`` (e.g. ``model`` for the gateway).
+    extra: dict
+
+
+@dataclass(frozen=True)
+class Attempt:
+    status: int
+    elapsed: float
+    tokens: int
+    retries: int
+    waited: float
+    error: str | None
+
+
+def make_inputs(batch_size: int, input_tokens: int, seed: int) -> list[str]:
+    """``batch_size`` distinct texts of roughly ``input_tokens`` tokens each."""
+    texts = []
+    for index in range(batch_size):
+        offset = seed * batch_size + index
+        words = [str(offset)] + [WORDS[(offset + k * 7) % len(WORDS)] for k in range(input_tokens - 1)]
+        texts.append(" ".join(words))
+    return texts
+
+
+def embedding_dimension(data: object) -> int | None:
+    """Length of the first vector in an embeddings response, if it has one."""
+    try:
+        return len(data["data"][0]["embedding"])  # type: ignore[index]
+    except (KeyError, IndexError, TypeError):
+        return None
+
+
+def check_embeddings(data: object, count: int, dimension: int | None) -> str | None:
+    """Why an embeddings response does not hold ``count`` vectors of ``dimension``, or None."""
+    items = data.get("data") if isinstance(data, dict) else None
+    if not isinstance(items, list):
+        return "response has no data list"
+    if len(items) != count:
+        return f"expected {count} embeddings, got {len(items)}"
+    for item in items:
+        vector = item.get("embedding") if isinstance(item, dict) else None
+        if not isinstance(vector, list):
+            return "embedding is not a list of floats"
+        if dimension is not None and len(vector) != dimension:
+            return f"dimension {len(vector)} != {dimension}"
+    return None
+
+
+def post_embeddings(pool: HTTPPool, url: str, headers: dict, payload: dict) -> tuple[int, object, float, float | None]:
+    """POST one request; returns ``(status, data, elapsed, retry_after)``."""
+    try:
+        resp, conn, started = pool.open("POST", url, headers, payload)
+    except Exception as exc:  # noqa: BLE001
+        return 0, {"error": str(exc)}, 0.0, None
+    try:
+        text = resp.read().decode("utf-8", errors="replace")
+    except Exception as exc:  # noqa: BLE001
+        conn.close()
+        return 0, {"error": str(exc)}, 0.0, None
+    elapsed = time.perf_counter() - started
+    pool.finish(url, resp, conn)
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        data = {"raw": text}
+    return resp.status, data, elapsed, retry_after_seconds(resp)
+
+
+def embed_batch(
+    pool: HTTPPool, target: Target, texts: list[str], dimension: int | None, max_retries: int
+) -> Attempt:
+    payload = dict(target.extra, input=texts)
+    waited = 0.0
+    for retry in range(max_retries + 1):
+        status, data, elapsed, retry_after = post_embeddings(pool, target.url, target.headers, payload)
+        if status != 429 or retry == max_retries:
+            break
+        delay = retry_after if retry_after is not None else min(2.0**retry, 30.0)
+        time.sleep(delay)
+        waited += delay
+    if not 200 <= status < 300:
+        message = data.get("error") if isinstance(data, dict) else None
+        if isinstance(message, dict):
+            message = message.get("message")
+        return Attempt(status, elapsed, 0, retry, waited, f"HTTP {status}: {message or data}"[:300])
+    problem = check_embeddings(data, len(texts), dimension)
+    return Attempt(status, elapsed, usage_tokens(data), retry, waited, problem)
+
+
+async def run_cell(
+    pool: HTTPPool,
+    target: Target,
+    batch_size: int,
+    input_tokens: int,
+    concurrency: int,
+    rounds: int,
+    dimension: int | None,
+    max_retries: int,
+) -> dict:
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=concurrency))
+    attempts: list[Attempt] = []
+
+    async def worker(slot: int) -> None:
+        for round_index in range(rounds):
+            texts = make_inputs(batch_size, input_tokens, slot * rounds + round_index)
+            attempt = await asyncio.to_thread(embed_batch, pool, target, texts, dimension, max_retries)
+            attempts.append(attempt)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(slot) for slot in range(concurrency)))
+    wall = time.perf_counter() - started
+    return summarize_cell(target.name, batch_size, input_tokens, concurrency, attempts, wall)
+
+
+def summarize_cell(
+    target: str, batch_size: int, input_tokens: int, concurrency: int, attempts: list[Attempt], wall: float
+) -> dict:
+    ok = [attempt for attempt in attempts if attempt.error is None]
+    latencies = sorted(attempt.elapsed for attempt in ok)
+
+    def ms(fraction: float) -> float | None:
+        return round(percentile(latencies, fraction) * 1000, 1) if latencies else None
+
+    errors = [attempt.error for attempt in attempts if attempt.error is not None]
+    return {
+        "target": target,
+        "batch_size": batch_size,
+        "input_tokens": input_tokens,
+        "concurrency": concurrency,
+        "requests": len(attempts),
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "throttled": sum(attempt.retries for attempt in attempts),
+        "throttle_wait_s": round(sum(attempt.waited for attempt in attempts), 2),
+        "p50_ms": ms(0.50),
+        "p95_ms": ms(0.95),
+        "p99_ms": ms(0.99),
+        "embeddings_per_sec": round(len(ok) * batch_size / wall, 1) if wall > 0 else None,
+        "tokens_per_sec": round(sum(attempt.tokens for attempt in ok) / wall, 1) if wall > 0 else None,
+        "wall_s": round(wall, 3),
+    }
+
+
+def sweep(
+    pool: HTTPPool,
+    targets: list[tuple[Target, int | None]],
+    batch_sizes: list[int],
+    input_lengths: list[int],
+    concurrencies: list[int],
+    rounds: int,
+    max_retries: int,
+    max_request_tokens: int,
+    on_cell: Callable[[dict], None] | None = None,
+) -> list[dict]:
+    """Run every cell for every ``(target, expected dimension)``.
+
+    Batch sizes are tried in ascending order and the ramp stops at the first
+    size where every request fails; larger batches would only fail too.
+    Cells whose requests would exceed ``max_request_tokens`` are skipped.
+    """
+    cells = []
+    for target, dimension in targets:
+        for input_tokens in input_lengths:
+            for concurrency in concurrencies:
+                for batch_size in batch_sizes:
+                    if batch_size * input_tokens > max_request_tokens:
+                        continue
+                    cell = asyncio.run(
+                        run_cell(pool, target, batch_size, input_tokens, concurrency, rounds, dimension, max_retries)
+                    )
+                    cells.append(cell)
+                    if on_cell is not None:
+                        on_cell(cell)
+                    if cell["errors"] == cell["requests"]:
+                        break
+    return cells
+
+
+def optimal_batches(cells: list[dict], tolerance: float = 0.95) -> list[dict]:
+    """Per target and input length: the cell with the highest embeddings/sec, plus the
+    smallest batch size that gets within ``tolerance`` of it (cheaper to retry, lower latency)."""
+    groups: dict[tuple[str, int], list[dict]] = {}
+    for cell in cells:
+        if cell["errors"] == 0 and cell["embeddings_per_sec"]:
+            groups.setdefault((cell["target"], cell["input_tokens"]), []).append(cell)
+
+    best = []
+    for (target, input_tokens), items in groups.items():
+        peak = max(items, key=lambda cell: cell["embeddings_per_sec"])
+        knee = min(
+            (cell for cell in items if cell["embeddings_per_sec"] >= tolerance * peak["embeddings_per_sec"]),
+            key=lambda cell: (cell["batch_size"], cell["concurrency"]),
+        )
+        best.append(
+            {
+                "target": target,
+                "input_tokens": input_tokens,
+                "batch_size": peak["batch_size"],
+                "concurrency": peak["concurrency"],
+                "embeddings_per_sec": peak["embeddings_per_sec"],
+                "tokens_per_sec": peak["tokens_per_sec"],
+                "smallest_batch_within_tolerance": knee["batch_size"],
+                "smallest_batch_concurrency": knee["concurrency"],
+            }
+        )
+    return best
+
+
+def print_cell(cell: dict) -> None:
+    def num(value: float | None) -> str:
+        return "-" if value is None else f"{value:.1f}"
+
+    print(
+        f"{cell['target']:<8} {cell['batch_size']:>6} {cell['input_tokens']:>6} {cell['concurrency']:>5} "
+        f"{cell['requests']:>5} {cell['errors']:>4} {cell['throttled']:>5} {num(cell['p50_ms']):>9} "
+        f"{num(cell['p95_ms']):>9} {num(cell['p99_ms']):>9} {num(cell['embeddings_per_sec']):>10} "
+        f"{num(cell['tokens_per_sec']):>11}"
+    )
+    if cell["first_error"]:
+        print(f"         first error: {cell['first_error']}")
+
+
+def print_header() -> None:
+    print(
+        f"{'target':<8} {'batch':>6} {'tokens':>6} {'conc':>5} {'reqs':>5} {'err':>4} {'429s':>5} "
+        f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'emb/s':>10} {'tok/s':>11}"
+    )
+
+
+def print_optimal(best: list[dict]) -> None:
+    print("Throughput-optimal batch size:")
+    if not best:
+        print("- no cell completed without errors")
+    for item in sorted(best, key=lambda item: (item["target"], item["input_tokens"])):
+        line = (
+            f"- {item['target']}, ~{item['input_tokens']} tokens/input: batch {item['batch_size']} "
+            f"x concurrency {item['concurrency']} -> {item['embeddings_per_sec']:.1f} emb/s, "
+            f"{item['tokens_per_sec']:.1f} tok/s"
+        )
+        if item["smallest_batch_within_tolerance"] < item["batch_size"]:
+            line += (
+                f" (batch {item['smallest_batch_within_tolerance']} x {item['smallest_batch_concurrency']}"
+                " is within 5%)"
+            )
+        print(line)
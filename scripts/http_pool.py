@@ -0,0 +1,360 @@
+"""Keep-alive HTTP connection pool with per-request timing for the probe scripts.
+
+Stdlib only, like the scripts that use it. ``HTTPPool.request`` has the same
+``(status, data)`` contract as the scripts' ``http_request`` helpers, but
+reuses connections per host and records latency, time to first byte and
+token usage for every call so callers can report percentiles afterwards.
+``HTTPPool.stream`` does the same for server-sent-event responses, timing
+each content chunk as it arrives. The pool is thread-safe; async callers run
+requests via ``asyncio.to_thread``.
+"""
+from __future__ import annotations
+
+import http.client
+import json
+import threading
+import time
+from dataclasses import dataclass
+from urllib import parse
+
+# Errors that mean a pooled keep-alive connection was closed by the server
+# while idle; the request is retried once on a fresh connection.
+STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError)
+
+
+@dataclass(frozen=True)
+class Observation:
+    endpoint: str
+    status: int
+    elapsed: float
+    ttfb: float
+    tokens: int
+    retry_after: float | None = None
+
+
+@dataclass(frozen=True)
+class StreamObservation:
+    endpoint: str
+    status: int
+    ttfb: float
+    # Time to the first content-bearing chunk, and gaps between later ones.
+    ttft: float | None
+    gaps: tuple[float, ...]
+    elapsed: float
+    tokens: int
+    text: str
+    error: str | None = None
+
+    @property
+    def tokens_per_sec(self) -> float | None:
+        """Decode rate: tokens over the time from first to last content chunk."""
+        if not self.tokens or self.ttft is None:
+            return None
+        window = sum(self.gaps) or self.elapsed - self.ttft
+        return self.tokens / window if window > 0 else None
+
+
+def sse_content(event: dict) -> str:
+    """Text carried by a chat-completions or Responses API stream event, if any."""
+    if event.get("type") == "response.output_text.delta":
+        return str(event.get("delta") or "")
+    choices = event.get("choices")
+    if isinstance(choices, list) and choices and isinstance(choices[0], dict):
+        delta = choices[0].get("delta")
+        if isinstance(delta, dict):
+            return str(delta.get("content") or "")
+    return ""
+
+
+def sse_usage_tokens(event: dict) -> int:
+    if event.get("type") == "response.completed":
+        return usage_tokens(event.get("response"))
+    return usage_tokens(event)
+
+
+def usage_tokens(data: object) -> int:
+    """Tokens produced (chat/responses) or consumed (embeddings) according to ``usage``."""
+    if not isinstance(data, dict) or not isinstance(data.get("usage"), dict):
+        return 0
+    usage = data["usage"]
+    for field in ("completion_tokens", "output_tokens", "prompt_tokens", "total_tokens"):
+        if isinstance(usage.get(field), int):
+            return usage[field]
+    return 0
+
+
+def percentile(ordered: list[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))]
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
+
+
+def retry_after_seconds(resp: http.client.HTTPResponse) -> float | None:
+    """Azure OpenAI's ``retry-after-ms`` when present, else the standard ``Retry-After``."""
+    millis = parse_retry_after(resp.getheader("retry-after-ms"))
+    if millis is not None:
+        return millis / 1000
+    return parse_retry_after(resp.getheader("Retry-After"))
+
+
+class HTTPPool:
+    def __init__(self, timeout: float = 30.0) -> None:
+        self.timeout = timeout
+        self.observations: list[Observation] = []
+        self.streams: list[StreamObservation] = []
+        self._idle: dict[tuple[str, str], list[http.client.HTTPConnection]] = {}
+        self._lock = threading.Lock()
+
+    def _connect(self, scheme: str, netloc: str) -> http.client.HTTPConnection:
+        factory = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        return factory(netloc, timeout=self.timeout)
+
+    def _acquire(self, scheme: str, netloc: str) -> tuple[http.client.HTTPConnection, bool]:
+        with self._lock:
+            idle = self._idle.get((scheme, netloc))
+            if idle:
+                return idle.pop(), True
+        return self._connect(scheme, netloc), False
+
+    def _release(self, scheme: str, netloc: str, conn: http.client.HTTPConnection) -> None:
+        with self._lock:
+            self._idle.setdefault((scheme, netloc), []).append(conn)
+
+    def open(
+        self, method: str, url: str, headers: dict, payload: dict | None = None
+    ) -> tuple[http.client.HTTPResponse, http.client.HTTPConnection, float]:
+        """Send a request and return once the response headers have arrived.
+
+        Returns ``(response, connection, started)``; the caller must read the
+        body and then call ``finish``. Used directly for streaming responses.
+        """
+        parsed = parse.urlparse(url)
+        if parsed.scheme not in ("http", "https"):
+            raise ValueError(f"Unsupported URL scheme '{parsed.scheme}' in {url}")
+        target = parsed.path or "/"
+        if parsed.query:
+            target += f"?{parsed.query}"
+
+        body = None
+        req_headers = dict(headers)
+        if payload is not None:
+            body = json.dumps(payload).encode("utf-8")
+            req_headers["Content-Type"] = "application/json"
+
+        conn, reused = self._acquire(parsed.scheme, parsed.netloc)
+        started = time.perf_counter()
+        try:
+            conn.request(method, target, body=body, headers=req_headers)
+            resp = conn.getresponse()
+        except STALE_CONNECTION_ERRORS:
+            conn.close()
+            if not reused:
+                raise
+            conn = self._connect(parsed.scheme, parsed.netloc)
+            started = time.perf_counter()
+            try:
+                conn.request(method, target, body=body, headers=req_headers)
+                resp = conn.getresponse()
+            except Exception:
+                conn.close()
+                raise
+        except Exception:
+            conn.close()
+            raise
+        return resp, conn, started
+
+    def finish(
+        self, url: str, resp: http.client.HTTPResponse, conn: http.client.HTTPConnection
+    ) -> None:
+        parsed = parse.urlparse(url)
+        if resp.will_close:
+            conn.close()
+        else:
+            self._release(parsed.scheme, parsed.netloc, conn)
+
+    def record(self, observation: Observation) -> None:
+        with self._lock:
+            self.observations.append(observation)
+
+    def request(self, method: str, url: str, headers: dict, payload: dict | None = None):
+        endpoint = f"{method} {parse.urlparse(url).path}"
+        try:
+            resp, conn, started = self.open(method, url, headers, payload)
+        except Exception as exc:  # noqa: BLE001
+            self.record(Observation(endpoint, 0, 0.0, 0.0, 0))
+            return 0, {"error": str(exc)}
+        ttfb = time.perf_counter() - started
+        try:
+            text = resp.read().decode("utf-8", errors="replace")
+        except Exception as exc:  # noqa: BLE001
+            conn.close()
+            self.record(Observation(endpoint, 0, 0.0, 0.0, 0))
+            return 0, {"error": str(exc)}
+        elapsed = time.perf_counter() - started
+        self.finish(url, resp, conn)
+
+        try:
+            data = json.loads(text)
+        except json.JSONDecodeError:
+            data = {"raw": text}
+        self.record(
+            Observation(
+                endpoint,
+                resp.status,
+                elapsed,
+                ttfb,
+                usage_tokens(data),
+                retry_after_seconds(resp),
+            )
+        )
+        return resp.status, data
+
+    def stream(
+        self, method: str, url: str, headers: dict, payload: dict | None = None
+    ) -> StreamObservation:
+        """Send a streaming request and parse its SSE body incrementally.
+
+        Token counts come from the final usage event when the server sends one
+        (``stream_options.include_usage`` / ``response.completed``), otherwise
+        every content chunk counts as one token.
+        """
+        endpoint = f"{method} {parse.urlparse(url).path}"
+        try:
+            resp, conn, started = self.open(method, url, headers, payload)
+        except Exception as exc:  # noqa: BLE001
+            observation = StreamObservation(endpoint, 0, 0.0, None, (), 0.0, 0, "", str(exc))
+            self.record_stream(observation)
+            return observation
+        ttfb = time.perf_counter() - started
+
+        arrivals: list[float] = []
+        parts: list[str] = []
+        usage = 0
+        error = None
+        if resp.status >= 300:
+            error = resp.read().decode("utf-8", errors="replace")[:500]
+        else:
+            data_lines: list[str] = []
+            try:
+                while True:
+                    raw = resp.readline()
+                    line = raw.decode("utf-8", errors="replace").rstrip("\r\n")
+                    if line.startswith("data:"):
+                        data_lines.append(line[5:].lstrip())
+                        continue
+                    # A blank line ends an event, and so does the end of the body.
+                    if line or not data_lines:
+                        if raw:
+                            continue
+                        break
+                    data, data_lines = "\n".join(data_lines), []
+                    if data == "[DONE]":
+                        break
+                    try:
+                        event = json.loads(data)
+                    except json.JSONDecodeError:
+                        continue
+                    if not isinstance(event, dict):
+                        continue
+                    content = sse_content(event)
+                    if content:
+                        arrivals.append(time.perf_counter() - started)
+                        parts.append(content)
+                    usage = sse_usage_tokens(event) or usage
+                # Drain anything after [DONE] so the connection can be reused.
+                resp.read()
+            except Exception as exc:  # noqa: BLE001
+                conn.close()
+                error = str(exc)
+        elapsed = time.perf_counter() - started
+        if error is None or resp.status >= 300:
+            self.finish(url, resp, conn)
+
+        observation = StreamObservation(
+            endpoint,
+            resp.status,
+            ttfb,
+            arrivals[0] if arrivals else None,
+            tuple(later - earlier for earlier, later in zip(arrivals, arrivals[1:])),
+            elapsed,
+            usage or len(arrivals),
+            "".join(parts),
+            error,
+        )
+        self.record_stream(observation)
+        return observation
+
+    def record_stream(self, observation: StreamObservation) -> None:
+        with self._lock:
+            self.streams.append(observation)
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for conn in connections:
+                conn.close()
+
+
+def summarize(observations: list[Observation]) -> dict[str, dict]:
+    """Per-endpoint count, errors, latency/TTFB percentiles (ms) and tokens/sec."""
+    by_endpoint: dict[str, list[Observation]] = {}
+    for observation in observations:
+        by_endpoint.setdefault(observation.endpoint, []).append(observation)
+
+    summary: dict[str, dict] = {}
+    for endpoint, items in by_endpoint.items():
+        ok = [item for item in items if 200 <= item.status < 300]
+        latencies = sorted(item.elapsed for item in ok)
+        ttfbs = sorted(item.ttfb for item in ok)
+        rates = sorted(item.tokens / item.elapsed for item in ok if item.tokens and item.elapsed)
+        summary[endpoint] = {
+            "requests": len(items),
+            "errors": len(items) - len(ok),
+            "min_ms": round(latencies[0] * 1000, 1) if latencies else None,
+            "p50_ms": round(percentile(latencies, 0.50) * 1000, 1) if latencies else None,
+            "p95_ms": round(percentile(latencies, 0.95) * 1000, 1) if latencies else None,
+            "max_ms": round(latencies[-1] * 1000, 1) if latencies else None,
+            "ttfb_p50_ms": round(percentile(ttfbs, 0.50) * 1000, 1) if ttfbs else None,
+            "tokens_per_sec": round(percentile(rates, 0.50), 1) if rates else None,
+        }
+    return summary
+
+
+def summarize_streams(observations: list[StreamObservation]) -> dict[str, dict]:
+    """Per-endpoint TTFT and inter-chunk gap percentiles (ms) and decode tokens/sec."""
+    by_endpoint: dict[str, list[StreamObservation]] = {}
+    for observation in observations:
+        by_endpoint.setdefault(observation.endpoint, []).append(observation)
+
+    def ms(ordered: list[float], fraction: float) -> float | None:
+        return round(percentile(ordered, fraction) * 1000, 1) if ordered else None
+
+    summary: dict[str, dict] = {}
+    for endpoint, items in by_endpoint.items():
+        ok = [item for item in items if item.error is None and item.ttft is not None]
+        ttfts = sorted(ttft for item in ok if (ttft := item.ttft) is not None)
+        gaps = sorted(gap for item in ok for gap in item.gaps)
+        rates = sorted(rate for item in ok if (rate := item.tokens_per_sec) is not None)
+        summary[endpoint] = {
+            "requests": len(items),
+            "errors": len(items) - len(ok),
+            "ttft_p50_ms": ms(ttfts, 0.50),
+            "ttft_p95_ms": ms(ttfts, 0.95),
+            "gap_p50_ms": ms(gaps, 0.50),
+            "gap_p95_ms": ms(gaps, 0.95),
+            "gap_p99_ms": ms(gaps, 0.99),
+            "gap_max_ms": round(gaps[-1] * 1000, 1) if gaps else None,
+            "tokens_per_sec": round(percentile(rates, 0.50), 1) if rates else None,
+        }
+    return summary
@@ -16,6 +16,19 @@ Optional env vars:
   GATEWAY_URL                       - LiteLLM gateway URL (skip gateway tests if unset)
   AIGATEWAY_KEY                     - Gateway auth key (required if GATEWAY_URL is set)
 
+Options:
+  --async              Run independent probes concurrently over pooled keep-alive
+                       connections and report latency statistics per endpoint
+  --repeat N           Run every probe N times (async mode)
+  --concurrency C      At most C requests in flight (async mode, default 4)
+  --format json        Print one JSON document instead of the text report
+  --stream             Add streaming probes: chat completions and Responses API
+                       direct to Azure OpenAI, Responses API via the gateway.
+                       Reports TTFT, inter-chunk gaps, tokens/sec and the gateway
+                       overhead (gateway minus direct)
+  --mock               Point every endpoint at a local mock server
+                       (scripts/mock_openai_server.py); no credentials needed
+
 Usage:
   # Test Azure OpenAI backend only
   export AZURE_OPENAI_ENDPOINT=https://...
@@ -26,14 +39,28 @@ Usage:
   export GATEWAY_URL=https://...azurecontainerapps.io
   export AIGATEWAY_KEY=...
   python3 scripts/integration_test.py
+
+  # Latency profile: 20 runs of each probe, 8 in flight, as JSON
+  python3 scripts/integration_test.py --async --repeat 20 --concurrency 8 --format json
+
+  # Exercise the runner itself without Azure
+  python3 scripts/integration_test.py --mock --async --repeat 5
 """
+import argparse
+import asyncio
 import hashlib
 import json
 import os
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Callable
 from urllib import error, parse, request
 
+from http_pool import HTTPPool, StreamObservation, summarize, summarize_streams
+
 
 def load_dotenv(path: Path) -> None:
     if not path.exists():
@@ -79,6 +106,22 @@ def http_request(method: str, url: str, headers: dict, payload: dict | None = No
         return 0, {"error": str(exc)}
 
 
+# (method, url, headers, payload) -> (status, data); http_request or HTTPPool.request.
+Sender = Callable[..., tuple[int, dict]]
+# (method, url, headers, payload) -> StreamObservation; stream_request or HTTPPool.stream.
+Streamer = Callable[..., StreamObservation]
+
+STREAM_PROMPT = "Count from 1 to 20, separated by spaces."
+
+
+def stream_request(method: str, url: str, headers: dict, payload: dict | None = None) -> StreamObservation:
+    pool = HTTPPool()
+    try:
+        return pool.stream(method, url, headers, payload)
+    finally:
+        pool.close()
+
+
 def get_message(data: dict) -> str:
     if not isinstance(data, dict):
         return str(data)
@@ -97,10 +140,10 @@ class TestResult:
         self.detail = detail
 
 
-def test_aoai_deployments(endpoint: str, api_key: str, api_version: str) -> TestResult:
+def test_aoai_deployments(endpoint: str, api_key: str, api_version: str, send: Sender = http_request) -> TestResult:
     """List Azure OpenAI deployments."""
     url = f"{endpoint}/openai/deployments?api-version={api_version}"
-    code, data = http_request("GET", url, {"api-key": api_key})
+    code, data = send("GET", url, {"api-key": api_key})
     if 200 <= code < 300 and isinstance(data, dict):
         items = data.get("data") or data.get("value") or []
         names = []
@@ -119,10 +162,10 @@ def test_aoai_deployments(endpoint: str, api_key: str, api_version: str) -> Test
     return TestResult("AOAI list deployments", False, f"HTTP {code}: {get_message(data)}")
 
 
-def test_aoai_embedding(endpoint: str, api_key: str, deployment: str, api_version: str) -> TestResult:
+def test_aoai_embedding(endpoint: str, api_key: str, deployment: str, api_version: str, send: Sender = http_request) -> TestResult:
     """Test embedding endpoint directly against Azure OpenAI."""
     url = f"{endpoint}/openai/deployments/{deployment}/embeddings?api-version={api_version}"
-    code, data = http_request("POST", url, {"api-key": api_key}, {"input": "integration test"})
+    code, data = send("POST", url, {"api-key": api_key}, {"input": "integration test"})
     if 200 <= code < 300:
         try:
             dim = len(data["data"][0]["embedding"])
@@ -132,11 +175,11 @@ def test_aoai_embedding(endpoint: str, api_key: str, deployment: str, api_versio
     return TestResult(f"AOAI embedding ({deployment})", False, f"HTTP {code}: {get_message(data)}")
 
 
-def test_aoai_chat(endpoint: str, api_key: str, model: str, api_version: str) -> TestResult:
+def test_aoai_chat(endpoint: str, api_key: str, model: str, api_version: str, send: Sender = http_request) -> TestResult:
     """Test chat completions endpoint directly against Azure OpenAI."""
     url = f"{endpoint}/openai/deployments/{model}/chat/completions?api-version={api_version}"
     payload = {"messages": [{"role": "user", "content": "Respond with exactly: OK"}], "max_tokens": 5}
-    code, data = http_request("POST", url, {"api-key": api_key}, payload)
+    code, data = send("POST", url, {"api-key": api_key}, payload)
     if 200 <= code < 300:
         try:
             content = data["choices"][0]["message"]["content"]
@@ -146,20 +189,20 @@ def test_aoai_chat(endpoint: str, api_key: str, model: str, api_version: str) ->
     return TestResult(f"AOAI chat ({model})", False, f"HTTP {code}: {get_message(data)}")
 
 
-def test_gateway_models(gateway_url: str, auth_header: str) -> TestResult:
+def test_gateway_models(gateway_url: str, auth_header: str, send: Sender = http_request) -> TestResult:
     """Test GET /v1/models on the LiteLLM gateway."""
     url = f"{gateway_url}/v1/models"
-    code, data = http_request("GET", url, {"Authorization": auth_header})
+    code, data = send("GET", url, {"Authorization": auth_header})
     if 200 <= code < 300 and isinstance(data, dict):
         models = [item.get("id", "?") for item in data.get("data", []) if isinstance(item, dict)]
         return TestResult("Gateway /v1/models", True, f"HTTP {code}, models: {', '.join(models[:10])}")
     return TestResult("Gateway /v1/models", False, f"HTTP {code}: {get_message(data)}")
 
 
-def test_gateway_embeddings(gateway_url: str, auth_header: str, model: str) -> TestResult:
+def test_gateway_embeddings(gateway_url: str, auth_header: str, model: str, send: Sender = http_request) -> TestResult:
     """Test POST /v1/embeddings on the LiteLLM gateway."""
     url = f"{gateway_url}/v1/embeddings"
-    code, data = http_request("POST", url, {"Authorization": auth_header}, {"model": model, "input": "integration test"})
+    code, data = send("POST", url, {"Authorization": auth_header}, {"model": model, "input": "integration test"})
     if 200 <= code < 300:
         try:
             dim = len(data["data"][0]["embedding"])
@@ -169,19 +212,186 @@ def test_gateway_embeddings(gateway_url: str, auth_header: str, model: str) -> T
     return TestResult(f"Gateway embedding ({model})", False, f"HTTP {code}: {get_message(data)}")
 
 
-def test_gateway_responses(gateway_url: str, auth_header: str, model: str) -> TestResult:
+def test_gateway_responses(gateway_url: str, auth_header: str, model: str, send: Sender = http_request) -> TestResult:
     """Test POST /v1/responses on the LiteLLM gateway."""
     url = f"{gateway_url}/v1/responses"
-    code, data = http_request("POST", url, {"Authorization": auth_header}, {"model": model, "input": "Respond with exactly: OK"})
+    code, data = send("POST", url, {"Authorization": auth_header}, {"model": model, "input": "Respond with exactly: OK"})
     if 200 <= code < 300:
         return TestResult(f"Gateway responses ({model})", True, f"HTTP {code}")
     return TestResult(f"Gateway responses ({model})", False, f"HTTP {code}: {get_message(data)}")
 
 
+def stream_result(name: str, obs: StreamObservation) -> TestResult:
+    if obs.error is None and 200 <= obs.status < 300 and obs.ttft is not None:
+        rate = obs.tokens_per_sec
+        detail = f"HTTP {obs.status}, TTFT {obs.ttft * 1000:.0f} ms, {len(obs.gaps) + 1} chunks, {obs.tokens} tokens"
+        return TestResult(name, True, detail + (f", {rate:.1f} tok/s" if rate else ""))
+    if obs.error is None:
+        return TestResult(name, False, f"HTTP {obs.status}: stream carried no content")
+    try:
+        message = get_message(json.loads(obs.error))
+    except json.JSONDecodeError:
+        message = obs.error
+    return TestResult(name, False, f"HTTP {obs.status}: {message}")
+
+
+def test_aoai_chat_stream(endpoint: str, api_key: str, model: str, api_version: str, send: Streamer = stream_request) -> TestResult:
+    """Stream chat completions directly from Azure OpenAI and time the chunks."""
+    url = f"{endpoint}/openai/deployments/{model}/chat/completions?api-version={api_version}"
+    payload = {"messages": [{"role": "user", "content": STREAM_PROMPT}], "max_tokens": 60, "stream": True}
+    return stream_result(f"AOAI chat stream ({model})", send("POST", url, {"api-key": api_key}, payload))
+
+
+def test_aoai_responses_stream(endpoint: str, api_key: str, model: str, api_version: str, send: Streamer = stream_request) -> TestResult:
+    """Stream the Responses API directly from Azure OpenAI; the baseline for the gateway stream."""
+    url = f"{endpoint}/openai/responses?api-version={api_version}"
+    payload = {"model": model, "input": STREAM_PROMPT, "stream": True}
+    return stream_result(f"AOAI responses stream ({model})", send("POST", url, {"api-key": api_key}, payload))
+
+
+def test_gateway_responses_stream(gateway_url: str, auth_header: str, model: str, send: Streamer = stream_request) -> TestResult:
+    """Stream POST /v1/responses through the LiteLLM gateway and time the chunks."""
+    url = f"{gateway_url}/v1/responses"
+    payload = {"model": model, "input": STREAM_PROMPT, "stream": True}
+    return stream_result(f"Gateway responses stream ({model})", send("POST", url, {"Authorization": auth_header}, payload))
+
+
+def gateway_overhead(streams: dict[str, dict]) -> dict[str, float] | None:
+    """Proxied minus direct Responses API stream timings (ms, tok/s), when both ran."""
+    direct = streams.get("POST /openai/responses")
+    proxied = streams.get("POST /v1/responses")
+    if not direct or not proxied:
+        return None
+    overhead = {}
+    for field in ("ttft_p50_ms", "ttft_p95_ms", "gap_p50_ms", "gap_p95_ms", "tokens_per_sec"):
+        if direct[field] is not None and proxied[field] is not None:
+            overhead[field] = round(proxied[field] - direct[field], 1)
+    return overhead
+
+
+@dataclass
+class Probe:
+    section: str
+    run: Callable[..., TestResult]
+    args: tuple
+    # Optional probes only warn on failure (e.g. list deployments on Global Standard).
+    required: bool = True
+    # Streaming probes take a Streamer instead of a Sender.
+    streaming: bool = False
+
+    def sender(self, pool: HTTPPool) -> Callable:
+        return pool.stream if self.streaming else pool.request
+
+
+def print_result(probe: Probe, r: TestResult) -> None:
+    if r.passed or probe.required:
+        print(f"{'PASS' if r.passed else 'FAIL'}: {r.name} — {r.detail}")
+    else:
+        print(f"WARN: {r.name} — {r.detail} (non-fatal, skipping)")
+
+
+def run_sequential(probes: list[Probe], text: bool, pool: HTTPPool | None = None) -> list[tuple[Probe, TestResult]]:
+    """Run probes one by one; streaming probes use ``pool`` so their timings are kept."""
+    outcomes = []
+    section = None
+    for probe in probes:
+        if text and probe.section != section:
+            print(f"\n--- {probe.section} ---" if section else f"--- {probe.section} ---")
+            section = probe.section
+        r = probe.run(*probe.args, send=pool.stream) if probe.streaming and pool else probe.run(*probe.args)
+        outcomes.append((probe, r))
+        if text:
+            print_result(probe, r)
+    return outcomes
+
+
+async def run_concurrent(
+    probes: list[Probe], pool: HTTPPool, repeat: int, concurrency: int
+) -> list[tuple[Probe, TestResult]]:
+    """Run every probe ``repeat`` times with at most ``concurrency`` requests in flight.
+
+    The probes are blocking (http.client), so they run on a thread per
+    in-flight request; the pool keeps one keep-alive connection per thread.
+    """
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=concurrency))
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def once(probe: Probe) -> TestResult:
+        async with semaphore:
+            return await asyncio.to_thread(probe.run, *probe.args, send=probe.sender(pool))
+
+    runs = await asyncio.gather(
+        *(asyncio.gather(*(once(probe) for _ in range(repeat))) for probe in probes)
+    )
+    outcomes = []
+    for probe, results in zip(probes, runs):
+        failures = [r for r in results if not r.passed]
+        r = failures[0] if failures else results[0]
+        if repeat > 1:
+            r = TestResult(r.name, not failures, f"{len(results) - len(failures)}/{repeat} passed; {r.detail}")
+        outcomes.append((probe, r))
+    return outcomes
+
+
+def print_latency_table(endpoints: dict[str, dict]) -> None:
+    def ms(value: float | None) -> str:
+        return "-" if value is None else f"{value:.1f}"
+
+    print(f"{'endpoint':<58} {'n':>4} {'err':>4} {'min':>8} {'p50':>8} {'p95':>8} {'max':>8} {'ttfb50':>8} {'tok/s':>8}")
+    for endpoint, stats in sorted(endpoints.items()):
+        print(
+            f"{endpoint[:58]:<58} {stats['requests']:>4} {stats['errors']:>4} {ms(stats['min_ms']):>8} "
+            f"{ms(stats['p50_ms']):>8} {ms(stats['p95_ms']):>8} {ms(stats['max_ms']):>8} "
+            f"{ms(stats['ttfb_p50_ms']):>8} {ms(stats['tokens_per_sec']):>8}"
+        )
+    print("(latencies in ms; ttfb50 = median time to response headers; tok/s = median usage tokens per second)")
+
+
+def print_stream_table(streams: dict[str, dict]) -> None:
+    def ms(value: float | None) -> str:
+        return "-" if value is None else f"{value:.1f}"
+
+    print(f"{'stream':<58} {'n':>4} {'err':>4} {'ttft50':>8} {'ttft95':>8} {'gap50':>8} {'gap95':>8} {'gap99':>8} {'tok/s':>8}")
+    for endpoint, stats in sorted(streams.items()):
+        print(
+            f"{endpoint[:58]:<58} {stats['requests']:>4} {stats['errors']:>4} {ms(stats['ttft_p50_ms']):>8} "
+            f"{ms(stats['ttft_p95_ms']):>8} {ms(stats['gap_p50_ms']):>8} {ms(stats['gap_p95_ms']):>8} "
+            f"{ms(stats['gap_p99_ms']):>8} {ms(stats['tokens_per_sec']):>8}"
+        )
+    print("(ttft = time to first content chunk; gap = time between content chunks; tok/s = decode rate)")
+
+
 def main() -> int:
+    parser = argparse.ArgumentParser(description="AI Gateway integration test")
+    parser.add_argument("--async", dest="concurrent", action="store_true", help="run probes concurrently")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per probe (async mode)")
+    parser.add_argument("--concurrency", type=int, default=4, help="requests in flight (async mode)")
+    parser.add_argument("--format", choices=["text", "json"], default="text")
+    parser.add_argument("--mock", action="store_true", help="run against a local mock server")
+    parser.add_argument("--mock-latency-ms", type=float, default=20.0)
+    parser.add_argument("--mock-gateway-latency-ms", type=float, default=0.0, help="extra mock latency on /v1 routes")
+    parser.add_argument("--stream", action="store_true", help="add streaming probes (TTFT, chunk gaps, gateway overhead)")
+    args = parser.parse_args()
+    if (args.repeat != 1 or args.concurrency != 4) and not args.concurrent:
+        parser.error("--repeat and --concurrency require --async")
+    if args.repeat < 1 or args.concurrency < 1:
+        parser.error("--repeat and --concurrency must be at least 1")
+    text = args.format == "text"
+
     root = Path(__file__).resolve().parents[1]
     load_dotenv(root / ".env.local")
 
+    if args.mock:
+        from mock_openai_server import start_mock_server
+
+        mock = start_mock_server(
+            latency=args.mock_latency_ms / 1000, gateway_latency=args.mock_gateway_latency_ms / 1000
+        )
+        for name in ("AZURE_OPENAI_ENDPOINT", "AZURE_OPENAI_EMBEDDING_ENDPOINT", "GATEWAY_URL"):
+            os.environ[name] = mock.url
+        for name in ("AZURE_OPENAI_API_KEY", "AZURE_OPENAI_EMBEDDING_API_KEY", "AIGATEWAY_KEY"):
+            os.environ[name] = "mock"
+
     endpoint = os.getenv("AZURE_OPENAI_ENDPOINT", "").rstrip("/")
     api_key = os.getenv("AZURE_OPENAI_API_KEY", "")
 
@@ -204,66 +414,126 @@ def main() -> int:
         print("ERROR: AZURE_OPENAI_API_KEY is required")
         return 1
 
-    print("=" * 60)
-    print("AI Gateway Integration Test")
-    print("=" * 60)
-    print(f"Azure OpenAI endpoint:      {endpoint}")
-    key_fp = hashlib.sha256(api_key.encode()).hexdigest()[:12]
-    print(f"Azure OpenAI API key:       sha256:{key_fp}")
-    if emb_endpoint != endpoint:
-        print(f"Embedding endpoint:         {emb_endpoint}")
-        emb_key_fp = hashlib.sha256(emb_api_key.encode()).hexdigest()[:12]
-        print(f"Embedding API key:          sha256:{emb_key_fp}")
-    else:
-        print("Embedding endpoint:         (same as main)")
-    print(f"Embedding deployment:       {embedding_deployment}")
-    print(f"Embedding API version:      {embedding_api_version}")
-    print(f"Chat deployment:            {chat_deployment}")
-    print(f"Chat API version:           {chat_api_version}")
-    print(f"Codex model:                {codex_model}")
-    print(f"Gateway URL:                {gateway_url or '<not set — skipping gateway tests>'}")
-    print()
-
-    results: list[TestResult] = []
-
-    # --- Azure OpenAI backend tests ---
-    print("--- Azure OpenAI Backend Tests ---")
+    if text:
+        print("=" * 60)
+        print("AI Gateway Integration Test")
+        print("=" * 60)
+        print(f"Azure OpenAI endpoint:      {endpoint}")
+        key_fp = hashlib.sha256(api_key.encode()).hexdigest()[:12]
+        print(f"Azure OpenAI API key:       sha256:{key_fp}")
+        if emb_endpoint != endpoint:
+            print(f"Embedding endpoint:         {emb_endpoint}")
+            emb_key_fp = hashlib.sha256(emb_api_key.encode()).hexdigest()[:12]
+            print(f"Embedding API key:          sha256:{emb_key_fp}")
+        else:
+            print("Embedding endpoint:         (same as main)")
+        print(f"Embedding deployment:       {embedding_deployment}")
+        print(f"Embedding API version:      {embedding_api_version}")
+        print(f"Chat deployment:            {chat_deployment}")
+        print(f"Chat API version:           {chat_api_version}")
+        print(f"Codex model:                {codex_model}")
+        print(f"Gateway URL:                {gateway_url or '<not set — skipping gateway tests>'}")
+        if args.concurrent:
+            print(f"Mode:                       async, repeat={args.repeat}, concurrency={args.concurrency}")
+        if args.stream:
+            print("Streaming probes:           enabled")
+        print()
 
-    r = test_aoai_deployments(endpoint, api_key, embedding_api_version)
-    if r.passed:
-        results.append(r)
-        print(f"PASS: {r.name} — {r.detail}")
-    else:
+    backend = "Azure OpenAI Backend Tests"
+    probes = [
         # List deployments is informational; Global Standard endpoints return 404.
-        print(f"WARN: {r.name} — {r.detail} (non-fatal, skipping)")
-
-    r = test_aoai_embedding(emb_endpoint, emb_api_key, embedding_deployment, embedding_api_version)
-    results.append(r)
-    print(f"{'PASS' if r.passed else 'FAIL'}: {r.name} — {r.detail}")
-
-    r = test_aoai_chat(endpoint, api_key, chat_deployment, chat_api_version)
-    results.append(r)
-    print(f"{'PASS' if r.passed else 'FAIL'}: {r.name} — {r.detail}")
-
-    # --- Gateway tests (optional) ---
+        Probe(backend, test_aoai_deployments, (endpoint, api_key, embedding_api_version), required=False),
+        Probe(backend, test_aoai_embedding, (emb_endpoint, emb_api_key, embedding_deployment, embedding_api_version)),
+        Probe(backend, test_aoai_chat, (endpoint, api_key, chat_deployment, chat_api_version)),
+    ]
+    if args.stream:
+        probes += [
+            Probe(backend, test_aoai_chat_stream, (endpoint, api_key, chat_deployment, chat_api_version), streaming=True),
+            # Direct baseline for the gateway stream; informational like list deployments.
+            Probe(
+                backend,
+                test_aoai_responses_stream,
+                (endpoint, api_key, codex_model, chat_api_version),
+                required=False,
+                streaming=True,
+            ),
+        ]
+    gateway_warning = None
     if gateway_url:
         if not gateway_key:
-            print("\nWARN: GATEWAY_URL is set but AIGATEWAY_KEY is missing. Skipping gateway tests.")
+            gateway_warning = "GATEWAY_URL is set but AIGATEWAY_KEY is missing. Skipping gateway tests."
         else:
             auth_header = gateway_key if gateway_key.lower().startswith("bearer ") else f"Bearer {gateway_key}"
-            print("\n--- LiteLLM Gateway Tests ---")
-
-            r = test_gateway_models(gateway_url, auth_header)
-            results.append(r)
-            print(f"{'PASS' if r.passed else 'FAIL'}: {r.name} — {r.detail}")
-
-            r = test_gateway_embeddings(gateway_url, auth_header, embedding_deployment)
-            results.append(r)
-            print(f"{'PASS' if r.passed else 'FAIL'}: {r.name} — {r.detail}")
-
-            r = test_gateway_responses(gateway_url, auth_header, codex_model)
-            results.append(r)
-            print(f"{'PASS' if r.passed else 'FAIL'}: {r.name} — {r.detail}")
+            gateway = "LiteLLM Gateway Tests"
+            probes += [
+                Probe(gateway, test_gateway_models, (gateway_url, auth_header)),
+                Probe(gateway, test_gateway_embeddings, (gateway_url, auth_header, embedding_deployment)),
+                Probe(gateway, test_gateway_responses, (gateway_url, auth_header, codex_model)),
+            ]
+            if args.stream:
+                probes.append(
+                    Probe(gateway, test_gateway_responses_stream, (gateway_url, auth_header, codex_model), streaming=True)
+                )
+
+    started = time.perf_counter()
+    pool = HTTPPool() if args.concurrent or args.stream else None
+    try:
+        if pool is not None and args.concurrent:
+            outcomes = asyncio.run(run_concurrent(probes, pool, args.repeat, args.concurrency))
+        else:
+            outcomes = run_sequential(probes, text, pool)
+    finally:
+        if pool is not None:
+            pool.close()
+    wall_seconds = time.perf_counter() - started
+    endpoints = summarize(pool.observations) if pool is not None and args.concurrent else None
+    streams = summarize_streams(pool.streams) if pool is not None and args.stream else None
+    overhead = gateway_overhead(streams) if streams else None
+
+    results = [r for probe, r in outcomes if r.passed or probe.required]
+
+    if args.format == "json":
+        passed = sum(1 for r in results if r.passed)
+        report = {
+            "mode": "async" if args.concurrent else "sequential",
+            "repeat": args.repeat,
+            "concurrency": args.concurrency if args.concurrent else 1,
+            "wall_seconds": round(wall_seconds, 3),
+            "passed": passed,
+            "failed": len(results) - passed,
+            "results": [
+                {"name": r.name, "passed": r.passed, "required": probe.required, "detail": r.detail}
+                for probe, r in outcomes
+            ],
+            "warnings": [gateway_warning] if gateway_warning else [],
+            "endpoints": endpoints,
+            "streams": streams,
+            "gateway_overhead": overhead,
+        }
+        print(json.dumps(report, indent=2))
+        return 1 if len(results) > passed else 0
+
+    if args.concurrent:
+        section = None
+        for probe, r in outcomes:
+            if probe.section != section:
+                print(f"\n--- {probe.section} ---" if section else f"--- {probe.section} ---")
+                section = probe.section
+            print_result(probe, r)
+    if gateway_warning:
+        print(f"\nWARN: {gateway_warning}")
+    if pool is not None and endpoints is not None:
+        busy_seconds = sum(o.elapsed for o in pool.observations)
+        print(f"\nWall time {wall_seconds:.2f}s for {busy_seconds:.2f}s of request time")
+        print_latency_table(endpoints)
+    if streams:
+        print()
+        print_stream_table(streams)
+    if overhead:
+        print(
+            "Gateway overhead (responses stream, gateway minus direct): "
+            + ", ".join(f"{field} {value:+.1f}" for field, value in overhead.items())
+        )
 
     # --- Summary ---
     print()
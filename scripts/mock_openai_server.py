@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""Local stand-in for Azure OpenAI and the LiteLLM gateway.
+
+Serves the routes the probe scripts call, over HTTP/1.1 keep-alive, with a
+configurable artificial latency, so the scripts can be exercised offline:
+
+  Azure OpenAI:  GET  /openai/deployments
+                 GET  /openai/models
+                 POST /openai/deployments/<name>/embeddings
+                 POST /openai/deployments/<name>/chat/completions
+                 POST /openai/responses
+  Gateway:       GET  /v1/models
+                 POST /v1/embeddings
+                 POST /v1/chat/completions
+                 POST /v1/responses
+
+Any non-empty ``api-key`` or ``Authorization`` header is accepted. Chat and
+Responses requests with ``"stream": true`` get a chunked SSE body of
+``--stream-chunks`` content events spaced ``--chunk-delay-ms`` apart.
+``--gateway-latency-ms`` is added to the /v1 routes only, to stand in for the
+proxy hop when comparing direct and gateway timings. ``--embedding-tps`` caps
+embedding input tokens per one-second window and answers 429 with
+``Retry-After`` / ``retry-after-ms`` beyond it, like an Azure TPM quota.
+
+Usage:
+  python3 scripts/mock_openai_server.py --port 8089 --latency-ms 40
+
+  AZURE_OPENAI_ENDPOINT=http://127.0.0.1:8089 AZURE_OPENAI_API_KEY=test \\
+  GATEWAY_URL=http://127.0.0.1:8089 AIGATEWAY_KEY=test \\
+  python3 scripts/integration_test.py --async --repeat 20 --concurrency 8
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import math
+import re
+import struct
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEPLOYMENTS = {
+    "text-embedding-3-large": 3072,
+    "text-embedding-3-small": 1536,
+    "gpt-4.1": None,
+    "gpt-5.3-codex": None,
+}
+DEPLOYMENT_ROUTE = re.compile(r"^/openai/deployments/([^/]+)/(embeddings|chat/completions)$")
+
+
+def count_tokens(text: str) -> int:
+    return max(1, len(text.split()))
+
+
+def fake_embedding(text: str, dimensions: int) -> list[float]:
+    """Deterministic unit-length vector derived from the input text."""
+    values: list[float] = []
+    counter = 0
+    while len(values) < dimensions:
+        digest = hashlib.sha256(f"{counter}:{text}".encode("utf-8")).digest()
+        values.extend(value / 2**31 - 1.0 for value in struct.unpack("<8I", digest))
+        counter += 1
+    values = values[:dimensions]
+    norm = sum(value * value for value in values) ** 0.5 or 1.0
+    return [round(value / norm, 6) for value in values]
+
+
+class MockOpenAIServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address: tuple[str, int],
+        latency: float = 0.0,
+        stream_chunks: int = 8,
+        chunk_delay: float = 0.01,
+        gateway_latency: float = 0.0,
+        embedding_tokens_per_sec: int = 0,
+    ) -> None:
+        super().__init__(address, MockOpenAIHandler)
+        self.latency = latency
+        self.stream_chunks = stream_chunks
+        self.chunk_delay = chunk_delay
+        self.gateway_latency = gateway_latency
+        self.embedding_tokens_per_sec = embedding_tokens_per_sec
+        self._window_lock = threading.Lock()
+        self._window_start = 0.0
+        self._window_tokens = 0
+
+    def take_embedding_tokens(self, tokens: int) -> float | None:
+        """Charge ``tokens`` to the current one-second window; seconds to wait if over quota."""
+        if not self.embedding_tokens_per_sec:
+            return None
+        with self._window_lock:
+            now = time.monotonic()
+            if now - self._window_start >= 1.0:
+                self._window_start, self._window_tokens = now, 0
+            if self._window_tokens and self._window_tokens + tokens > self.embedding_tokens_per_sec:
+                return 1.0 - (now - self._window_start)
+            self._window_tokens += tokens
+            return None
+
+    @property
+    def url(self) -> str:
+        host, port = self.socket.getsockname()[:2]
+        return f"http://{host}:{port}"
+
+
+class MockOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: MockOpenAIServer
+
+    def log_message(self, format: str, *args) -> None:  # noqa: A002
+        pass
+
+    def send_json(self, status: int, payload: dict, headers: dict | None = None) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_events(self, events: list[dict], usage_event: dict | None = None) -> None:
+        """Stream ``events`` as SSE over chunked transfer encoding, then ``[DONE]``."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def write(frame: str) -> None:
+            data = frame.encode("utf-8")
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+
+        for index, event in enumerate(events):
+            if index:
+                time.sleep(self.server.chunk_delay)
+            write(f"data: {json.dumps(event)}\n\n")
+        if usage_event is not None:
+            write(f"data: {json.dumps(usage_event)}\n\n")
+        write("data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def stream_words(self) -> list[str]:
+        return [f"tok{index} " for index in range(self.server.stream_chunks)]
+
+    def read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        try:
+            data = json.loads(raw or b"{}")
+        except json.JSONDecodeError:
+            data = None
+        return data if isinstance(data, dict) else {}
+
+    def authorized(self) -> bool:
+        if self.headers.get("api-key") or self.headers.get("Authorization"):
+            return True
+        self.send_json(401, {"error": {"message": "Missing api-key or Authorization header"}})
+        return False
+
+    def do_GET(self) -> None:  # noqa: N802
+        if not self.authorized():
+            return
+        path = self.path.split("?", 1)[0]
+        time.sleep(self.server.latency)
+        if path == "/openai/deployments":
+            items = [{"id": name, "model": name} for name in DEPLOYMENTS]
+            self.send_json(200, {"data": items})
+        elif path in ("/openai/models", "/v1/models"):
+            items = [{"id": name, "object": "model"} for name in DEPLOYMENTS]
+            self.send_json(200, {"object": "list", "data": items})
+        else:
+            self.send_json(404, {"error": {"message": f"No route for GET {path}"}})
+
+    def do_POST(self) -> None:  # noqa: N802
+        payload = self.read_json()
+        if not self.authorized():
+            return
+        path = self.path.split("?", 1)[0]
+        match = DEPLOYMENT_ROUTE.match(path)
+        if match:
+            model, operation = match.groups()
+        elif path == "/openai/responses":
+            model, operation = str(payload.get("model") or ""), "responses"
+        elif path in ("/v1/embeddings", "/v1/chat/completions", "/v1/responses"):
+            model, operation = str(payload.get("model") or ""), path[len("/v1/") :]
+            time.sleep(self.server.gateway_latency)
+        else:
+            self.send_json(404, {"error": {"message": f"No route for POST {path}"}})
+            return
+        if model not in DEPLOYMENTS:
+            self.send_json(404, {"error": {"message": f"Deployment '{model}' not found"}})
+            return
+
+        time.sleep(self.server.latency)
+        if operation == "embeddings":
+            self.reply_embeddings(model, payload)
+        elif operation == "chat/completions":
+            self.reply_chat(model, payload)
+        else:
+            self.reply_responses(model, payload)
+
+    def reply_embeddings(self, model: str, payload: dict) -> None:
+        dimensions = DEPLOYMENTS[model]
+        if dimensions is None:
+            self.send_json(400, {"error": {"message": f"'{model}' is not an embedding model"}})
+            return
+        dimensions = int(payload.get("dimensions") or dimensions)
+        inputs = payload.get("input")
+        texts = [str(text) for text in (inputs if isinstance(inputs, list) else [inputs])]
+        tokens = sum(count_tokens(text) for text in texts)
+        retry_after = self.server.take_embedding_tokens(tokens)
+        if retry_after is not None:
+            headers = {"Retry-After": str(math.ceil(retry_after)), "retry-after-ms": str(int(retry_after * 1000))}
+            self.send_json(429, {"error": {"code": "429", "message": "Rate limit exceeded"}}, headers)
+            return
+        data = [
+            {"object": "embedding", "index": index, "embedding": fake_embedding(text, dimensions)}
+            for index, text in enumerate(texts)
+        ]
+        self.send_json(
+            200,
+            {
+                "object": "list",
+                "model": model,
+                "data": data,
+                "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+            },
+        )
+
+    def reply_chat(self, model: str, payload: dict) -> None:
+        messages = payload.get("messages") or []
+        prompt = " ".join(
+            str(message.get("content", "")) for message in messages if isinstance(message, dict)
+        )
+        if payload.get("stream"):
+            words = self.stream_words()
+            events = [
+                {
+                    "object": "chat.completion.chunk",
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"content": word}}],
+                }
+                for word in words
+            ]
+            usage_event = None
+            if (payload.get("stream_options") or {}).get("include_usage"):
+                usage_event = {
+                    "object": "chat.completion.chunk",
+                    "model": model,
+                    "choices": [],
+                    "usage": {
+                        "prompt_tokens": count_tokens(prompt),
+                        "completion_tokens": len(words),
+                        "total_tokens": count_tokens(prompt) + len(words),
+                    },
+                }
+            self.send_events(events, usage_event)
+            return
+        self.send_json(
+            200,
+            {
+                "object": "chat.completion",
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": "OK"}}],
+                "usage": {
+                    "prompt_tokens": count_tokens(prompt),
+                    "completion_tokens": 1,
+                    "total_tokens": count_tokens(prompt) + 1,
+                },
+            },
+        )
+
+    def reply_responses(self, model: str, payload: dict) -> None:
+        prompt = str(payload.get("input") or "")
+        if payload.get("stream"):
+            words = self.stream_words()
+            events = [{"type": "response.created", "response": {"model": model}}]
+            events += [{"type": "response.output_text.delta", "delta": word} for word in words]
+            completed = {
+                "type": "response.completed",
+                "response": {
+                    "model": model,
+                    "status": "completed",
+                    "usage": {
+                        "input_tokens": count_tokens(prompt),
+                        "output_tokens": len(words),
+                        "total_tokens": count_tokens(prompt) + len(words),
+                    },
+                },
+            }
+            self.send_events(events, completed)
+            return
+        self.send_json(
+            200,
+            {
+                "object": "response",
+                "model": model,
+                "status": "completed",
+                "output": [
+                    {
+                        "type": "message",
+                        "role": "assistant",
+                        "content": [{"type": "output_text", "text": "OK"}],
+                    }
+                ],
+                "usage": {
+                    "input_tokens": count_tokens(prompt),
+                    "output_tokens": 1,
+                    "total_tokens": count_tokens(prompt) + 1,
+                },
+            },
+        )
+
+
+def start_mock_server(
+    host: str = "127.0.0.1",
+    port: int = 0,
+    latency: float = 0.0,
+    stream_chunks: int = 8,
+    chunk_delay: float = 0.01,
+    gateway_latency: float = 0.0,
+    embedding_tokens_per_sec: int = 0,
+) -> MockOpenAIServer:
+    """Start the mock on a daemon thread; ``port=0`` picks a free port (see ``server.url``)."""
+    server = MockOpenAIServer(
+        (host, port), latency, stream_chunks, chunk_delay, gateway_latency, embedding_tokens_per_sec
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Local Azure OpenAI / LiteLLM gateway mock")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="added to every response")
+    parser.add_argument("--stream-chunks", type=int, default=8, help="content events per stream")
+    parser.add_argument("--chunk-delay-ms", type=float, default=10.0, help="gap between events")
+    parser.add_argument("--gateway-latency-ms", type=float, default=0.0, help="extra on /v1 routes")
+    parser.add_argument("--embedding-tps", type=int, default=0, help="embedding tokens/sec before 429s")
+    args = parser.parse_args()
+
+    server = MockOpenAIServer(
+        (args.host, args.port),
+        args.latency_ms / 1000,
+        args.stream_chunks,
+        args.chunk_delay_ms / 1000,
+        args.gateway_latency_ms / 1000,
+        args.embedding_tps,
+    )
+    print(f"Mock OpenAI server listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,65 @@
+"""Compare N single selection calls with one batch call.
+
+Runs the app in-process over httpx's ASGI transport, so the numbers isolate
+service + Redis cost from network and TLS overhead.
+
+Usage (from the state-service directory):
+  pip install -r requirements.txt -r benchmarks/requirements.txt
+  python -m benchmarks.batch_selections --users 1000
+  REDIS_URL=redis://localhost:6379/0 python -m benchmarks.batch_selections --users 1000
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from state_service.main import app
+from state_service.store import backend_name
+
+
+async def run(users: int) -> None:
+    user_ids = [f"bench-{index}" for index in range(users)]
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app), httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        started = time.perf_counter()
+        for user_id in user_ids:
+            response = await client.put(
+                "/state/selection", headers={"X-User-Id": user_id}, json={"selected_model": "gpt-4.1"}
+            )
+            response.raise_for_status()
+        single_put = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for user_id in user_ids:
+            (await client.get("/state/selection", headers={"X-User-Id": user_id})).raise_for_status()
+        single_get = time.perf_counter() - started
+
+        items = [{"user_id": user_id, "selected_model": "gpt-4.1"} for user_id in user_ids]
+        started = time.perf_counter()
+        (await client.post("/state/selections:batchPut", json={"items": items})).raise_for_status()
+        batch_put = time.perf_counter() - started
+
+        started = time.perf_counter()
+        (await client.post("/state/selections:batchGet", json={"user_ids": user_ids})).raise_for_status()
+        batch_get = time.perf_counter() - started
+
+    print(f"backend: {backend_name()}, users: {users}")
+    print(f"{'operation':<12} {'single (ms)':>12} {'batch (ms)':>12} {'speedup':>9}")
+    for name, single, batch in (("put", single_put, batch_put), ("get", single_get, batch_get)):
+        print(f"{name:<12} {single * 1000:>12.1f} {batch * 1000:>12.1f} {single / batch:>8.1f}x")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=1000)
+    args = parser.parse_args()
+    asyncio.run(run(args.users))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Encode+decode micro-benchmark for selection records under each codec.
+
+Usage (from the state-service directory):
+  python -m benchmarks.codec --records 10000
+msgpack is included when installed, as a reference point for binary storage.
+"""
+from __future__ import annotations
+
+import argparse
+import time
+from typing import Any, Callable
+
+from state_service.codec import CODECS
+from state_service.utils import now_iso
+
+
+def selection_records(count: int) -> list[dict[str, Any]]:
+    updated_at = now_iso()
+    return [
+        {
+            "user_id": f"user-{index:06d}",
+            "enabled": index % 3 != 0,
+            "selected_model": f"gpt-4.1-{index % 7}" if index % 3 else None,
+            "updated_at": updated_at,
+        }
+        for index in range(count)
+    ]
+
+
+def measure(
+    records: list[dict[str, Any]], dumps: Callable[[Any], Any], loads: Callable[[Any], Any], rounds: int
+) -> tuple[float, float, int]:
+    best_encode = best_decode = float("inf")
+    encoded: list[Any] = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        encoded = [dumps(record) for record in records]
+        best_encode = min(best_encode, time.perf_counter() - started)
+        started = time.perf_counter()
+        for raw in encoded:
+            loads(raw)
+        best_decode = min(best_decode, time.perf_counter() - started)
+    return best_encode, best_decode, sum(len(raw) for raw in encoded)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=10_000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    records = selection_records(args.records)
+    candidates: list[tuple[str, Callable[[Any], Any], Callable[[Any], Any]]] = [
+        (name, codec.dumps, codec.loads) for name, codec in CODECS.items()
+    ]
+    try:
+        import msgpack  # type: ignore[import-not-found]  # optional, compared when installed
+
+        candidates.append(("msgpack", msgpack.packb, msgpack.unpackb))
+    except ImportError:
+        pass
+
+    print(f"{args.records} selection records, best of {args.rounds} rounds")
+    print(f"{'codec':<10} {'encode (ms)':>12} {'decode (ms)':>12} {'total (ms)':>11} {'bytes':>10}")
+    for name, dumps, loads in candidates:
+        encode, decode, size = measure(records, dumps, loads, args.rounds)
+        print(f"{name:<10} {encode * 1000:>12.2f} {decode * 1000:>12.2f} {(encode + decode) * 1000:>11.2f} {size:>10}")
+
+
+if __name__ == "__main__":
+    main()
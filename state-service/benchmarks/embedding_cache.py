@@ -0,0 +1,101 @@
+"""Embedding cache: stored size per vector and batched lookup/fill latency.
+
+Runs the app in-process over httpx's ASGI transport, like batch_selections.
+
+Usage (from the state-service directory):
+  pip install -r requirements.txt -r benchmarks/requirements.txt
+  python -m benchmarks.embedding_cache --inputs 512 --dimensions 1536
+  REDIS_URL=redis://localhost:6379/0 python -m benchmarks.embedding_cache
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import base64
+import random
+import time
+from typing import Any
+
+import httpx
+
+from state_service import codec
+from state_service.embedding_cache import pack
+from state_service.main import app
+from state_service.store import backend_name
+
+
+async def timed(client: httpx.AsyncClient, path: str, body: dict[str, Any], rounds: int) -> tuple[float, Any]:
+    # Encoded up front so the client's JSON encoding is not timed.
+    content = codec.dumps(body)
+    headers = {"Content-Type": "application/json"}
+    best = float("inf")
+    result: Any = None
+    for _ in range(rounds):
+        started = time.perf_counter()
+        resp = await client.post(path, content=content, headers=headers)
+        best = min(best, time.perf_counter() - started)
+        resp.raise_for_status()
+        result = resp.json()
+    return best, result
+
+
+async def run(inputs: int, dimensions: int, rounds: int) -> None:
+    rng = random.Random(7)
+    run_id = f"{time.time():.0f}"
+    texts = [f"bench {run_id} input {index}" for index in range(inputs)]
+    vectors = [[rng.uniform(-0.1, 0.1) for _ in range(dimensions)] for _ in range(inputs)]
+
+    json_size = sum(len(codec.dumps(vector)) for vector in vectors) / inputs
+    packed_size = sum(len(pack(vector)) for vector in vectors) / inputs
+    print(f"{backend_name()} backend, {inputs} inputs of {dimensions} dimensions, best of {rounds} rounds")
+    print(f"stored bytes per vector: JSON {json_size:,.0f}, float32 {packed_size:,.0f} ({json_size / packed_size:.1f}x)")
+
+    deployment = "bench-embedding"
+    half = inputs // 2
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app), httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        fill_float = {
+            "deployment": deployment,
+            "dimensions": dimensions,
+            "items": [{"input": text, "embedding": vector} for text, vector in zip(texts[:half], vectors[:half])],
+        }
+        fill_base64 = {
+            "deployment": deployment,
+            "dimensions": dimensions,
+            "items": [
+                {"input": text, "embedding": base64.b64encode(pack(vector)).decode("ascii")}
+                for text, vector in zip(texts[half:], vectors[half:])
+            ],
+        }
+        lookup = {"deployment": deployment, "dimensions": dimensions, "inputs": texts}
+        misses = {**lookup, "inputs": [f"{text} (never stored)" for text in texts]}
+        print(f"{'call':<34} {'ms':>9} {'per input (us)':>15}")
+        cases = [
+            (f"fill {half} float lists", "/state/embeddings:fill", fill_float, half),
+            (f"fill {inputs - half} base64", "/state/embeddings:fill", fill_base64, inputs - half),
+            (f"lookup {inputs} hits, float", "/state/embeddings:lookup", lookup, inputs),
+            (f"lookup {inputs} hits, base64", "/state/embeddings:lookup", {**lookup, "encoding_format": "base64"}, inputs),
+            (f"lookup {inputs} misses", "/state/embeddings:lookup", misses, inputs),
+        ]
+        for name, path, body, count in cases:
+            elapsed, result = await timed(client, path, body, rounds)
+            if path.endswith(":lookup") and body is lookup and len(result["data"]) != inputs:
+                raise SystemExit(f"expected {inputs} hits, got {len(result['data'])}")
+            print(f"{name:<34} {elapsed * 1000:>9.2f} {elapsed / count * 1e6:>15.1f}")
+        stats = (await client.get("/state/embeddings/stats")).json()
+        print(f"hit rate so far: {stats['hit_rate']} over {stats['lookups']} lookups")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--inputs", type=int, default=512)
+    parser.add_argument("--dimensions", type=int, default=1536)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+    asyncio.run(run(args.inputs, args.dimensions, args.rounds))
+
+
+if __name__ == "__main__":
+    main()
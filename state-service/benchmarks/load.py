@@ -0,0 +1,358 @@
+"""Load-test the state service under uvicorn with a realistic traffic mix.
+
+Starts the app in a uvicorn subprocess (and, for ``--backend fakeredis``, a
+fakeredis TCP server), seeds ``--users`` registered selections, then for
+``--duration`` seconds drives:
+
+- dashboards: each polls the catalog (with If-None-Match), its own selection
+  and the recent-selections list, like dashboard/app.js;
+- writers: bursts of concurrent selection PUTs every ``--burst-interval``;
+- one catalog publisher: a catalog PUT every ``--catalog-interval``.
+
+Reports requests/s and p50/p95/p99 latency per route, and writes the same
+numbers as JSON so runs from different commits can be diffed. The load
+generator is a single asyncio process; give it its own cores (or compare runs
+from the same machine only), otherwise client overhead shows up as latency.
+
+Usage (from the state-service directory):
+  pip install -r requirements.txt -r benchmarks/requirements.txt
+  python -m benchmarks.load --backend memory --users 10000
+  python -m benchmarks.load --backend fakeredis --users 10000 --output load.json
+  python -m benchmarks.load --backend redis --redis-url redis://localhost:6379/15 \\
+      --users 1000000 --dashboards 200 --baseline load.json
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any
+
+import httpx
+
+SERVICE_DIR = Path(__file__).resolve().parents[1]
+SEED_BATCH = 1000
+MODELS = ("gpt-4.1", "gpt-4.1-mini", "gpt-4o", "o4-mini", "text-embedding-3-large")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(ordered: list[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))]
+
+
+class Recorder:
+    def __init__(self) -> None:
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+        self.recording = False
+
+    async def call(self, route: str, request: Any) -> httpx.Response | None:
+        started = time.perf_counter()
+        try:
+            response = await request
+        except httpx.HTTPError:
+            if self.recording:
+                self.errors[route] += 1
+            return None
+        if self.recording:
+            self.latencies[route].append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                self.errors[route] += 1
+        return response
+
+    def summary(self, seconds: float) -> dict[str, dict[str, float]]:
+        routes: dict[str, dict[str, float]] = {}
+        for route in sorted(set(self.latencies) | set(self.errors)):
+            ordered = sorted(self.latencies[route])
+            routes[route] = {
+                "requests": len(ordered),
+                "errors": self.errors[route],
+                "rps": round(len(ordered) / seconds, 1),
+                "p50_ms": round(percentile(ordered, 0.50) * 1000, 3),
+                "p95_ms": round(percentile(ordered, 0.95) * 1000, 3),
+                "p99_ms": round(percentile(ordered, 0.99) * 1000, 3),
+                "max_ms": round((ordered[-1] if ordered else 0.0) * 1000, 3),
+            }
+        return routes
+
+
+async def dashboard(
+    client: httpx.AsyncClient, recorder: Recorder, user_id: str, think: float
+) -> None:
+    headers = {"X-User-Id": user_id}
+    etag: str | None = None
+    while True:
+        conditional = {"If-None-Match": etag} if etag else {}
+        response = await recorder.call(
+            "GET /state/catalog", client.get("/state/catalog", headers=conditional)
+        )
+        if response is not None and response.status_code in (200, 304):
+            etag = response.headers.get("ETag", etag)
+        await recorder.call("GET /state/selection", client.get("/state/selection", headers=headers))
+        await recorder.call(
+            "GET /state/selections", client.get("/state/selections?limit=10", headers=headers)
+        )
+        await asyncio.sleep(think)
+
+
+async def writer(
+    client: httpx.AsyncClient, recorder: Recorder, users: int, burst: int, interval: float
+) -> None:
+    rng = random.Random(0)
+    while True:
+        await asyncio.gather(
+            *(
+                recorder.call(
+                    "PUT /state/selection",
+                    client.put(
+                        "/state/selection",
+                        headers={"X-User-Id": f"user-{rng.randrange(users)}"},
+                        json={"enabled": True, "selected_model": rng.choice(MODELS)},
+                    ),
+                )
+                for _ in range(burst)
+            )
+        )
+        await asyncio.sleep(interval)
+
+
+async def catalog_publisher(client: httpx.AsyncClient, recorder: Recorder, interval: float) -> None:
+    rng = random.Random(1)
+    while True:
+        models = sorted(rng.sample(MODELS, rng.randint(2, len(MODELS))))
+        body = {"models": models, "status": "ok"}
+        await recorder.call("PUT /state/catalog", client.put("/state/catalog", json=body))
+        await asyncio.sleep(interval)
+
+
+async def seed(client: httpx.AsyncClient, users: int) -> float:
+    started = time.perf_counter()
+    for start in range(0, users, SEED_BATCH):
+        items = [
+            {
+                "user_id": f"user-{index}",
+                "enabled": True,
+                "selected_model": MODELS[index % len(MODELS)],
+            }
+            for index in range(start, min(start + SEED_BATCH, users))
+        ]
+        response = await client.post("/state/selections:batchPut", json={"items": items})
+        response.raise_for_status()
+    return time.perf_counter() - started
+
+
+async def wait_until_healthy(client: httpx.AsyncClient, server: subprocess.Popen[bytes]) -> None:
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError("uvicorn exited during startup")
+        try:
+            if (await client.get("/healthz")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.1)
+    raise RuntimeError("state service did not become healthy within 30s")
+
+
+async def drive(
+    args: argparse.Namespace, base_url: str, server: subprocess.Popen[bytes]
+) -> dict[str, Any]:
+    limits = httpx.Limits(
+        max_connections=args.dashboards + args.burst + 1, max_keepalive_connections=None
+    )
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        await wait_until_healthy(client, server)
+        seed_seconds = await seed(client, args.users)
+
+        recorder = Recorder()
+        rng = random.Random(2)
+        workers = [
+            dashboard(client, recorder, f"user-{rng.randrange(args.users)}", args.think_time)
+            for _ in range(args.dashboards)
+        ]
+        workers.append(writer(client, recorder, args.users, args.burst, args.burst_interval))
+        workers.append(catalog_publisher(client, recorder, args.catalog_interval))
+        tasks = [asyncio.create_task(worker) for worker in workers]
+
+        await asyncio.sleep(args.warmup)
+        recorder.recording = True
+        started = time.perf_counter()
+        await asyncio.sleep(args.duration)
+        recorder.recording = False
+        elapsed = time.perf_counter() - started
+
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    return {"seed_seconds": round(seed_seconds, 3), "routes": recorder.summary(elapsed)}
+
+
+def git_commit() -> str | None:
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=SERVICE_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+
+def start_processes(args: argparse.Namespace, port: int) -> list[subprocess.Popen[bytes]]:
+    env = {**os.environ, "STATE_SERVICE_SHARED_TOKEN": ""}
+    env.pop("REDIS_URL", None)
+    processes: list[subprocess.Popen[bytes]] = []
+    if args.backend == "redis":
+        env["REDIS_URL"] = args.redis_url
+    elif args.backend == "fakeredis":
+        redis_port = free_port()
+        processes.append(
+            subprocess.Popen(
+                [
+                    sys.executable,
+                    "-c",
+                    "import sys; from fakeredis import TcpFakeServer; "
+                    "TcpFakeServer(('127.0.0.1', int(sys.argv[1])), server_type='redis')"
+                    ".serve_forever()",
+                    str(redis_port),
+                ]
+            )
+        )
+        env["REDIS_URL"] = f"redis://127.0.0.1:{redis_port}/0"
+        time.sleep(1)
+    processes.append(
+        subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "uvicorn",
+                "state_service.main:app",
+                "--host",
+                "127.0.0.1",
+                "--port",
+                str(port),
+                "--log-level",
+                "warning",
+                "--no-access-log",
+            ],
+            cwd=SERVICE_DIR,
+            env=env,
+        )
+    )
+    return processes
+
+
+def print_report(report: dict[str, Any], baseline: dict[str, Any] | None) -> None:
+    meta = report["meta"]
+    print(
+        f"backend: {meta['backend']}, users: {meta['users']}, dashboards: {meta['dashboards']}, "
+        f"duration: {meta['duration']}s, seed: {report['seed_seconds']}s"
+    )
+    header = f"{'route':<24} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}"
+    print(header, end="")
+    print(f" {'p95 vs base':>12}" if baseline else "")
+    for route, stats in report["routes"].items():
+        line = (
+            f"{route:<24} {stats['rps']:>9.1f} {stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} "
+            f"{stats['p99_ms']:>9.2f} {stats['errors']:>7}"
+        )
+        base = (baseline or {}).get("routes", {}).get(route)
+        if base and base["p95_ms"]:
+            line += f" {(stats['p95_ms'] / base['p95_ms'] - 1) * 100:>+11.1f}%"
+        print(line)
+
+
+def regressions(report: dict[str, Any], baseline: dict[str, Any], threshold: float) -> list[str]:
+    failed = []
+    for route, stats in report["routes"].items():
+        base = baseline.get("routes", {}).get(route)
+        if base and base["p95_ms"] and stats["p95_ms"] > base["p95_ms"] * (1 + threshold / 100):
+            failed.append(route)
+    return failed
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", choices=["memory", "fakeredis", "redis"], default="memory")
+    parser.add_argument("--redis-url", default="redis://localhost:6379/15")
+    parser.add_argument("--users", type=int, default=10_000, help="registered users to seed")
+    parser.add_argument("--dashboards", type=int, default=50, help="concurrent polling dashboards")
+    parser.add_argument(
+        "--think-time", type=float, default=0.0, help="pause between dashboard polls"
+    )
+    parser.add_argument("--burst", type=int, default=20, help="selection PUTs per burst")
+    parser.add_argument("--burst-interval", type=float, default=0.5)
+    parser.add_argument("--catalog-interval", type=float, default=5.0)
+    parser.add_argument("--warmup", type=float, default=2.0)
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--output", type=Path, help="write the JSON report here")
+    parser.add_argument("--baseline", type=Path, help="JSON report to compare p95 latency against")
+    parser.add_argument(
+        "--max-regression",
+        type=float,
+        default=20.0,
+        help="fail if a route's p95 grows by more than this %%",
+    )
+    args = parser.parse_args()
+    if args.backend == "redis" and not args.redis_url:
+        parser.error("--redis-url is required for --backend redis")
+
+    port = free_port()
+    processes = start_processes(args, port)
+    try:
+        report = asyncio.run(drive(args, f"http://127.0.0.1:{port}", processes[-1]))
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+            process.wait(timeout=10)
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "backend": args.backend,
+            "users": args.users,
+            "dashboards": args.dashboards,
+            "burst": args.burst,
+            "duration": args.duration,
+            "python": platform.python_version(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        },
+        **report,
+    }
+    baseline = json.loads(args.baseline.read_text()) if args.baseline else None
+    print_report(report, baseline)
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2) + "\n")
+
+    if baseline:
+        failed = regressions(report, baseline, args.max_regression)
+        if failed:
+            print(f"p95 regressed by more than {args.max_regression}% on: {', '.join(failed)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
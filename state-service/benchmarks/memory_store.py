@@ -0,0 +1,140 @@
+"""Memory and latency of the in-memory selection store: slotted records vs per-user dicts.
+
+Usage (from the state-service directory):
+  python -m benchmarks.memory_store --users 200000
+"dict" is the previous layout (the API dict per user, a (score, user_id)
+tuple index and a score map); "copy+sort" pages by copying and sorting every
+dict on updated_at, as the first memory backend did. Events are not emitted,
+so only the stores themselves are measured.
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import time
+import tracemalloc
+from bisect import bisect_left, insort
+from typing import Any, Callable, Iterator
+
+from state_service.store import IndexPosition, InMemoryStore, _page
+from state_service.utils import epoch_to_iso
+
+MODELS = [f"gpt-4.1-{index}" for index in range(12)]
+
+
+class DictStore:
+    """The memory backend's selection layout before SelectionRecord."""
+
+    def __init__(self) -> None:
+        self.users: dict[str, dict[str, Any]] = {}
+        self.recency: list[IndexPosition] = []
+        self.scores: dict[str, float] = {}
+
+    def put_selection(self, value: dict[str, Any], score: float) -> None:
+        user_id = value["user_id"]
+        previous = self.scores.get(user_id)
+        if previous is not None:
+            del self.recency[bisect_left(self.recency, (previous, user_id))]
+        insort(self.recency, (score, user_id))
+        self.scores[user_id] = score
+        self.users[user_id] = value
+
+    def selection(self, user_id: str) -> dict[str, Any] | None:
+        return self.users.get(user_id)
+
+    def iter_recent(self, after: IndexPosition | None = None) -> Iterator[IndexPosition]:
+        end = len(self.recency) if after is None else bisect_left(self.recency, after)
+        for index in range(end - 1, -1, -1):
+            yield self.recency[index]
+
+    def lookup(self, user_id: str) -> dict[str, Any]:
+        return self.users[user_id]
+
+
+class RecordStore(InMemoryStore):
+    def emit(self, event_type: str, value: dict[str, Any]) -> None:
+        pass
+
+    def lookup(self, user_id: str) -> dict[str, Any]:
+        return self.users[user_id].as_dict()
+
+
+def selection(user_id: str, epoch: float) -> tuple[dict[str, Any], float]:
+    # Fresh strings per value, as JSON decoding of a request body would produce.
+    model = "".join(random.choice(MODELS))
+    return {"user_id": user_id, "enabled": True, "selected_model": model, "updated_at": epoch_to_iso(epoch)}, epoch
+
+
+def fill(store: Any, users: int, start: float) -> float:
+    began = time.perf_counter()
+    for index in range(users):
+        store.put_selection(*selection(f"user-{index:07d}", start + index * 0.001))
+    return time.perf_counter() - began
+
+
+def traced_size(make_store: Callable[[], Any], users: int, start: float) -> int:
+    """Bytes still allocated by a filled store; tracing slows filling, so it is timed separately."""
+    tracemalloc.start()
+    store = make_store()
+    fill(store, users, start)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del store
+    return size
+
+
+def per_call_us(calls: int, run: Callable[[], object]) -> float:
+    began = time.perf_counter()
+    for _ in range(calls):
+        run()
+    return (time.perf_counter() - began) / calls * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=200_000)
+    parser.add_argument("--calls", type=int, default=2_000)
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    start = time.time() - args.users
+    rng = random.Random(7)
+    user_ids = [f"user-{rng.randrange(args.users):07d}" for _ in range(args.calls)]
+
+    print(f"{args.users} users, page size {args.limit}, {args.calls} calls per operation")
+    print(
+        f"{'store':<10} {'fill (s)':>9} {'MiB':>8} {'B/user':>7} {'get (us)':>9} {'page 1 (us)':>12} "
+        f"{'deep page (us)':>15} {'update (us)':>12}"
+    )
+    for name, make_store in (("dict", DictStore), ("records", RecordStore)):
+        size = traced_size(make_store, args.users, start)
+        store: Any = make_store()
+        fill_seconds = fill(store, args.users, start)
+        ids = iter(user_ids * 2)
+        middle = next(store.iter_recent()) if args.users else None
+        deep = (middle[0] - args.users * 0.0005, middle[1]) if middle else None
+        get_us = per_call_us(args.calls, lambda: store.selection(next(ids)))
+        page_us = per_call_us(args.calls, lambda: _page(store.iter_recent(), store.lookup, args.limit, None, None))
+        deep_us = per_call_us(
+            args.calls, lambda: _page(store.iter_recent(deep), store.lookup, args.limit, deep, None)
+        )
+        clock = iter(range(args.calls))
+        update_us = per_call_us(
+            args.calls, lambda: store.put_selection(*selection(next(ids), time.time() + next(clock)))
+        )
+        print(
+            f"{name:<10} {fill_seconds:>9.2f} {size / 2**20:>8.1f} {size / max(args.users, 1):>7.0f} "
+            f"{get_us:>9.2f} {page_us:>12.2f} {deep_us:>15.2f} {update_us:>12.2f}"
+        )
+        if name == "dict":
+            by_time = store.users
+
+            def copy_sort() -> list[dict[str, Any]]:
+                return sorted(by_time.values(), key=lambda value: value["updated_at"], reverse=True)[: args.limit]
+
+            sort_calls = max(1, args.calls // 200)
+            print(f"{'copy+sort':<10} {'':>9} {'':>8} {'':>7} {'':>9} {per_call_us(sort_calls, copy_sort):>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Quantify the per-request cost of the Prometheus middleware.
+
+Drives the ASGI app directly (no HTTP client, no sockets) with and without
+instrumentation so the difference is the middleware plus metric updates.
+
+Usage (from the state-service directory):
+  python -m benchmarks.metrics_overhead --requests 20000
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+from typing import Any
+
+from fastapi import FastAPI
+from starlette.types import Message
+
+from state_service.main import create_app
+
+ROUTES = (
+    ("GET", "/state/catalog"),
+    ("GET", "/state/selection"),
+    ("GET", "/state/selections"),
+)
+
+
+async def drive(app: FastAPI, method: str, path: str, requests: int) -> float:
+    scope: dict[str, Any] = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"host", b"bench"), (b"x-user-id", b"bench-user")],
+        "client": ("127.0.0.1", 1),
+        "server": ("bench", 80),
+    }
+
+    async def receive() -> Message:
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: Message) -> None:
+        if message["type"] == "http.response.start" and message["status"] >= 400:
+            raise RuntimeError(f"{path} returned {message['status']}")
+
+    for _ in range(min(requests, 500)):
+        await app(dict(scope), receive, send)
+    started = time.perf_counter()
+    for _ in range(requests):
+        await app(dict(scope), receive, send)
+    return (time.perf_counter() - started) / requests
+
+
+async def run(requests: int) -> None:
+    plain = create_app(instrumented=False)
+    instrumented = create_app(instrumented=True)
+    async with plain.router.lifespan_context(plain), instrumented.router.lifespan_context(instrumented):
+        print(f"{requests} requests per route, in-process ASGI")
+        print(f"{'route':<22} {'plain (us)':>11} {'metrics (us)':>13} {'overhead (us)':>14}")
+        for method, path in ROUTES:
+            base = await drive(plain, method, path, requests)
+            with_metrics = await drive(instrumented, method, path, requests)
+            print(
+                f"{method + ' ' + path:<22} {base * 1e6:>11.1f} {with_metrics * 1e6:>13.1f}"
+                f" {(with_metrics - base) * 1e6:>14.1f}"
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20_000)
+    args = parser.parse_args()
+    asyncio.run(run(args.requests))
+
+
+if __name__ == "__main__":
+    main()
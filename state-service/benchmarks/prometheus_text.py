@@ -0,0 +1,144 @@
+"""Prometheus text parsing: state_service.prometheus_text vs prometheus_client vs a regex scan.
+
+Usage (from the state-service directory):
+  python -m benchmarks.prometheus_text --series 5000
+The synthetic scrape mimics a LiteLLM /metrics page (many label combinations,
+histograms, escaped label values, NaN/Inf and timestamps). Per-name sums are
+checked against prometheus_client's parser before anything is timed.
+"""
+from __future__ import annotations
+
+import argparse
+import math
+import re
+import time
+from typing import Callable
+
+from prometheus_client.parser import text_string_to_metric_families
+
+from state_service.gateway_metrics import SOURCE_SERIES
+from state_service.prometheus_text import iter_samples, parse_labels, sum_by_name
+
+# The dashboard's former client-side parser, ported line for line.
+SAMPLE_RE = re.compile(r"^([^\s{]+)(?:\{[^}]*\})?\s+([\d.eE+\-NaInf]+)")
+
+EDGE_CASES = """\
+# HELP litellm_requests_metric_total Total requests
+# TYPE litellm_requests_metric_total counter
+litellm_requests_metric_total{end_user="a \\"quoted\\" user",model="gpt-4.1"} 3
+litellm_requests_metric_total{end_user="brace } user",model="gpt-4.1"} 4 1700000000000
+litellm_requests_metric_total{end_user="back\\\\slash",model="x"} 5
+litellm_requests_metric_total{end_user="new\\nline",model="y"} 6
+# TYPE litellm_remaining_tokens gauge
+litellm_remaining_tokens{model="a"} NaN
+litellm_remaining_tokens{model="b"} +Inf
+litellm_remaining_tokens{model="c"} 12
+"""
+
+
+def synthetic_scrape(series: int) -> str:
+    lines = []
+    models = [f"gpt-4.1-{index}" for index in range(8)]
+    counters = (
+        "litellm_requests_metric_total",
+        "litellm_total_tokens_total",
+        "litellm_input_tokens_total",
+        "litellm_output_tokens_total",
+        "litellm_llm_api_failed_requests_metric_total",
+        "litellm_deployment_success_responses_total",
+    )
+    per_counter = max(1, series // (len(counters) + 12))
+    for name in counters:
+        lines.append(f"# HELP {name} {name.replace('_', ' ')}")
+        lines.append(f"# TYPE {name} counter")
+        for index in range(per_counter):
+            labels = (
+                f'end_user="user-{index:05d}",hashed_api_key="{index * 7919:016x}",'
+                f'api_key_alias="team {index % 13}",model="{models[index % len(models)]}",'
+                f'team="t{index % 5}",user="u{index % 97}"'
+            )
+            lines.append(f"{name}{{{labels}}} {index * 3 + 1}.0")
+    name = "litellm_request_total_latency_metric"
+    lines.append(f"# TYPE {name} histogram")
+    for index in range(per_counter):
+        labels = f'model="{models[index % len(models)]}",end_user="user-{index:05d}"'
+        for bucket in ("0.005", "0.05", "0.5", "1.0", "5.0", "10.0", "30.0", "60.0", "+Inf"):
+            lines.append(f'{name}_bucket{{{labels},le="{bucket}"}} {index}.0')
+        lines.append(f"{name}_sum{{{labels}}} {index * 0.25}")
+        lines.append(f"{name}_count{{{labels}}} {index}.0")
+    return "\n".join(lines) + "\n" + EDGE_CASES
+
+
+def reference_sums(text: str) -> dict[str, float]:
+    sums: dict[str, float] = {}
+    for family in text_string_to_metric_families(text):
+        for sample in family.samples:
+            if not math.isnan(sample.value):
+                sums[sample.name] = sums.get(sample.name, 0.0) + sample.value
+    return sums
+
+
+def regex_sums(text: str) -> dict[str, float]:
+    sums: dict[str, float] = {}
+    for line in text.split("\n"):
+        if line.startswith("#") or not line.strip():
+            continue
+        match = SAMPLE_RE.match(line)
+        if match:
+            value = float(match.group(2))
+            if not math.isnan(value):
+                sums[match.group(1)] = sums.get(match.group(1), 0.0) + value
+    return sums
+
+
+def check(text: str) -> None:
+    expected = reference_sums(text)
+    actual = sum_by_name(text)
+    mismatched = {
+        name: (actual.get(name), value)
+        for name, value in expected.items()
+        if name in actual and not math.isclose(actual[name], value, rel_tol=1e-9)
+    }
+    missing = set(expected) - set(actual)
+    if mismatched or missing:
+        raise SystemExit(f"mismatch against prometheus_client: {mismatched or ''} {sorted(missing) or ''}")
+
+    labels = [parse_labels(raw) for name, raw, _ in iter_samples(EDGE_CASES, {"litellm_requests_metric_total"})]
+    users = [item["end_user"] for item in labels]
+    assert users == ['a "quoted" user', "brace } user", "back\\slash", "new\nline"], users
+
+
+def best_of(rounds: int, parse: Callable[[], object]) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        started = time.perf_counter()
+        parse()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--series", type=int, default=5_000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    text = synthetic_scrape(args.series)
+    check(text)
+    sample_lines = sum(1 for line in text.splitlines() if line and not line.startswith("#"))
+    print(f"{sample_lines} samples, {len(text) / 1024:.0f} KiB, best of {args.rounds} rounds; sums match prometheus_client")
+
+    candidates: list[tuple[str, Callable[[], object]]] = [
+        ("prometheus_text (summary series)", lambda: sum_by_name(text, SOURCE_SERIES)),
+        ("prometheus_text (all series)", lambda: sum_by_name(text)),
+        ("regex line scan", lambda: regex_sums(text)),
+        ("prometheus_client parser", lambda: reference_sums(text)),
+    ]
+    print(f"{'parser':<34} {'ms':>9} {'samples/s':>12}")
+    for name, parse in candidates:
+        elapsed = best_of(args.rounds, parse)
+        print(f"{name:<34} {elapsed * 1000:>9.2f} {sample_lines / elapsed:>12,.0f}")
+
+
+if __name__ == "__main__":
+    main()
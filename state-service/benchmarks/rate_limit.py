@@ -0,0 +1,89 @@
+"""Rate-limit check throughput: the GCRA core, rate_limit.check() and the HTTP route.
+
+Usage (from the state-service directory):
+  pip install -r requirements.txt -r benchmarks/requirements.txt
+  python -m benchmarks.rate_limit --checks 50000
+  REDIS_URL=redis://localhost:6379/0 python -m benchmarks.rate_limit --concurrency 64
+Each check charges a user requests/min and tokens/min limit and a model
+tokens/min limit, the worst case of three buckets. With REDIS_URL, checks run
+with --concurrency in flight, as concurrent requests would.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import time
+from typing import Awaitable, Callable
+
+# Limits high enough that the run measures admission, not denial.
+os.environ.setdefault("RATE_LIMIT_USER_REQUESTS_PER_MINUTE", "1000000")
+os.environ.setdefault("RATE_LIMIT_USER_TOKENS_PER_MINUTE", "100000000")
+os.environ.setdefault("RATE_LIMIT_MODEL_TOKENS_PER_MINUTE", "1000000000")
+
+import httpx  # noqa: E402
+
+from state_service import rate_limit, store  # noqa: E402
+from state_service.main import app  # noqa: E402
+
+
+def report(name: str, checks: int, seconds: float) -> None:
+    print(f"{name:<40} {checks / seconds:>12,.0f} {seconds / checks * 1e6:>10.1f}")
+
+
+async def concurrently(checks: int, concurrency: int, run: Callable[[int], Awaitable[object]]) -> float:
+    counter = iter(range(checks))
+
+    async def worker() -> None:
+        for index in counter:
+            await run(index)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - started
+
+
+async def run(checks: int, users: int, concurrency: int) -> None:
+    user_ids = [f"bench-{index}" for index in range(users)]
+    print(f"{store.backend_name()} backend, {checks} checks over {users} users, {concurrency} in flight")
+    print(f"{'path':<40} {'checks/s':>12} {'us/check':>10}")
+
+    buckets = [bucket for _, _, bucket in rate_limit.buckets_for(user_ids[0], "gpt-4.1", 1, 500)]
+    memory = store.InMemoryStore()
+    started = time.perf_counter()
+    for _ in range(checks):
+        memory.consume_rate_limits(buckets, time.time() * 1000)
+    report("GCRA core (memory, 3 buckets)", checks, time.perf_counter() - started)
+
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app), httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        elapsed = await concurrently(
+            checks, concurrency, lambda index: rate_limit.check(user_ids[index % users], "gpt-4.1", 1, 500)
+        )
+        report("rate_limit.check()", checks, elapsed)
+
+        body = {"model": "gpt-4.1", "tokens": 500}
+        http_checks = max(1, checks // 10)
+        elapsed = await concurrently(
+            http_checks,
+            concurrency,
+            lambda index: client.post(
+                "/state/ratelimit:check", json=body, headers={"X-User-Id": user_ids[index % users]}
+            ),
+        )
+        report("POST /state/ratelimit:check (ASGI)", http_checks, elapsed)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--checks", type=int, default=50_000)
+    parser.add_argument("--users", type=int, default=1_000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+    asyncio.run(run(args.checks, args.users, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""Cold-start latency: app import time, time to first /healthz and to the first Redis read.
+
+Every measurement starts a fresh interpreter, as a replica scaled up from zero
+does. Import time is taken in a bare ``python -c "import state_service.main"``;
+the other two from spawning ``python -m state_service.serve`` (the container
+command, so SERVE_* settings apply) until ``/healthz`` answers, and then until
+a selection read answers, which goes to Redis (or the memory backend with
+``--backend memory``). Medians over ``--runs`` are compared with ``--baseline``
+like benchmarks.load does for latency; ``--budget-ms`` also fails a run whose
+median time to first read exceeds it, for CI machines without a baseline.
+
+Usage (from the state-service directory):
+  pip install -r requirements.txt -r benchmarks/requirements.txt
+  python -m benchmarks.startup --runs 10
+  python -m benchmarks.startup --backend fakeredis --output startup.json
+  SERVE_FAST_LOOP=1 python -m benchmarks.startup --backend fakeredis --baseline startup.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any
+
+import httpx
+
+from benchmarks.load import SERVICE_DIR, free_port, git_commit
+
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import state_service.main; print(time.perf_counter() - t)"
+METRICS = ("import_ms", "first_healthz_ms", "first_read_ms")
+
+
+def measure_import(env: dict[str, str]) -> float:
+    result = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET], cwd=SERVICE_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    return float(result.stdout) * 1000
+
+
+def measure_serve(env: dict[str, str], timeout: float = 30.0) -> tuple[float, float]:
+    """Milliseconds from spawning the server to its first /healthz answer and first selection read."""
+    port = free_port()
+    env = {**env, "SERVE_HOST": "127.0.0.1", "SERVE_PORT": str(port)}
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "state_service.serve"],
+        cwd=SERVICE_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=timeout) as client:
+            while True:
+                if server.poll() is not None:
+                    raise RuntimeError("state service exited during startup")
+                if time.perf_counter() - started > timeout:
+                    raise RuntimeError(f"state service did not answer /healthz within {timeout:.0f}s")
+                try:
+                    if client.get("/healthz").status_code == 200:
+                        break
+                except httpx.TransportError:
+                    time.sleep(0.002)
+            first_healthz = time.perf_counter() - started
+            client.get("/state/selection", headers={"X-User-Id": "startup-bench"}).raise_for_status()
+            first_read = time.perf_counter() - started
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+    return first_healthz * 1000, first_read * 1000
+
+
+def summarize(samples: list[float]) -> dict[str, float]:
+    return {
+        "median": round(statistics.median(samples), 1),
+        "min": round(min(samples), 1),
+        "max": round(max(samples), 1),
+    }
+
+
+def print_report(report: dict[str, Any], baseline: dict[str, Any] | None) -> None:
+    meta = report["meta"]
+    print(
+        f"backend: {meta['backend']}, runs: {meta['runs']}, workers: {meta['workers']}, "
+        f"fast loop: {meta['fast_loop']}, python {meta['python']}"
+    )
+    print(f"{'metric':<18} {'median':>9} {'min':>9} {'max':>9}", end="")
+    print(f" {'vs base':>9}" if baseline else "")
+    for metric in METRICS:
+        stats = report[metric]
+        line = f"{metric:<18} {stats['median']:>9.1f} {stats['min']:>9.1f} {stats['max']:>9.1f}"
+        base = (baseline or {}).get(metric)
+        if base and base["median"]:
+            line += f" {(stats['median'] / base['median'] - 1) * 100:>+8.1f}%"
+        print(line)
+
+
+def regressions(report: dict[str, Any], baseline: dict[str, Any], threshold: float) -> list[str]:
+    failed = []
+    for metric in METRICS:
+        base = baseline.get(metric)
+        if base and base["median"] and report[metric]["median"] > base["median"] * (1 + threshold / 100):
+            failed.append(metric)
+    return failed
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", choices=["memory", "fakeredis", "redis"], default="memory")
+    parser.add_argument("--redis-url", default="redis://localhost:6379/15")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--output", type=Path, help="write the JSON report here")
+    parser.add_argument("--baseline", type=Path, help="JSON report to compare medians against")
+    parser.add_argument(
+        "--max-regression", type=float, default=20.0, help="fail if a median grows by more than this %%"
+    )
+    parser.add_argument("--budget-ms", type=float, help="fail if the median time to first read exceeds this")
+    args = parser.parse_args()
+
+    env = {**os.environ, "STATE_SERVICE_SHARED_TOKEN": ""}
+    env.pop("REDIS_URL", None)
+    fake_server = None
+    if args.backend == "redis":
+        env["REDIS_URL"] = args.redis_url
+    elif args.backend == "fakeredis":
+        redis_port = free_port()
+        fake_server = subprocess.Popen(
+            [
+                sys.executable,
+                "-c",
+                "import sys; from fakeredis import TcpFakeServer; "
+                "TcpFakeServer(('127.0.0.1', int(sys.argv[1])), server_type='redis').serve_forever()",
+                str(redis_port),
+            ]
+        )
+        env["REDIS_URL"] = f"redis://127.0.0.1:{redis_port}/0"
+        time.sleep(1)
+
+    samples: dict[str, list[float]] = {metric: [] for metric in METRICS}
+    try:
+        for _ in range(args.runs):
+            samples["import_ms"].append(measure_import(env))
+            first_healthz, first_read = measure_serve(env)
+            samples["first_healthz_ms"].append(first_healthz)
+            samples["first_read_ms"].append(first_read)
+    finally:
+        if fake_server is not None:
+            fake_server.terminate()
+            fake_server.wait(timeout=10)
+
+    report: dict[str, Any] = {
+        "meta": {
+            "commit": git_commit(),
+            "backend": args.backend,
+            "runs": args.runs,
+            "workers": env.get("SERVE_WORKERS", "1"),
+            "fast_loop": env.get("SERVE_FAST_LOOP", ""),
+            "python": platform.python_version(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        },
+        **{metric: summarize(values) for metric, values in samples.items()},
+    }
+    baseline = json.loads(args.baseline.read_text()) if args.baseline else None
+    print_report(report, baseline)
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2) + "\n")
+
+    failed = regressions(report, baseline, args.max_regression) if baseline else []
+    if failed:
+        print(f"Cold start regressed by more than {args.max_regression}% on: {', '.join(failed)}")
+    if args.budget_ms is not None and report["first_read_ms"]["median"] > args.budget_ms:
+        print(f"Median time to first read {report['first_read_ms']['median']}ms exceeds {args.budget_ms}ms")
+        failed.append("first_read_ms")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from typing import Any
+
+from . import codec
+from .config import CATALOG_CACHE_TTL_SECONDS, CATALOG_KEY
+from .metrics import observe_catalog_write
+from .store import CATALOG_APPLIED, CATALOG_QUEUED, put_catalog_if_changed, read_json
+
+EMPTY_CATALOG: dict[str, Any] = {"models": [], "status": "unavailable", "updated_at": None}
+
+
+@dataclass(frozen=True)
+class CachedCatalog:
+    value: dict[str, Any]
+    body: bytes
+    etag: str
+    loaded_at: float
+
+    @classmethod
+    def build(cls, value: dict[str, Any]) -> CachedCatalog:
+        body = codec.dumps(value)
+        etag = f'"v{value.get("version") or 0}"'
+        return cls(value=value, body=body, etag=etag, loaded_at=time.monotonic())
+
+
+class CatalogCache:
+    """Per-process copy of the decoded catalog and its serialized body.
+
+    Entries never expire while the change listener is subscribed; other
+    replicas' writes arrive as catalog events. When the listener is down the
+    entry falls back to ``ttl_seconds`` so staleness stays bounded.
+    """
+
+    def __init__(self, ttl_seconds: float) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.entry: CachedCatalog | None = None
+        self.listening = False
+        # Bumped on every invalidation so an in-flight load can't repopulate stale data.
+        self.generation = 0
+
+    def get(self) -> CachedCatalog | None:
+        entry = self.entry
+        if entry is None:
+            return None
+        if not self.listening and time.monotonic() - entry.loaded_at > self.ttl_seconds:
+            return None
+        return entry
+
+    def store(self, entry: CachedCatalog, generation: int) -> None:
+        if generation == self.generation:
+            self.entry = entry
+
+    def invalidate(self) -> None:
+        self.generation += 1
+        self.entry = None
+
+    def adopt(self, value: dict[str, Any]) -> None:
+        """Take a catalog pushed by a change event unless we already hold it or newer."""
+        current = self.entry
+        if current is not None and (current.value.get("version") or 0) >= (value.get("version") or 0):
+            return
+        self.invalidate()
+        self.entry = CachedCatalog.build(value)
+
+
+catalog_cache = CatalogCache(CATALOG_CACHE_TTL_SECONDS)
+
+
+async def load_catalog() -> CachedCatalog:
+    entry = catalog_cache.get()
+    if entry is not None:
+        return entry
+    generation = catalog_cache.generation
+    entry = CachedCatalog.build(await read_json(CATALOG_KEY) or EMPTY_CATALOG)
+    catalog_cache.store(entry, generation)
+    return entry
+
+
+async def save_catalog(
+    value: dict[str, Any], fingerprint: str, expected_version: int | None = None
+) -> tuple[str, int, CachedCatalog | None]:
+    outcome, version, stored = await put_catalog_if_changed(value, fingerprint, expected_version)
+    observe_catalog_write(outcome)
+    if stored is None:
+        return outcome, version, None
+
+    if outcome in (CATALOG_APPLIED, CATALOG_QUEUED):
+        catalog_cache.invalidate()
+    entry = CachedCatalog.build(stored)
+    catalog_cache.store(entry, catalog_cache.generation)
+    return outcome, version, entry
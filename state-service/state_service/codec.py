@@ -0,0 +1,48 @@
+"""JSON codec used for everything the service stores, publishes and returns.
+
+``orjson`` is used when installed and falls back to the stdlib ``json`` module;
+``STATE_JSON_CODEC`` forces one or the other. Both emit compact UTF-8 bytes and
+raise ``ValueError`` subclasses on malformed input.
+"""
+from __future__ import annotations
+
+import json
+import os
+from typing import Any, Callable
+
+
+class Codec:
+    def __init__(self, name: str, dumps: Callable[[Any], bytes], loads: Callable[[str | bytes], Any]) -> None:
+        self.name = name
+        self.dumps = dumps
+        self.loads = loads
+
+    def dumps_str(self, value: Any) -> str:
+        return self.dumps(value).decode("utf-8")
+
+
+def _stdlib_dumps(value: Any) -> bytes:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+CODECS: dict[str, Codec] = {"json": Codec("json", _stdlib_dumps, json.loads)}
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    pass
+else:
+    CODECS["orjson"] = Codec("orjson", orjson.dumps, orjson.loads)
+
+
+def get_codec(name: str = "") -> Codec:
+    if not name:
+        return CODECS.get("orjson") or CODECS["json"]
+    if name not in CODECS:
+        raise ValueError(f"JSON codec '{name}' is not available (have: {', '.join(CODECS)})")
+    return CODECS[name]
+
+
+codec = get_codec(os.getenv("STATE_JSON_CODEC", "").strip())
+dumps = codec.dumps
+dumps_str = codec.dumps_str
+loads = codec.loads
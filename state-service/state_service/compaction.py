@@ -0,0 +1,109 @@
+"""Background compaction of the selection keyspace.
+
+Writes only ever add to ``USERS_KEY`` and the recency index, so without
+compaction both grow with every user ever seen and listings walk past members
+whose selection is gone. A pass removes selections not updated for
+``SELECTION_TTL_SECONDS``, oldest first off the recency index. Once per
+``COMPACTION_DANGLING_INTERVAL_SECONDS``, if set, it also sweeps the whole index
+(``ZSCAN``) and users set (``SSCAN``) for members without a stored selection.
+Work is done in batches of ``COMPACTION_BATCH_SIZE`` with a pause after each,
+so Redis serves requests between them however large the keyspace.
+Every removal is conditional on the member being unchanged since it was read,
+and publishes a selection event, so a pass can run next to live writes.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+
+from . import store
+from .config import (
+    COMPACTION_BATCH_PAUSE_SECONDS,
+    COMPACTION_BATCH_SIZE,
+    COMPACTION_DANGLING_INTERVAL_SECONDS,
+    COMPACTION_DANGLING_LOCK_KEY,
+    COMPACTION_INTERVAL_SECONDS,
+    COMPACTION_LOCK_KEY,
+    SELECTION_TTL_SECONDS,
+    SELECTIONS_INDEX_KEY,
+    USERS_KEY,
+)
+from .metrics import observe_reclaimed
+
+logger = logging.getLogger(__name__)
+
+
+async def compact_selections(
+    ttl_seconds: int = SELECTION_TTL_SECONDS,
+    batch_size: int = COMPACTION_BATCH_SIZE,
+    pause_seconds: float = COMPACTION_BATCH_PAUSE_SECONDS,
+    sweep_dangling: bool = False,
+) -> dict[str, int]:
+    """Run one compaction pass; returns the number of entries reclaimed by reason."""
+    reclaimed = {"expired": 0, "dangling": 0}
+    if ttl_seconds > 0:
+        cutoff = time.time() - ttl_seconds
+        offset = 0
+        while True:
+            offset, examined, removed = await store.expire_selections(cutoff, offset, batch_size)
+            reclaimed["expired"] += removed
+            observe_reclaimed("expired", removed)
+            if examined < batch_size:
+                break
+            await asyncio.sleep(pause_seconds)
+    if sweep_dangling and store.redis_client:
+        for key in (SELECTIONS_INDEX_KEY, USERS_KEY):
+            cursor = 0
+            while True:
+                cursor, _, removed = await store.prune_dangling_selections(key, cursor, batch_size)
+                reclaimed["dangling"] += removed
+                observe_reclaimed("dangling", removed)
+                if not cursor:
+                    break
+                await asyncio.sleep(pause_seconds)
+    return reclaimed
+
+
+async def run_selection_compactor(
+    interval_seconds: float = COMPACTION_INTERVAL_SECONDS,
+    dangling_interval_seconds: float = COMPACTION_DANGLING_INTERVAL_SECONDS,
+) -> None:
+    """Run a compaction pass every ``interval_seconds`` until cancelled; 0 disables compaction.
+
+    On Redis one replica per interval runs the pass, whichever takes the lease
+    first, and the dangling sweep has a lease of its own lasting
+    ``dangling_interval_seconds``. Returns at once when there is nothing to do:
+    selections never expire and the sweep is off or, on the memory backend,
+    not needed.
+    """
+    sweeps_dangling = bool(store.redis_client) and dangling_interval_seconds > 0
+    if interval_seconds <= 0 or (SELECTION_TTL_SECONDS <= 0 and not sweeps_dangling):
+        return
+    while True:
+        await asyncio.sleep(interval_seconds)
+        if not store.breaker.allow():
+            continue
+        try:
+            if not await store.acquire_lease(COMPACTION_LOCK_KEY, interval_seconds):
+                continue
+            sweep_dangling = sweeps_dangling and await store.acquire_lease(
+                COMPACTION_DANGLING_LOCK_KEY, dangling_interval_seconds
+            )
+            started = time.perf_counter()
+            reclaimed = await compact_selections(sweep_dangling=sweep_dangling)
+        except asyncio.CancelledError:
+            raise
+        except store.REDIS_UNAVAILABLE as exc:
+            store.breaker.record_failure(exc)
+            logger.warning("Selection compaction interrupted: %s", exc)
+            continue
+        except Exception:
+            logger.exception("Selection compaction failed")
+            continue
+        logger.info(
+            "Compacted selections in %.1fs: %d expired, %d dangling removed",
+            time.perf_counter() - started,
+            reclaimed["expired"],
+            reclaimed["dangling"],
+        )
@@ -1,14 +1,120 @@
 import os
+import zlib
 
 REDIS_URL = os.getenv("REDIS_URL", "").strip()
+# Connect with the Redis Cluster client (OSS cluster API, e.g. Azure Cache for
+# Redis Enterprise with the OSS clustering policy) and lay keys out with hash tags.
+REDIS_CLUSTER = os.getenv("REDIS_CLUSTER", "").strip().lower() in {"1", "true", "yes"}
+# Hash tags the selection keys are spread over in cluster mode; bulk reads send
+# one MGET per tag, so fewer tags mean fewer, larger MGETs.
+REDIS_CLUSTER_SELECTION_TAGS = int(os.getenv("REDIS_CLUSTER_SELECTION_TAGS", "1024"))
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+REDIS_POOL_TIMEOUT_SECONDS = float(os.getenv("REDIS_POOL_TIMEOUT_SECONDS", "2"))
+REDIS_SOCKET_TIMEOUT_SECONDS = float(os.getenv("REDIS_SOCKET_TIMEOUT_SECONDS", "2"))
+REDIS_CONNECT_TIMEOUT_SECONDS = float(os.getenv("REDIS_CONNECT_TIMEOUT_SECONDS", "2"))
+REDIS_HEALTH_CHECK_INTERVAL_SECONDS = int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL_SECONDS", "30"))
+REDIS_RETRIES = int(os.getenv("REDIS_RETRIES", "3"))
+REDIS_RETRY_BACKOFF_CAP_SECONDS = float(os.getenv("REDIS_RETRY_BACKOFF_CAP_SECONDS", "0.5"))
+# Read by ``python -m state_service.serve``, the container command. More than
+# one worker process needs REDIS_URL: each worker has its own memory backend.
+SERVE_HOST = os.getenv("SERVE_HOST", "0.0.0.0")
+SERVE_PORT = int(os.getenv("SERVE_PORT", "8080"))
+SERVE_WORKERS = int(os.getenv("SERVE_WORKERS", "1"))
+# Serve with uvloop and httptools instead of asyncio and h11.
+SERVE_FAST_LOOP = os.getenv("SERVE_FAST_LOOP", "").strip().lower() in {"1", "true", "yes"}
+HEALTH_PING_CACHE_SECONDS = float(os.getenv("HEALTH_PING_CACHE_SECONDS", "2"))
 STATE_KEY_PREFIX = os.getenv("STATE_KEY_PREFIX", "aigw:state")
 STATE_SERVICE_SHARED_TOKEN = os.getenv("STATE_SERVICE_SHARED_TOKEN", "").strip()
+CATALOG_CACHE_TTL_SECONDS = float(os.getenv("CATALOG_CACHE_TTL_SECONDS", "10"))
+SELECTION_BATCH_MAX = int(os.getenv("SELECTION_BATCH_MAX", "1000"))
+STREAM_REPLAY_SIZE = int(os.getenv("STREAM_REPLAY_SIZE", "256"))
+STREAM_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", "64"))
+STREAM_HEARTBEAT_SECONDS = float(os.getenv("STREAM_HEARTBEAT_SECONDS", "15"))
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_SECONDS = float(os.getenv("BREAKER_RESET_SECONDS", "5"))
+SNAPSHOT_MAX_SELECTIONS = int(os.getenv("SNAPSHOT_MAX_SELECTIONS", "10000"))
+WRITE_BEHIND_MAX = int(os.getenv("WRITE_BEHIND_MAX", "10000"))
+WRITE_BEHIND_REPLAY_SECONDS = float(os.getenv("WRITE_BEHIND_REPLAY_SECONDS", "1"))
+# Selections not updated for this long expire (0: never). They are removed by
+# the background compactor, so an expired selection can still be read until
+# its next pass.
+SELECTION_TTL_SECONDS = int(os.getenv("SELECTION_TTL_SECONDS", "0"))
+# One replica runs a compaction pass per interval; each batch reads
+# COMPACTION_BATCH_SIZE members and is followed by a pause, which bounds the
+# load it puts on Redis.
+COMPACTION_INTERVAL_SECONDS = float(os.getenv("COMPACTION_INTERVAL_SECONDS", "300"))
+# How often a pass also sweeps the whole index and users set for members whose
+# selection is gone (0: never). Writes and expiry keep them consistent, so only
+# a replica dying mid-write on a cluster or keys deleted by hand leave any.
+COMPACTION_DANGLING_INTERVAL_SECONDS = float(os.getenv("COMPACTION_DANGLING_INTERVAL_SECONDS", "0"))
+COMPACTION_BATCH_SIZE = int(os.getenv("COMPACTION_BATCH_SIZE", "500"))
+COMPACTION_BATCH_PAUSE_SECONDS = float(os.getenv("COMPACTION_BATCH_PAUSE_SECONDS", "0.05"))
+USAGE_BUCKET_SECONDS = int(os.getenv("USAGE_BUCKET_SECONDS", "300"))
+USAGE_RETENTION_SECONDS = int(os.getenv("USAGE_RETENTION_SECONDS", str(7 * 24 * 3600)))
+USAGE_BATCH_MAX = int(os.getenv("USAGE_BATCH_MAX", "1000"))
+# Longest NDJSON event line; a longer one ends the stream with 413.
+USAGE_LINE_MAX_BYTES = int(os.getenv("USAGE_LINE_MAX_BYTES", str(64 * 1024)))
+# Events stamped up to this far ahead of the receiving replica's clock are
+# counted as received now; later ones are rejected.
+USAGE_CLOCK_SKEW_SECONDS = int(os.getenv("USAGE_CLOCK_SKEW_SECONDS", "300"))
+GATEWAY_METRICS_URL = os.getenv("GATEWAY_METRICS_URL", "").strip()
+GATEWAY_METRICS_AUTH = os.getenv("GATEWAY_METRICS_AUTH", "").strip()
+GATEWAY_METRICS_SCRAPE_SECONDS = float(os.getenv("GATEWAY_METRICS_SCRAPE_SECONDS", "15"))
+GATEWAY_METRICS_TIMEOUT_SECONDS = float(os.getenv("GATEWAY_METRICS_TIMEOUT_SECONDS", "5"))
+GATEWAY_METRICS_HISTORY = int(os.getenv("GATEWAY_METRICS_HISTORY", "120"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "4096"))
+CACHE_MAX_AGE_CATALOG_SECONDS = int(os.getenv("CACHE_MAX_AGE_CATALOG_SECONDS", "5"))
+CACHE_MAX_AGE_SELECTION_SECONDS = int(os.getenv("CACHE_MAX_AGE_SELECTION_SECONDS", "0"))
+CACHE_MAX_AGE_SELECTIONS_SECONDS = int(os.getenv("CACHE_MAX_AGE_SELECTIONS_SECONDS", "5"))
+EMBEDDING_CACHE_TTL_SECONDS = int(os.getenv("EMBEDDING_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+# Only bounds the memory backend; Redis evicts with maxmemory-policy volatile-lru
+# (the Azure Cache for Redis default), which spares the state keys as they have no TTL.
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "10000"))
+EMBEDDING_BATCH_MAX = int(os.getenv("EMBEDDING_BATCH_MAX", "2048"))
+# Per-minute limits checked by /state/ratelimit:check; 0 disables a limit.
+RATE_LIMIT_USER_REQUESTS_PER_MINUTE = int(os.getenv("RATE_LIMIT_USER_REQUESTS_PER_MINUTE", "0"))
+RATE_LIMIT_USER_TOKENS_PER_MINUTE = int(os.getenv("RATE_LIMIT_USER_TOKENS_PER_MINUTE", "0"))
+RATE_LIMIT_MODEL_REQUESTS_PER_MINUTE = int(os.getenv("RATE_LIMIT_MODEL_REQUESTS_PER_MINUTE", "0"))
+RATE_LIMIT_MODEL_TOKENS_PER_MINUTE = int(os.getenv("RATE_LIMIT_MODEL_TOKENS_PER_MINUTE", "0"))
+# JSON object of per-model overrides for the model-wide limits, e.g.
+# {"gpt-4.1": {"requests_per_minute": 600, "tokens_per_minute": 150000}}.
+RATE_LIMIT_MODEL_OVERRIDES = os.getenv("RATE_LIMIT_MODEL_OVERRIDES", "").strip()
 
-CATALOG_KEY = f"{STATE_KEY_PREFIX}:catalog"
-USERS_KEY = f"{STATE_KEY_PREFIX}:users"
 
+def key_prefix(clustered: bool, group: str | None = None) -> str:
+    """Prefix of one group of keys that Lua scripts touch together.
 
-def selection_key(user_id: str) -> str:
+    In cluster mode the group is a hash tag, so its keys share a slot: the
+    catalog and selection bookkeeping (``group=None``), usage, and rate-limit
+    buckets each live in one slot. Selections and embeddings are keyed apart.
+    """
+    prefix = STATE_KEY_PREFIX if group is None else f"{STATE_KEY_PREFIX}:{group}"
+    return f"{{{prefix}}}" if clustered else prefix
+
+
+STATE_PREFIX = key_prefix(REDIS_CLUSTER)
+CATALOG_KEY = f"{STATE_PREFIX}:catalog"
+CATALOG_META_KEY = f"{STATE_PREFIX}:catalog:meta"
+USERS_KEY = f"{STATE_PREFIX}:users"
+SELECTIONS_INDEX_KEY = f"{STATE_PREFIX}:selections:recent"
+# Model -> number of users whose enabled selection names it.
+SELECTION_MODELS_KEY = f"{STATE_PREFIX}:selections:models"
+# Aggregate selection counters ("enabled": users with an enabled model selection).
+SELECTION_STATS_KEY = f"{STATE_PREFIX}:selections:stats"
+# Pub/sub channels are not slotted; PUBLISH reaches every node of a cluster.
+EVENTS_CHANNEL = f"{STATE_KEY_PREFIX}:events"
+EVENTS_SEQUENCE_KEY = f"{STATE_PREFIX}:events:seq"
+# Held by the replica running the current compaction pass, and for
+# COMPACTION_DANGLING_INTERVAL_SECONDS by the one that last swept dangling members.
+COMPACTION_LOCK_KEY = f"{STATE_PREFIX}:compaction:lock"
+COMPACTION_DANGLING_LOCK_KEY = f"{STATE_PREFIX}:compaction:dangling"
+USAGE_PREFIX = key_prefix(REDIS_CLUSTER, "usage")
+EMBEDDINGS_PREFIX = f"{STATE_KEY_PREFIX}:embedding"
+EMBEDDING_STATS_KEY = f"{STATE_PREFIX}:embeddings:stats"
+RATE_LIMIT_PREFIX = key_prefix(REDIS_CLUSTER, "ratelimit")
+
+
+def normalize_user_id(user_id: str) -> str:
     if not user_id or not user_id.strip():
         raise ValueError("user_id must be a non-empty string")
 
@@ -16,4 +122,33 @@ def selection_key(user_id: str) -> str:
     if ":" in normalized_user_id or any(char.isspace() for char in normalized_user_id):
         raise ValueError("user_id must not contain ':' or whitespace")
 
-    return f"{STATE_KEY_PREFIX}:selection:{normalized_user_id}"
+    return normalized_user_id
+
+
+def selection_key(user_id: str, clustered: bool = REDIS_CLUSTER) -> str:
+    user_id = normalize_user_id(user_id)
+    if clustered:
+        # A stable tag per user, so users spread evenly over the cluster's slots.
+        tag = zlib.crc32(user_id.encode("utf-8")) % REDIS_CLUSTER_SELECTION_TAGS
+        return f"{STATE_KEY_PREFIX}:selection:{{s{tag}}}:{user_id}"
+    return f"{STATE_KEY_PREFIX}:selection:{user_id}"
+
+
+def usage_key(user_id: str | None, bucket_start: int) -> str:
+    """Hash of per-model counters for one user (``None``: all users) and time bucket."""
+    if user_id is None:
+        return f"{USAGE_PREFIX}:total:{bucket_start}"
+    return f"{USAGE_PREFIX}:user:{user_id}:{bucket_start}"
+
+
+def usage_seen_key(request_id: str) -> str:
+    return f"{USAGE_PREFIX}:seen:{request_id}"
+
+
+def embedding_key(digest: str) -> str:
+    return f"{EMBEDDINGS_PREFIX}:{digest}"
+
+
+def rate_limit_key(scope: str, subject: str, kind: str) -> str:
+    """GCRA bucket for one limit, e.g. ``("user", "alice", "tokens")``."""
+    return f"{RATE_LIMIT_PREFIX}:{scope}:{subject}:{kind}"
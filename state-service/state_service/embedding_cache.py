@@ -0,0 +1,132 @@
+"""Per-input embedding cache shared by everything that calls the gateway's embedding deployments.
+
+Entries are content-addressed: the key is a hash of (deployment, dimensions,
+NFC-normalized input), so an input hits however it was batched the first
+time. Vectors are stored as packed little-endian float32, the layout of the
+OpenAI ``encoding_format=base64`` response, which is about a quarter of the
+size of the JSON float list. Values therefore come back rounded to float32,
+exactly as a base64 request would return them.
+
+Entries expire ``EMBEDDING_CACHE_TTL_SECONDS`` after their last hit, so with
+Redis's ``volatile-lru`` policy the least recently used vectors go first when
+memory runs short, while the state keys, which have no TTL, are never evicted.
+"""
+from __future__ import annotations
+
+import base64
+import hashlib
+import sys
+import unicodedata
+from array import array
+from typing import Any, Sequence
+
+from .config import EMBEDDING_CACHE_TTL_SECONDS, embedding_key
+from .metrics import observe_embedding_lookups
+from .schemas import EmbeddingFillItem
+from .store import count_embedding_lookups, embedding_stats, read_embeddings, write_embeddings
+
+FLOAT32_SIZE = 4
+
+
+def cache_key(deployment: str, dimensions: int | None, text: str) -> str:
+    # Deployment names cannot contain whitespace, so the newlines are unambiguous.
+    normalized = unicodedata.normalize("NFC", text)
+    digest = hashlib.sha256(f"{deployment}\n{dimensions or 0}\n{normalized}".encode("utf-8")).hexdigest()
+    return embedding_key(digest)
+
+
+def pack(vector: Sequence[float]) -> bytes:
+    packed = array("f", vector)
+    if sys.byteorder == "big":
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def unpack(blob: bytes) -> list[float]:
+    values = array("f")
+    values.frombytes(blob)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values.tolist()
+
+
+def check_dimension(length: int, expected: int | None) -> str | None:
+    """Why a vector of ``length`` floats cannot be cached, or None; as ``check_aoai_embeddings.py`` reports it."""
+    if length == 0:
+        return "embedding is empty"
+    if expected is not None and length != expected:
+        return f"dimension {length} != {expected}"
+    return None
+
+
+async def lookup(deployment: str, dimensions: int | None, inputs: list[str], encoding_format: str) -> dict[str, Any]:
+    """Cached vectors for ``inputs``, indexed like the OpenAI response, and the indices still to embed.
+
+    Repeated inputs are looked up once. All lookups go to Redis in one pipelined
+    round trip; while it is unreachable every input is a miss.
+    """
+    keys = [cache_key(deployment, dimensions, text) for text in inputs]
+    unique = list(dict.fromkeys(keys))
+    blobs = dict(zip(unique, await read_embeddings(unique, EMBEDDING_CACHE_TTL_SECONDS)))
+    data: list[dict[str, Any]] = []
+    misses: list[int] = []
+    for index, key in enumerate(keys):
+        blob = blobs[key]
+        if (
+            blob is None
+            or not blob
+            or len(blob) % FLOAT32_SIZE
+            or (dimensions is not None and len(blob) != dimensions * FLOAT32_SIZE)
+        ):
+            misses.append(index)
+            continue
+        embedding = base64.b64encode(blob).decode("ascii") if encoding_format == "base64" else unpack(blob)
+        data.append({"object": "embedding", "index": index, "embedding": embedding})
+    count_embedding_lookups(len(data), len(misses))
+    observe_embedding_lookups(len(data), len(misses))
+    return {"object": "list", "model": deployment, "data": data, "misses": misses}
+
+
+async def fill(deployment: str, dimensions: int | None, items: list[EmbeddingFillItem]) -> dict[str, Any]:
+    """Cache each item's vector under its input; items failing the dimension check are reported, not stored.
+
+    Without ``dimensions`` every vector must match the first one's length, as
+    the probe script takes the expected dimension from its first response.
+    """
+    expected = dimensions
+    entries: dict[str, bytes] = {}
+    errors: list[dict[str, Any]] = []
+    for index, item in enumerate(items):
+        if isinstance(item.embedding, str):
+            try:
+                blob = base64.b64decode(item.embedding, validate=True)
+            except ValueError:
+                errors.append({"index": index, "error": "embedding is not valid base64"})
+                continue
+            if len(blob) % FLOAT32_SIZE:
+                errors.append({"index": index, "error": "base64 embedding is not a float32 array"})
+                continue
+            length = len(blob) // FLOAT32_SIZE
+            vector = None
+        else:
+            vector = item.embedding
+            length = len(vector)
+        error = check_dimension(length, expected)
+        if error:
+            errors.append({"index": index, "error": error})
+            continue
+        expected = length
+        entries[cache_key(deployment, dimensions, item.input)] = blob if vector is None else pack(vector)
+    stored = await write_embeddings(list(entries.items()), EMBEDDING_CACHE_TTL_SECONDS)
+    return {"stored": stored, "errors": errors}
+
+
+async def stats() -> dict[str, Any]:
+    counts = await embedding_stats()
+    lookups = counts["hits"] + counts["misses"]
+    return {
+        **counts,
+        "lookups": lookups,
+        "hit_rate": round(counts["hits"] / lookups, 4) if lookups else None,
+        "ttl_seconds": EMBEDDING_CACHE_TTL_SECONDS,
+    }
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable
+
+from .config import STREAM_QUEUE_SIZE, STREAM_REPLAY_SIZE
+
+CATALOG_EVENT = "catalog"
+SELECTION_EVENT = "selection"
+RESET_EVENT = "reset"
+
+
+@dataclass(frozen=True)
+class Event:
+    id: int
+    type: str
+    data: str
+    frame: bytes = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        # Pre-render the SSE frame once so fan-out to N connections is just N writes.
+        frame = f"id: {self.id}\nevent: {self.type}\ndata: {self.data}\n\n".encode("utf-8")
+        object.__setattr__(self, "frame", frame)
+
+    @classmethod
+    def decode(cls, message: str) -> Event:
+        """Parse the ``"<id> <type> <json>"`` envelope published by the Lua scripts."""
+        event_id, event_type, data = message.split(" ", 2)
+        return cls(int(event_id), event_type, data)
+
+
+# Tells a client its Last-Event-ID is outside the replay window; reload full state.
+RESET_FRAME = f"event: {RESET_EVENT}\ndata: {{}}\n\n".encode("utf-8")
+
+
+class Subscription:
+    def __init__(self, maxsize: int) -> None:
+        # None tells the stream to send RESET_FRAME: the event sequence restarted.
+        self.queue: asyncio.Queue[Event | None] = asyncio.Queue(maxsize=maxsize)
+        # Set when the client fell too far behind; it is dropped from fan-out and
+        # the stream ends once the queue drains so the client reconnects.
+        self.overflowed = False
+
+
+class EventHub:
+    """In-process broadcast of change events with a bounded replay buffer.
+
+    Fed by the single Redis pub/sub subscription of this replica, or directly by
+    the in-memory backend.
+    """
+
+    def __init__(self, replay_size: int, queue_size: int) -> None:
+        self.replay: deque[Event] = deque(maxlen=replay_size)
+        self.queue_size = queue_size
+        self.subscriptions: set[Subscription] = set()
+        # Called synchronously with every new event, before stream fan-out.
+        self.observers: list[Callable[[Event], None]] = []
+
+    def publish(self, event: Event) -> None:
+        if self.replay and event.id <= self.replay[-1].id:
+            return
+        self.replay.append(event)
+        for observer in self.observers:
+            observer(event)
+        for subscription in list(self.subscriptions):
+            self._deliver(subscription, event)
+
+    def rewind(self, sequence: int) -> None:
+        """Forget the replay buffer when the event sequence restarted below its tail.
+
+        ``sequence`` is the sequence value read after (re)subscribing; it falls
+        behind the replayed ids when Redis lost its data. Events reusing those
+        ids would otherwise be dropped as already seen. Current subscribers are
+        sent a reset and keep streaming.
+        """
+        if not self.replay or sequence >= self.replay[-1].id:
+            return
+        self.replay.clear()
+        for subscription in list(self.subscriptions):
+            self._deliver(subscription, None)
+
+    def _deliver(self, subscription: Subscription, event: Event | None) -> None:
+        try:
+            subscription.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            subscription.overflowed = True
+            self.subscriptions.discard(subscription)
+
+    def subscribe(self, last_event_id: int | None = None) -> tuple[Subscription, list[Event] | None]:
+        """Register a subscriber and return the events it missed since ``last_event_id``.
+
+        The backlog is ``None`` when those events are no longer in the replay
+        buffer, or when ``last_event_id`` is ahead of it because the sequence
+        restarted.
+        """
+        subscription = Subscription(self.queue_size)
+        self.subscriptions.add(subscription)
+        if last_event_id is None:
+            return subscription, []
+        if not self.replay or not self.replay[0].id - 1 <= last_event_id <= self.replay[-1].id:
+            return subscription, None
+        return subscription, [event for event in self.replay if event.id > last_event_id]
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self.subscriptions.discard(subscription)
+
+
+event_hub = EventHub(STREAM_REPLAY_SIZE, STREAM_QUEUE_SIZE)
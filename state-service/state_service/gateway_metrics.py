@@ -0,0 +1,154 @@
+"""Scrape the gateway's Prometheus endpoint once per interval for every dashboard.
+
+Only the few series the dashboard shows are summed out of each scrape; the
+latest totals and a ring buffer of per-interval deltas are kept in memory and
+served pre-serialized from ``/state/metrics/summary``. Each replica scrapes on
+its own, so the gateway sees one scrape per replica per interval however many
+browsers are watching.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any
+from urllib import request
+
+from . import codec
+from .config import (
+    GATEWAY_METRICS_AUTH,
+    GATEWAY_METRICS_HISTORY,
+    GATEWAY_METRICS_SCRAPE_SECONDS,
+    GATEWAY_METRICS_TIMEOUT_SECONDS,
+    GATEWAY_METRICS_URL,
+)
+from .prometheus_text import sum_by_name
+
+logger = logging.getLogger(__name__)
+
+# Summary field -> alternative sets of LiteLLM series, tried in order; the first
+# set with any series present is summed. Covers the metric names of older and
+# newer LiteLLM releases, with and without the "_total" suffix prometheus_client
+# adds to counters.
+SUMMARY_SERIES: dict[str, tuple[tuple[str, ...], ...]] = {
+    "requests": (("litellm_requests_metric_total",), ("litellm_llm_requests_metric_total",)),
+    "tokens": (
+        ("litellm_total_tokens",),
+        ("litellm_total_tokens_total",),
+        ("litellm_total_tokens_metric_total",),
+        ("litellm_input_tokens", "litellm_output_tokens"),
+        ("litellm_input_tokens_total", "litellm_output_tokens_total"),
+        ("litellm_input_tokens_metric_total", "litellm_output_tokens_metric_total"),
+    ),
+    "errors": (("litellm_llm_api_failed_requests_metric_total",),),
+}
+SOURCE_SERIES = frozenset(name for sets in SUMMARY_SERIES.values() for names in sets for name in names)
+
+
+def summarize_scrape(sums: dict[str, float]) -> dict[str, float]:
+    totals: dict[str, float] = {}
+    for field, alternatives in SUMMARY_SERIES.items():
+        totals[field] = 0.0
+        for names in alternatives:
+            if any(name in sums for name in names):
+                totals[field] = sum(sums.get(name, 0.0) for name in names)
+                break
+    return totals
+
+
+def scrape(url: str, auth: str, timeout: float) -> dict[str, float]:
+    """Fetch ``url`` and sum the summary series. Blocking; run it on a worker thread."""
+    headers = {"Accept": "text/plain"}
+    if auth:
+        headers["Authorization"] = auth if auth.lower().startswith("bearer ") else f"Bearer {auth}"
+    with request.urlopen(request.Request(url, headers=headers), timeout=timeout) as resp:
+        text = resp.read().decode("utf-8", errors="replace")
+    return summarize_scrape(sum_by_name(text, SOURCE_SERIES))
+
+
+def _iso(epoch: float) -> str:
+    return datetime.fromtimestamp(epoch, timezone.utc).isoformat()
+
+
+class GatewayMetrics:
+    """Latest scraped totals plus a bounded history of per-scrape deltas."""
+
+    def __init__(self, history_size: int, interval_seconds: float) -> None:
+        self.interval_seconds = interval_seconds
+        self.totals: dict[str, float] | None = None
+        self.history: deque[dict[str, Any]] = deque(maxlen=history_size)
+        self.scraped_at: float | None = None
+        self.scrapes = 0
+        self.failures = 0
+        self.last_error: str | None = None
+        # Serialized summary and its ETag, rebuilt after every scrape attempt.
+        self.body: bytes | None = None
+        self.etag = '"s0"'
+
+    def record(self, totals: dict[str, float], at: float) -> None:
+        previous = self.totals
+        if previous is not None:
+            # A total that went down means the gateway restarted and its
+            # counters began again from zero, as in PromQL's increase().
+            deltas = {
+                field: value - previous[field] if value >= previous[field] else value
+                for field, value in totals.items()
+            }
+            self.history.append({"at": _iso(at), **deltas})
+        self.totals = totals
+        self.scraped_at = at
+        self.scrapes += 1
+        self.last_error = None
+        self._render()
+
+    def record_failure(self, exc: BaseException) -> None:
+        self.failures += 1
+        self.last_error = str(exc) or type(exc).__name__
+        self._render()
+
+    def summary(self) -> dict[str, Any]:
+        return {
+            "scraped_at": _iso(self.scraped_at) if self.scraped_at is not None else None,
+            "interval_seconds": self.interval_seconds,
+            "totals": self.totals,
+            "history": list(self.history),
+            "scrapes": self.scrapes,
+            "failures": self.failures,
+            "last_error": self.last_error,
+        }
+
+    def _render(self) -> None:
+        self.body = codec.dumps(self.summary())
+        # Keyed on the scrape time rather than a counter so replicas, which
+        # scrape independently, never hand out the same tag for different bodies.
+        scraped_ms = round(self.scraped_at * 1000) if self.scraped_at is not None else 0
+        self.etag = f'"s{scraped_ms}-{self.failures}"'
+
+
+gateway_metrics = GatewayMetrics(GATEWAY_METRICS_HISTORY, GATEWAY_METRICS_SCRAPE_SECONDS)
+
+
+async def run_gateway_metrics_scraper(
+    url: str = GATEWAY_METRICS_URL, interval_seconds: float = GATEWAY_METRICS_SCRAPE_SECONDS
+) -> None:
+    """Scrape ``url`` every ``interval_seconds`` until cancelled; does nothing if it is unset.
+
+    Fetching and parsing both happen on a worker thread so a large scrape
+    never blocks the event loop.
+    """
+    if not url:
+        return
+    while True:
+        started = time.time()
+        try:
+            totals = await asyncio.to_thread(scrape, url, GATEWAY_METRICS_AUTH, GATEWAY_METRICS_TIMEOUT_SECONDS)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.warning("Gateway metrics scrape failed: %s", exc)
+            gateway_metrics.record_failure(exc)
+        else:
+            gateway_metrics.record(totals, started)
+        await asyncio.sleep(max(0.0, interval_seconds - (time.time() - started)))
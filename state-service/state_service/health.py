@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Any
+
+from . import store
+from .config import HEALTH_PING_CACHE_SECONDS, REDIS_SOCKET_TIMEOUT_SECONDS
+from .resilience import BREAKER_CLOSED
+
+
+class RedisProbe:
+    """PING Redis at most once per ``cache_seconds``; concurrent callers share one PING."""
+
+    def __init__(self, cache_seconds: float) -> None:
+        self.cache_seconds = cache_seconds
+        self.result: dict[str, Any] | None = None
+        self.checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def check(self) -> dict[str, Any]:
+        if self.result is not None and time.monotonic() - self.checked_at < self.cache_seconds:
+            return self.result
+        async with self._lock:
+            if self.result is None or time.monotonic() - self.checked_at >= self.cache_seconds:
+                self.result = await self._ping()
+                self.checked_at = time.monotonic()
+        return self.result
+
+    async def _ping(self) -> dict[str, Any]:
+        client = store.redis_client
+        if client is None:
+            return {"ok": False, "error": "not connected"}
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(client.ping(), REDIS_SOCKET_TIMEOUT_SECONDS)
+        except Exception as exc:
+            return {"ok": False, "error": str(exc) or type(exc).__name__}
+        return {"ok": True, "latency_ms": round((time.perf_counter() - started) * 1000, 3)}
+
+
+redis_probe = RedisProbe(HEALTH_PING_CACHE_SECONDS)
+
+
+async def health_report() -> tuple[bool, dict[str, Any]]:
+    """Return (ready, report). Not ready while Redis does not answer PING or the pool is exhausted.
+
+    Liveness stays up meanwhile, and a replica that already has traffic keeps
+    serving it from its local snapshot and write-behind queue behind the
+    circuit breaker. An open breaker alone only marks the report degraded.
+    """
+    backend = store.backend_name()
+    report: dict[str, Any] = {"status": "ok", "backend": backend}
+    if backend != "redis":
+        return True, report
+
+    ping = await redis_probe.check()
+    pool = store.pool_stats()
+    report["redis"] = ping
+    report["pool"] = pool
+    report["breaker"] = store.breaker.report()
+    report["write_behind"] = store.write_behind.report()
+    exhausted = pool is not None and pool["in_use"] >= pool["max_connections"]
+    if exhausted or not ping["ok"] or store.breaker.state != BREAKER_CLOSED:
+        report["status"] = "degraded"
+    return ping["ok"] and not exhausted, report
@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+
+from . import codec, store
+from .catalog_cache import catalog_cache
+from .config import EVENTS_CHANNEL, EVENTS_SEQUENCE_KEY
+from .events import CATALOG_EVENT, Event, event_hub
+from .response_cache import state_versions
+
+logger = logging.getLogger(__name__)
+
+
+async def run_change_listener(max_backoff_seconds: float = 30.0) -> None:
+    """Hold this replica's single pub/sub subscription to state change events.
+
+    Every event is fanned out to local stream subscribers; catalog events also
+    replace the cached catalog. Reconnects with exponential backoff, dropping the
+    cached catalog and response-cache versions on every (re)subscribe because
+    messages published while disconnected are lost. A sequence that restarted
+    below the replayed events also rewinds the event hub.
+    """
+    if not store.redis_client:
+        return
+
+    backoff = 0.5
+    while True:
+        pubsub = None
+        try:
+            pubsub = await store.subscribe(EVENTS_CHANNEL)
+            catalog_cache.invalidate()
+            catalog_cache.listening = True
+            # Read after subscribing, so every later event is seen.
+            sequence = int(await store.redis_client.get(EVENTS_SEQUENCE_KEY) or 0)
+            event_hub.rewind(sequence)
+            state_versions.reset(sequence)
+            state_versions.listening = True
+            backoff = 0.5
+            async for message in pubsub.listen():
+                if message.get("type") != "message":
+                    continue
+                try:
+                    event = Event.decode(message["data"])
+                    if event.type == CATALOG_EVENT:
+                        catalog = codec.loads(event.data)
+                        catalog_cache.adopt(catalog)
+                        store.snapshot.remember_catalog(catalog)
+                except (ValueError, TypeError) as exc:
+                    logger.warning("Skipping malformed change event: %s", exc)
+                    continue
+                event_hub.publish(event)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.warning("Change listener disconnected: %s", exc)
+        finally:
+            catalog_cache.listening = False
+            state_versions.listening = False
+            try:
+                if pubsub is not None:
+                    await store.unsubscribe(pubsub)
+            except Exception:
+                logger.debug("Failed closing change listener pubsub", exc_info=True)
+        await asyncio.sleep(backoff)
+        backoff = min(backoff * 2, max_backoff_seconds)
@@ -1,6 +1,48 @@
+import asyncio
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager, suppress
+
 from fastapi import FastAPI
 
-from .routes import router
+from .compaction import run_selection_compactor
+from .gateway_metrics import run_gateway_metrics_scraper
+from .listener import run_change_listener
+from .metrics import instrument
+from .response_cache import install_response_cache
+from .resilience import StoreUnavailable
+from .routes import router, store_unavailable_handler
+from .store import close_redis, connect_redis, load_scripts, run_write_behind_replayer
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    await connect_redis()
+    tasks = [
+        asyncio.create_task(load_scripts()),
+        asyncio.create_task(run_change_listener()),
+        asyncio.create_task(run_write_behind_replayer()),
+        asyncio.create_task(run_gateway_metrics_scraper()),
+        asyncio.create_task(run_selection_compactor()),
+    ]
+    try:
+        yield
+    finally:
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            with suppress(asyncio.CancelledError):
+                await task
+        await close_redis()
+
+
+def create_app(instrumented: bool = True) -> FastAPI:
+    app = FastAPI(title="AI Gateway State Service", version="0.1.0", lifespan=lifespan)
+    app.include_router(router)
+    app.add_exception_handler(StoreUnavailable, store_unavailable_handler)
+    install_response_cache(app)
+    if instrumented:
+        instrument(app)
+    return app
+
 
-app = FastAPI(title="AI Gateway State Service", version="0.1.0")
-app.include_router(router)
+app = create_app()
@@ -0,0 +1,216 @@
+"""Prometheus instrumentation for the state service.
+
+Label children are bound once (per route and per known outcome at import, per
+Redis command on first use) so the request path only does dict lookups and
+``observe``/``inc`` calls.
+"""
+from __future__ import annotations
+
+import os
+import time
+from typing import Any, Callable
+
+from fastapi import FastAPI
+from fastapi.routing import APIRoute
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from prometheus_client.metrics import MetricWrapperBase
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Set by ``state_service.serve`` when it runs several worker processes:
+# prometheus_client then keeps every metric in files there, and a scrape of
+# any worker sums the files of all of them.
+MULTIPROCESS_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR", "")
+
+REQUESTS = Counter(
+    "state_service_requests_total",
+    "HTTP requests by route and status class",
+    ["route", "status"],
+)
+REQUEST_LATENCY = Histogram(
+    "state_service_request_duration_seconds",
+    "Time from request start to response start, by route",
+    ["route"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+PAYLOAD_SIZE = Histogram(
+    "state_service_payload_bytes",
+    "Request and response body sizes, by route",
+    ["route", "direction"],
+    buckets=(64, 256, 1024, 4096, 16384, 65536, 262144, 1048576),
+)
+REDIS_COMMAND_LATENCY = Histogram(
+    "state_service_redis_command_duration_seconds",
+    "Redis round-trip time by command",
+    ["command"],
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5),
+)
+CORRUPTED_PAYLOADS = Counter(
+    "state_service_corrupted_payloads_total",
+    "Stored payloads that failed to decode",
+    ["kind"],
+)
+CATALOG_WRITES = Counter(
+    "state_service_catalog_writes_total",
+    "Catalog PUTs handled by this process, by outcome",
+    ["outcome"],
+)
+USAGE_EVENTS = Counter(
+    "state_service_usage_events_total",
+    "Usage events received for ingestion, by outcome",
+    ["outcome"],
+)
+EMBEDDING_LOOKUPS = Counter(
+    "state_service_embedding_cache_lookups_total",
+    "Embedding cache lookups handled by this process, by result",
+    ["result"],
+)
+RATE_LIMIT_DECISIONS = Counter(
+    "state_service_rate_limit_checks_total",
+    "Rate-limit checks handled by this process, by decision",
+    ["decision"],
+)
+SELECTIONS_RECLAIMED = Counter(
+    "state_service_selections_reclaimed_total",
+    "Selections and index members removed by compaction passes of this process, by reason",
+    ["reason"],
+)
+
+CORRUPTED_SELECTION = CORRUPTED_PAYLOADS.labels("selection")
+RATE_LIMIT_ALLOWED = RATE_LIMIT_DECISIONS.labels("allowed")
+RATE_LIMIT_DENIED = RATE_LIMIT_DECISIONS.labels("denied")
+CORRUPTED_DOCUMENT = CORRUPTED_PAYLOADS.labels("document")
+EMBEDDING_HITS = EMBEDDING_LOOKUPS.labels("hit")
+EMBEDDING_MISSES = EMBEDDING_LOOKUPS.labels("miss")
+
+_STATUS_CLASSES = ("1xx", "2xx", "3xx", "4xx", "5xx")
+UNMATCHED_ROUTE = "unmatched"
+
+
+class RouteMetrics:
+    __slots__ = ("requests", "latency", "request_size", "response_size")
+
+    def __init__(self, route: str) -> None:
+        self.requests = tuple(REQUESTS.labels(route, status) for status in _STATUS_CLASSES)
+        self.latency = REQUEST_LATENCY.labels(route)
+        self.request_size = PAYLOAD_SIZE.labels(route, "request")
+        self.response_size = PAYLOAD_SIZE.labels(route, "response")
+
+
+_redis_commands: dict[Any, Any] = {}
+
+
+def observe_redis_command(command: Any, seconds: float) -> None:
+    child = _redis_commands.get(command)
+    if child is None:
+        child = _redis_commands[command] = REDIS_COMMAND_LATENCY.labels(str(command).upper())
+    child.observe(seconds)
+
+
+def _bind(metric: MetricWrapperBase, values: tuple[str, ...]) -> dict[str, Any]:
+    return {value: metric.labels(value) for value in values}
+
+
+def _child(children: dict[str, Any], metric: MetricWrapperBase, value: str) -> Any:
+    child = children.get(value)
+    if child is None:
+        child = children[value] = metric.labels(value)
+    return child
+
+
+# The outcomes each counter is known to see; any other is bound on first use.
+_catalog_writes = _bind(CATALOG_WRITES, ("applied", "unchanged", "conflict", "queued"))
+_usage_events = _bind(USAGE_EVENTS, ("counted", "duplicate", "rejected"))
+_selections_reclaimed = _bind(SELECTIONS_RECLAIMED, ("expired", "dangling"))
+
+
+def observe_catalog_write(outcome: str) -> None:
+    _child(_catalog_writes, CATALOG_WRITES, outcome).inc()
+
+
+def observe_usage_events(outcome: str, count: int) -> None:
+    if count:
+        _child(_usage_events, USAGE_EVENTS, outcome).inc(count)
+
+
+def observe_rate_limit(allowed: bool) -> None:
+    (RATE_LIMIT_ALLOWED if allowed else RATE_LIMIT_DENIED).inc()
+
+
+def observe_embedding_lookups(hits: int, misses: int) -> None:
+    EMBEDDING_HITS.inc(hits)
+    EMBEDDING_MISSES.inc(misses)
+
+
+def observe_reclaimed(reason: str, count: int) -> None:
+    if count:
+        _child(_selections_reclaimed, SELECTIONS_RECLAIMED, reason).inc(count)
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware; cheaper than BaseHTTPMiddleware on every request."""
+
+    def __init__(self, app: ASGIApp, routes: dict[Callable[..., Any], RouteMetrics]) -> None:
+        self.app = app
+        self.routes = routes
+        self.unmatched = RouteMetrics(UNMATCHED_ROUTE)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+        response_bytes = 0
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status, response_bytes
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                self._route(scope).latency.observe(time.perf_counter() - started)
+            elif message["type"] == "http.response.body":
+                response_bytes += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            metrics = self._route(scope)
+            metrics.requests[min(max(status // 100, 1), 5) - 1].inc()
+            metrics.response_size.observe(response_bytes)
+            for name, value in scope["headers"]:
+                if name == b"content-length":
+                    metrics.request_size.observe(int(value))
+                    break
+
+    def _route(self, scope: Scope) -> RouteMetrics:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return self.unmatched
+        return self.routes.get(endpoint, self.unmatched)
+
+
+def instrument(app: FastAPI) -> None:
+    """Bind per-route metric children for every registered route and add the middleware."""
+    routes = {
+        route.endpoint: RouteMetrics(route.name)
+        for route in app.routes
+        if isinstance(route, APIRoute)
+    }
+    app.add_middleware(MetricsMiddleware, routes=routes)
+
+
+def render_latest() -> tuple[bytes, str]:
+    if MULTIPROCESS_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry, MULTIPROCESS_DIR)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -0,0 +1,279 @@
+"""One-off data migrations for the state service keyspace.
+
+Usage (from the state-service directory, with REDIS_URL set):
+  python -m state_service.migrations backfill-selection-index
+  python -m state_service.migrations rebuild-selection-stats
+  REDIS_CLUSTER=1 python -m state_service.migrations cluster-keyspace --source redis://old-cache:6379/0
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import sys
+
+from . import codec, store
+from .config import (
+    EVENTS_SEQUENCE_KEY,
+    SELECTION_MODELS_KEY,
+    SELECTION_STATS_KEY,
+    SELECTIONS_INDEX_KEY,
+    STATE_KEY_PREFIX,
+    USERS_KEY,
+    key_prefix,
+    selection_key,
+)
+from .utils import iso_to_epoch
+
+logger = logging.getLogger(__name__)
+
+
+async def backfill_selection_index(batch_size: int = 500) -> int:
+    """Index every member of ``USERS_KEY`` in the recency ZSET.
+
+    Scores come from each stored selection's ``updated_at``. ``ZADD GT`` keeps a
+    newer score written concurrently by ``put_selection``, so the backfill is
+    safe to run against a live service and to re-run.
+    """
+    redis_client = store.redis_client
+    if not redis_client:
+        return 0
+
+    indexed = 0
+    batch: list[str] = []
+
+    async def flush() -> int:
+        keys: list[str] = []
+        user_ids: list[str] = []
+        for user_id in batch:
+            try:
+                keys.append(selection_key(user_id))
+                user_ids.append(user_id)
+            except ValueError as exc:
+                logger.warning("Skipping invalid user_id from redis set %s: %s", user_id, exc)
+        batch.clear()
+        if not keys:
+            return 0
+
+        scores: dict[str, float] = {}
+        for user_id, raw in zip(user_ids, await store.mget(keys)):
+            if not raw:
+                continue
+            try:
+                scores[user_id] = iso_to_epoch(codec.loads(raw).get("updated_at"))
+            except (ValueError, AttributeError) as exc:
+                logger.warning("Skipping corrupted selection JSON for user_id=%s: %s", user_id, exc)
+        if scores:
+            await redis_client.zadd(SELECTIONS_INDEX_KEY, scores, gt=True)
+        return len(scores)
+
+    async for user_id in redis_client.sscan_iter(USERS_KEY, count=batch_size):
+        batch.append(user_id)
+        if len(batch) >= batch_size:
+            indexed += await flush()
+    indexed += await flush()
+    return indexed
+
+
+async def _count_selected_models(batch_size: int) -> dict[str, int]:
+    redis_client = store.redis_client
+    counts: dict[str, int] = {}
+    batch: list[str] = []
+
+    async def flush() -> None:
+        keys: list[str] = []
+        for user_id in batch:
+            try:
+                keys.append(selection_key(user_id))
+            except ValueError as exc:
+                logger.warning("Skipping invalid user_id from redis set %s: %s", user_id, exc)
+        batch.clear()
+        for key, raw in zip(keys, await store.mget(keys)):
+            if not raw:
+                continue
+            try:
+                model = store.counted_model(codec.loads(raw))
+            except (ValueError, AttributeError) as exc:
+                logger.warning("Skipping corrupted selection JSON for key=%s: %s", key, exc)
+                continue
+            if model is not None:
+                counts[model] = counts.get(model, 0) + 1
+
+    async for user_id in redis_client.sscan_iter(USERS_KEY, count=batch_size):
+        batch.append(user_id)
+        if len(batch) >= batch_size:
+            await flush()
+    await flush()
+    return counts
+
+
+async def rebuild_selection_stats(batch_size: int = 500, attempts: int = 5) -> dict[str, int]:
+    """Recount the model popularity counters from the stored selections.
+
+    ``put_selection`` keeps the counters in step with every write; this repairs
+    drift, e.g. from selections deleted by hand, and initializes the counters
+    for selections written before they existed. The counters are only replaced
+    if no change event was published while counting (``WATCH`` on the event
+    sequence), so a write racing the rebuild is never lost; a raced attempt is
+    retried up to ``attempts`` times.
+    """
+    from redis.exceptions import WatchError
+
+    redis_client = store.redis_client
+    if not redis_client:
+        return {}
+
+    for attempt in range(1, attempts + 1):
+        async with redis_client.pipeline(transaction=True) as pipe:
+            await pipe.watch(EVENTS_SEQUENCE_KEY)
+            counts = await _count_selected_models(batch_size)
+            pipe.multi()
+            pipe.delete(SELECTION_MODELS_KEY)
+            if counts:
+                pipe.zadd(SELECTION_MODELS_KEY, counts)
+            pipe.hset(SELECTION_STATS_KEY, "enabled", sum(counts.values()))
+            try:
+                await pipe.execute()
+            except WatchError:
+                logger.info("Selections changed while recounting (attempt %d of %d)", attempt, attempts)
+                continue
+        return counts
+    raise RuntimeError(f"Selections kept changing; counters not rebuilt after {attempts} attempts")
+
+
+def cluster_key(key: str) -> str | None:
+    """The name ``key`` of the standalone layout has in the cluster layout.
+
+    None for keys not copied: rate-limit buckets, which refill within a minute,
+    keys already in the cluster layout, and keys outside ``STATE_KEY_PREFIX``.
+    """
+    prefix = f"{STATE_KEY_PREFIX}:"
+    if not key.startswith(prefix):
+        return None
+    name = key[len(prefix) :]
+    family, _, rest = name.partition(":")
+    if family == "selection":
+        try:
+            return selection_key(rest, clustered=True)
+        except ValueError:
+            # Already tagged, "{s<n>}:<user_id>", or not a valid user id.
+            return None
+    if family == "ratelimit":
+        return None
+    if family == "embedding":
+        return key
+    if family == "usage":
+        return f"{key_prefix(True, 'usage')}:{rest}"
+    return f"{key_prefix(True)}:{name}"
+
+
+async def copy_to_cluster_keyspace(
+    source_url: str, batch_size: int = 500, delete_source: bool = False
+) -> dict[str, int]:
+    """Copy every state key at ``source_url`` into the cluster layout at ``REDIS_URL``.
+
+    Keys move with ``DUMP``/``RESTORE REPLACE``, keeping their type and
+    remaining TTL, so the copy can be re-run. Each key is copied as it is when
+    read: stop the writers, or run the copy again once they are stopped, before
+    switching the service over. The source may be the destination itself, to
+    re-key a cache in place before scaling it out to a cluster; with
+    ``delete_source`` the copied keys are then removed from the source.
+    """
+    from redis.asyncio import Redis
+
+    redis_client = store.redis_client
+    if not redis_client:
+        return {}
+
+    counts = {"copied": 0, "skipped": 0}
+    source = Redis.from_url(source_url)
+    batch: list[bytes] = []
+
+    async def flush() -> None:
+        pairs: list[tuple[bytes, str]] = []
+        for raw_key in batch:
+            key = raw_key.decode("utf-8")
+            target = cluster_key(key)
+            if target is None:
+                counts["skipped"] += 1
+            else:
+                pairs.append((raw_key, target))
+        batch.clear()
+        if not pairs:
+            return
+        async with source.pipeline(transaction=False) as pipe:
+            for raw_key, _ in pairs:
+                pipe.pttl(raw_key)
+                pipe.dump(raw_key)
+            dumped = await pipe.execute()
+        copied: list[bytes] = []
+        renamed: list[bytes] = []
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for index, (raw_key, target) in enumerate(pairs):
+                ttl_ms, payload = dumped[2 * index], dumped[2 * index + 1]
+                if payload is None:
+                    # Expired or deleted since it was scanned.
+                    continue
+                pipe.restore(target, max(ttl_ms, 0), payload, replace=True)
+                copied.append(raw_key)
+                if target != raw_key.decode("utf-8"):
+                    renamed.append(raw_key)
+            if copied:
+                await pipe.execute()
+        # Embedding keys keep their name: copied in place, they are the copy.
+        if delete_source and renamed:
+            await source.delete(*renamed)
+        counts["copied"] += len(copied)
+
+    try:
+        async for raw_key in source.scan_iter(match=f"{STATE_KEY_PREFIX}:*", count=batch_size):
+            batch.append(raw_key)
+            if len(batch) >= batch_size:
+                await flush()
+        await flush()
+    finally:
+        await source.aclose()
+    return counts
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="State service keyspace migrations")
+    parser.add_argument(
+        "migration", choices=["backfill-selection-index", "rebuild-selection-stats", "cluster-keyspace"]
+    )
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--source", help="cluster-keyspace: URL of the Redis holding the standalone layout")
+    parser.add_argument(
+        "--delete-source", action="store_true", help="cluster-keyspace: delete each key from the source once copied"
+    )
+    args = parser.parse_args()
+    if args.migration == "cluster-keyspace" and not args.source:
+        parser.error("cluster-keyspace needs --source")
+
+    if store.backend_name() != "redis":
+        print("REDIS_URL is not set; nothing to migrate.")
+        return 1
+
+    async def run() -> str:
+        await store.connect_redis()
+        try:
+            if args.migration == "cluster-keyspace":
+                counts = await copy_to_cluster_keyspace(args.source, args.batch_size, args.delete_source)
+                return f"Copied {counts['copied']} keys into the cluster layout, skipped {counts['skipped']}"
+            if args.migration == "rebuild-selection-stats":
+                counts = await rebuild_selection_stats(args.batch_size)
+                return (
+                    f"Counted {sum(counts.values())} enabled selections across {len(counts)} models "
+                    f"into {SELECTION_MODELS_KEY}"
+                )
+            indexed = await backfill_selection_index(args.batch_size)
+            return f"Indexed {indexed} selections into {SELECTIONS_INDEX_KEY}"
+        finally:
+            await store.close_redis()
+
+    print(asyncio.run(run()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
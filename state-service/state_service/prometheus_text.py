@@ -0,0 +1,140 @@
+"""Minimal parser for the Prometheus text exposition format.
+
+Built for summing a handful of series out of a large scrape: samples are
+located with ``str.find`` on the original text instead of splitting it into a
+list of lines or running a regex per line, and label blocks are only skipped
+over, never decoded, unless ``parse_labels`` is called. Comments, ``# HELP``
+and ``# TYPE`` lines and optional timestamps are ignored.
+"""
+from __future__ import annotations
+
+from typing import Collection, Iterator
+
+
+def _sample(text: str, name_end: int, end: int) -> tuple[int, float] | None:
+    """``(labels_end, value)`` for the sample whose name ends at ``name_end``, or None if malformed.
+
+    ``labels_end`` is the index of the closing ``}``, or ``name_end`` when the
+    sample has no labels. Label values may contain ``}``, but neither the value
+    nor the timestamp can, so the last ``}`` on the line closes the block.
+    """
+    if text[name_end] == "{":
+        labels_end = text.rfind("}", name_end, end)
+        if labels_end == -1:
+            return None
+    elif text[name_end] in " \t":
+        labels_end = name_end
+    else:
+        return None
+    fields = text[labels_end + 1 : end].split(None, 2)
+    if not fields:
+        return None
+    try:
+        return labels_end, float(fields[0])
+    except ValueError:
+        return None
+
+
+def _line_end(text: str, start: int) -> int:
+    end = text.find("\n", start)
+    return len(text) if end == -1 else end
+
+
+def iter_samples(text: str, names: Collection[str] | None = None) -> Iterator[tuple[str, str, float]]:
+    """Yield ``(name, labels, value)`` per sample line; ``labels`` is the raw text between braces.
+
+    With ``names``, other series are skipped before their labels or value are
+    looked at. Malformed lines are skipped.
+    """
+    size = len(text)
+    start = 0
+    while start < size:
+        end = _line_end(text, start)
+        line_start, start = start, end + 1
+        if end == line_start or text[line_start] == "#":
+            continue
+        brace = text.find("{", line_start, end)
+        space = text.find(" ", line_start, end)
+        if brace != -1 and (space == -1 or brace < space):
+            name_end = brace
+        elif space != -1:
+            name_end = space
+        else:
+            continue
+        if name_end == line_start:
+            continue
+        name = text[line_start:name_end]
+        if names is not None and name not in names:
+            continue
+        sample = _sample(text, name_end, end)
+        if sample is not None:
+            labels_end, value = sample
+            yield name, text[name_end + 1 : labels_end], value
+
+
+def _iter_values(text: str, name: str) -> Iterator[float]:
+    """Values of every ``name`` sample, found by searching for the name at line starts."""
+    needle = "\n" + name
+    start = 0 if text.startswith(name) else text.find(needle) + 1
+    if start == 0 and not text.startswith(name):
+        return
+    while True:
+        end = _line_end(text, start)
+        name_end = start + len(name)
+        if name_end < end:
+            sample = _sample(text, name_end, end)
+            if sample is not None:
+                yield sample[1]
+        start = text.find(needle, end) + 1
+        if start == 0:
+            return
+
+
+def sum_by_name(text: str, names: Collection[str] | None = None) -> dict[str, float]:
+    """Sum every series of each metric name across all label combinations; NaN samples are skipped.
+
+    With ``names``, each name is searched for directly instead of visiting
+    every line of the scrape.
+    """
+    totals: dict[str, float] = {}
+    if names is None:
+        for name, _, value in iter_samples(text):
+            if value == value:
+                totals[name] = totals.get(name, 0.0) + value
+        return totals
+    for name in names:
+        found = False
+        total = 0.0
+        for value in _iter_values(text, name):
+            found = True
+            if value == value:
+                total += value
+        if found:
+            totals[name] = total
+    return totals
+
+
+def parse_labels(labels: str) -> dict[str, str]:
+    """Decode a raw label block as yielded by ``iter_samples``."""
+    parsed: dict[str, str] = {}
+    position, size = 0, len(labels)
+    while position < size:
+        equals = labels.find("=", position)
+        if equals == -1:
+            break
+        key = labels[position:equals].strip().lstrip(",").strip()
+        quote = labels.find('"', equals)
+        if quote == -1:
+            break
+        chars: list[str] = []
+        cursor = quote + 1
+        while cursor < size and labels[cursor] != '"':
+            if labels[cursor] == "\\" and cursor + 1 < size:
+                cursor += 1
+                chars.append("\n" if labels[cursor] == "n" else labels[cursor])
+            else:
+                chars.append(labels[cursor])
+            cursor += 1
+        parsed[key] = "".join(chars)
+        position = cursor + 1
+    return parsed
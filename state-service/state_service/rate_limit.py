@@ -0,0 +1,131 @@
+"""Per-user and per-model request and token rate limits, checked with GCRA.
+
+Each limit is a bucket of ``limit`` units per minute, stored as one
+theoretical arrival time (see ``RATE_LIMIT_SCRIPT``): a check is a single
+atomic Redis call whatever the number of limits, and a bucket that has
+refilled takes no space. ``user`` limits cap one caller across every model,
+``model`` limits cap every caller of one model, e.g. to stay within the
+deployment's Azure OpenAI TPM quota.
+"""
+from __future__ import annotations
+
+import logging
+import math
+from dataclasses import dataclass
+from typing import Any
+
+from . import codec
+from .config import (
+    RATE_LIMIT_MODEL_OVERRIDES,
+    RATE_LIMIT_MODEL_REQUESTS_PER_MINUTE,
+    RATE_LIMIT_MODEL_TOKENS_PER_MINUTE,
+    RATE_LIMIT_USER_REQUESTS_PER_MINUTE,
+    RATE_LIMIT_USER_TOKENS_PER_MINUTE,
+    rate_limit_key,
+)
+from .metrics import observe_rate_limit
+from .store import RateLimitBucket, consume_rate_limits
+
+logger = logging.getLogger(__name__)
+
+PERIOD_MS = 60_000
+KINDS = ("requests", "tokens")
+
+
+@dataclass(frozen=True)
+class Limits:
+    requests_per_minute: int = 0
+    tokens_per_minute: int = 0
+
+    def per_kind(self) -> tuple[tuple[str, int], ...]:
+        return (("requests", self.requests_per_minute), ("tokens", self.tokens_per_minute))
+
+
+def load_model_overrides(raw: str) -> dict[str, Limits]:
+    """Parse ``RATE_LIMIT_MODEL_OVERRIDES``; a malformed value is logged and ignored."""
+    if not raw:
+        return {}
+    try:
+        return {model: Limits(**limits) for model, limits in codec.loads(raw).items()}
+    except (ValueError, TypeError, AttributeError) as exc:
+        logger.error("Ignoring invalid RATE_LIMIT_MODEL_OVERRIDES: %s", exc)
+        return {}
+
+
+USER_LIMITS = Limits(RATE_LIMIT_USER_REQUESTS_PER_MINUTE, RATE_LIMIT_USER_TOKENS_PER_MINUTE)
+MODEL_LIMITS = Limits(RATE_LIMIT_MODEL_REQUESTS_PER_MINUTE, RATE_LIMIT_MODEL_TOKENS_PER_MINUTE)
+MODEL_OVERRIDES = load_model_overrides(RATE_LIMIT_MODEL_OVERRIDES)
+
+
+class CostExceedsLimit(ValueError):
+    """The check costs more than a bucket can ever hold, so waiting would not help."""
+
+
+@dataclass(frozen=True)
+class Decision:
+    allowed: bool
+    retry_after_ms: int
+    # (scope, kind, limit, remaining, reset ms) per checked limit.
+    limits: list[tuple[str, str, int, int, int]]
+
+    def body(self) -> dict[str, Any]:
+        return {
+            "allowed": self.allowed,
+            "retry_after_ms": self.retry_after_ms,
+            "limits": [
+                {"scope": scope, "kind": kind, "limit": limit, "remaining": remaining, "reset_ms": reset_ms}
+                for scope, kind, limit, remaining, reset_ms in self.limits
+            ],
+        }
+
+    def headers(self) -> dict[str, str]:
+        """``x-ratelimit-*`` headers as Azure OpenAI sends them, for the tightest limit of each kind."""
+        headers: dict[str, str] = {}
+        for kind in KINDS:
+            states = [state for state in self.limits if state[1] == kind]
+            if not states:
+                continue
+            _, _, limit, remaining, reset_ms = min(states, key=lambda state: state[3])
+            headers[f"x-ratelimit-limit-{kind}"] = str(limit)
+            headers[f"x-ratelimit-remaining-{kind}"] = str(remaining)
+            headers[f"x-ratelimit-reset-{kind}"] = f"{math.ceil(reset_ms / 1000)}s"
+        if not self.allowed:
+            headers["Retry-After"] = str(max(1, math.ceil(self.retry_after_ms / 1000)))
+        return headers
+
+
+def buckets_for(user_id: str, model: str | None, requests: int, tokens: int) -> list[tuple[str, str, RateLimitBucket]]:
+    """The configured limits that apply to a call, as ``(scope, kind, bucket)``."""
+    costs = {"requests": requests, "tokens": tokens}
+    scopes: list[tuple[str, str, Limits]] = [("user", user_id, USER_LIMITS)]
+    if model:
+        scopes.append(("model", model, MODEL_OVERRIDES.get(model, MODEL_LIMITS)))
+    buckets: list[tuple[str, str, RateLimitBucket]] = []
+    for scope, subject, limits in scopes:
+        for kind, limit in limits.per_kind():
+            if limit <= 0:
+                continue
+            if costs[kind] > limit:
+                raise CostExceedsLimit(f"{costs[kind]} {kind} exceeds the {scope} limit of {limit} per minute")
+            buckets.append((scope, kind, (rate_limit_key(scope, subject, kind), limit, PERIOD_MS, costs[kind])))
+    return buckets
+
+
+async def check(user_id: str, model: str | None, requests: int = 1, tokens: int = 0) -> Decision:
+    """Admit a call costing ``requests`` and ``tokens`` against every applicable limit, or none.
+
+    ``tokens`` is the caller's estimate (prompt plus ``max_tokens``). Raises
+    ``CostExceedsLimit`` for a cost no bucket could ever admit.
+    """
+    buckets = buckets_for(user_id, model, requests, tokens)
+    retry_after_ms, states = await consume_rate_limits([bucket for _, _, bucket in buckets])
+    decision = Decision(
+        retry_after_ms == 0,
+        retry_after_ms,
+        [
+            (scope, kind, bucket[1], remaining, reset_ms)
+            for (scope, kind, bucket), (remaining, reset_ms) in zip(buckets, states)
+        ],
+    )
+    observe_rate_limit(decision.allowed)
+    return decision
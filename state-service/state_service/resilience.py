@@ -0,0 +1,149 @@
+"""Degraded-mode building blocks used by the store while Redis is unreachable.
+
+``CircuitBreaker`` decides whether a Redis call is attempted at all,
+``RecentSnapshot`` remembers what this process last read or wrote so reads can
+still be answered, and ``WriteBehindQueue`` holds writes until Redis is back.
+"""
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from typing import Any
+
+BREAKER_CLOSED = "closed"
+BREAKER_OPEN = "open"
+BREAKER_HALF_OPEN = "half_open"
+
+
+class StoreUnavailable(Exception):
+    """Raised when an operation can be neither sent to Redis nor deferred."""
+
+
+class CircuitBreaker:
+    """Open after ``failure_threshold`` consecutive failures; probe again after ``reset_seconds``.
+
+    Half-open lets calls through as trials: the first success closes the
+    breaker, the first failure re-opens it for another ``reset_seconds``.
+    """
+
+    def __init__(self, failure_threshold: int, reset_seconds: float) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = BREAKER_CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.last_error: str | None = None
+
+    def allow(self) -> bool:
+        if self.state == BREAKER_OPEN:
+            if time.monotonic() - self.opened_at < self.reset_seconds:
+                return False
+            self.state = BREAKER_HALF_OPEN
+        return True
+
+    def record_success(self) -> None:
+        self.state = BREAKER_CLOSED
+        self.failures = 0
+
+    def record_failure(self, exc: BaseException) -> None:
+        self.failures += 1
+        self.last_error = str(exc) or type(exc).__name__
+        if self.state == BREAKER_HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = BREAKER_OPEN
+            self.opened_at = time.monotonic()
+
+    def report(self) -> dict[str, Any]:
+        report: dict[str, Any] = {"state": self.state, "failures": self.failures}
+        if self.state != BREAKER_CLOSED:
+            report["open_for_seconds"] = round(time.monotonic() - self.opened_at, 3)
+            report["last_error"] = self.last_error
+        return report
+
+
+class RecentSnapshot:
+    """The catalog and an LRU of selections this process has recently seen."""
+
+    def __init__(self, max_selections: int) -> None:
+        self.max_selections = max_selections
+        self.catalog: dict[str, Any] | None = None
+        # user_id -> (selection, recency score), least recently seen first.
+        self.selections: OrderedDict[str, tuple[dict[str, Any], float]] = OrderedDict()
+
+    def remember_catalog(self, value: dict[str, Any]) -> None:
+        if self.catalog is None or (value.get("version") or 0) >= (self.catalog.get("version") or 0):
+            self.catalog = value
+
+    def remember_selection(self, value: dict[str, Any], score: float) -> None:
+        user_id = value["user_id"]
+        current = self.selections.get(user_id)
+        if current is not None and current[1] > score:
+            self.selections.move_to_end(user_id)
+            return
+        self.selections[user_id] = (value, score)
+        self.selections.move_to_end(user_id)
+        while len(self.selections) > self.max_selections:
+            self.selections.popitem(last=False)
+
+    def selection(self, user_id: str) -> dict[str, Any] | None:
+        entry = self.selections.get(user_id)
+        if entry is None:
+            return None
+        self.selections.move_to_end(user_id)
+        return entry[0]
+
+    def recent(self) -> list[tuple[float, str, dict[str, Any]]]:
+        """Snapshot entries newest first, as ``(score, user_id, selection)``."""
+        return sorted(
+            ((score, user_id, value) for user_id, (value, score) in self.selections.items()),
+            key=lambda entry: (entry[0], entry[1]),
+            reverse=True,
+        )
+
+
+class WriteBehindQueue:
+    """Writes accepted while Redis was unreachable, coalesced per key.
+
+    Only the newest pending write per user is kept (last-writer-wins on the
+    recency score, i.e. ``updated_at``), and at most one catalog.
+    """
+
+    def __init__(self, max_items: int) -> None:
+        self.max_items = max_items
+        self.selections: OrderedDict[str, tuple[dict[str, Any], float]] = OrderedDict()
+        # (catalog without version, fingerprint, updated_at epoch)
+        self.catalog: tuple[dict[str, Any], str, float] | None = None
+
+    def __len__(self) -> int:
+        return len(self.selections) + (self.catalog is not None)
+
+    def push_selections(self, entries: list[tuple[dict[str, Any], float]]) -> None:
+        new_keys = {value["user_id"] for value, _ in entries} - self.selections.keys()
+        if len(self) + len(new_keys) > self.max_items:
+            raise StoreUnavailable("Write-behind queue is full")
+        for value, score in entries:
+            current = self.selections.get(value["user_id"])
+            if current is None or current[1] <= score:
+                self.selections[value["user_id"]] = (value, score)
+
+    def push_catalog(self, catalog: dict[str, Any], fingerprint: str, updated_at: float) -> None:
+        if self.catalog is None and len(self) >= self.max_items:
+            raise StoreUnavailable("Write-behind queue is full")
+        if self.catalog is None or self.catalog[2] <= updated_at:
+            self.catalog = (catalog, fingerprint, updated_at)
+
+    def peek_selections(self, limit: int) -> list[tuple[dict[str, Any], float]]:
+        return [entry for _, entry in zip(range(limit), self.selections.values())]
+
+    def discard_selections(self, entries: list[tuple[dict[str, Any], float]]) -> None:
+        """Drop replayed entries unless a newer write for the same user arrived meanwhile."""
+        for entry in entries:
+            user_id = entry[0]["user_id"]
+            if self.selections.get(user_id) is entry:
+                del self.selections[user_id]
+
+    def report(self) -> dict[str, Any]:
+        return {
+            "pending_selections": len(self.selections),
+            "pending_catalog": self.catalog is not None,
+            "capacity": self.max_items,
+        }
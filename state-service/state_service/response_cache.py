@@ -0,0 +1,297 @@
+"""Validator-based response cache for the state GET routes.
+
+Every piece of state a cached route reads has a version: the id of the last
+change event that touched it. Event ids come from one global sequence, so two
+replicas that have seen the same events derive the same version and hence the
+same ETag. While this replica is provably seeing every event (the pub/sub
+listener is subscribed, the breaker is closed and no writes are queued), a
+response is reused or answered with 304 by comparing versions in memory,
+without a Redis round trip. Otherwise requests go straight to the handlers.
+"""
+from __future__ import annotations
+
+import hmac
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable
+
+from fastapi import FastAPI
+from fastapi.routing import APIRoute
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from . import codec, store
+from .config import (
+    CACHE_MAX_AGE_CATALOG_SECONDS,
+    CACHE_MAX_AGE_SELECTION_SECONDS,
+    CACHE_MAX_AGE_SELECTIONS_SECONDS,
+    RESPONSE_CACHE_MAX_ENTRIES,
+    STATE_SERVICE_SHARED_TOKEN,
+)
+from .events import CATALOG_EVENT, SELECTION_EVENT, Event, event_hub
+from .resilience import BREAKER_CLOSED
+
+CATALOG_SCOPE = "catalog"
+# Any selection change; covers listings and counts across users.
+SELECTIONS_SCOPE = "selections"
+
+
+def selection_scope(user_id: str) -> str:
+    return f"selection:{user_id}"
+
+
+class StateVersions:
+    """Last change-event id per scope, as seen by this replica.
+
+    Scopes not touched since tracking (re)started share ``floor``, the event
+    sequence value read right after subscribing: their state is whatever it
+    was at that point in the sequence.
+    """
+
+    def __init__(self, max_scopes: int) -> None:
+        self.max_scopes = max_scopes
+        self.floor = 0
+        self.last_event_id = 0
+        self.versions: dict[str, int] = {}
+        # Scopes with a local write in flight whose event has not arrived yet,
+        # mapped to the last event id seen when the write started.
+        self.pending: dict[str, int] = {}
+        self.listening = False
+        # Bumped by reset(); a response stored before it may predate a sequence
+        # restart (e.g. Redis lost its data) and is never reused. Events after
+        # the restart reach observe() because the listener rewinds the event hub.
+        self.generation = 0
+
+    @property
+    def live(self) -> bool:
+        if store.redis_client is None:
+            # The memory backend publishes every change synchronously.
+            return True
+        return self.listening and store.breaker.state == BREAKER_CLOSED and not len(store.write_behind)
+
+    def current(self, scope: str) -> int | None:
+        """The scope's version, or None when it cannot be vouched for."""
+        if not self.live or scope in self.pending:
+            return None
+        return self.versions.get(scope, self.floor)
+
+    def reset(self, floor: int) -> None:
+        self.generation += 1
+        self.floor = self.last_event_id = floor
+        self.versions.clear()
+        self.pending.clear()
+
+    def observe(self, event: Event) -> None:
+        if event.type == CATALOG_EVENT:
+            scopes: tuple[str, ...] = (CATALOG_SCOPE,)
+        elif event.type == SELECTION_EVENT:
+            try:
+                user_id = codec.loads(event.data)["user_id"]
+            except (ValueError, TypeError, KeyError):
+                user_id = None
+            if not isinstance(user_id, str):
+                # Cannot tell whose selection changed, so every scope moves.
+                self.reset(max(self.last_event_id, event.id))
+                return
+            scopes = (SELECTIONS_SCOPE, selection_scope(user_id))
+        else:
+            return
+        self.last_event_id = max(self.last_event_id, event.id)
+        for scope in scopes:
+            self.versions[scope] = event.id
+            watermark = self.pending.get(scope)
+            if watermark is not None and event.id > watermark:
+                del self.pending[scope]
+        if len(self.versions) > self.max_scopes:
+            # Every scope is current as of the last event seen, so raising the
+            # floor to it keeps versions correct; clients just revalidate once.
+            self.floor = self.last_event_id
+            self.versions.clear()
+
+    def begin_write(self, scopes: Iterable[str]) -> int:
+        """Stop vouching for ``scopes`` until the event of a write about to run arrives.
+
+        Guards the window between a local write and its event coming back over
+        pub/sub. Returns the watermark to pass to ``cancel_write``.
+        """
+        watermark = self.last_event_id
+        for scope in scopes:
+            self.pending[scope] = watermark
+        return watermark
+
+    def cancel_write(self, scopes: Iterable[str], watermark: int) -> None:
+        """Undo ``begin_write`` for a write that changed nothing and so publishes no event."""
+        for scope in scopes:
+            if self.pending.get(scope) == watermark:
+                del self.pending[scope]
+
+
+state_versions = StateVersions(RESPONSE_CACHE_MAX_ENTRIES)
+
+
+@dataclass(frozen=True)
+class CachedRoute:
+    endpoint: Callable[..., Any]
+    scope: Callable[[str], str]
+    cache_control: bytes
+    per_user: bool
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    version: int
+    generation: int
+    etag: bytes
+    headers: list[tuple[bytes, bytes]]
+    body: bytes
+
+
+def cache_control(max_age_seconds: int) -> bytes:
+    # "no-cache" still lets clients keep the body and revalidate it with the ETag.
+    return f"max-age={max_age_seconds}".encode() if max_age_seconds > 0 else b"no-cache"
+
+
+# Path -> (version scope for the caller, max-age, response depends on X-User-Id).
+CACHED_PATHS: dict[str, tuple[Callable[[str], str], int, bool]] = {
+    "/state/catalog": (lambda _: CATALOG_SCOPE, CACHE_MAX_AGE_CATALOG_SECONDS, False),
+    "/state/selection": (selection_scope, CACHE_MAX_AGE_SELECTION_SECONDS, True),
+    "/state/selections": (lambda _: SELECTIONS_SCOPE, CACHE_MAX_AGE_SELECTIONS_SECONDS, True),
+}
+
+
+def _header(headers: list[tuple[bytes, bytes]], name: bytes) -> bytes | None:
+    for key, value in headers:
+        if key == name:
+            return value
+    return None
+
+
+def _etag_matches(if_none_match: bytes | None, etag: bytes) -> bool:
+    if not if_none_match:
+        return False
+    candidates = {candidate.strip().removeprefix(b"W/") for candidate in if_none_match.split(b",")}
+    return b"*" in candidates or etag.removeprefix(b"W/") in candidates
+
+
+class ResponseCacheMiddleware:
+    """Pure ASGI middleware serving ``CACHED_PATHS`` GETs from per-process memory.
+
+    Entries are keyed by path, query string and ``X-User-Id`` and hold the
+    version they were built at; an entry whose version moved on is rebuilt by
+    the handler. Handlers that set their own ETag keep it (the catalog's
+    ``"v<n>"`` doubles as its ``If-Match`` precondition); others get a weak
+    ETag derived from the version.
+    """
+
+    def __init__(self, app: ASGIApp, routes: dict[str, CachedRoute], max_entries: int) -> None:
+        self.app = app
+        self.routes = routes
+        self.max_entries = max_entries
+        self.entries: OrderedDict[tuple[str, bytes, str], CachedResponse] = OrderedDict()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        route = self.routes.get(scope["path"]) if scope["type"] == "http" else None
+        if route is None or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = scope["headers"]
+        token = _header(request_headers, b"x-state-service-token")
+        if STATE_SERVICE_SHARED_TOKEN and not (
+            token and hmac.compare_digest(token, STATE_SERVICE_SHARED_TOKEN.encode())
+        ):
+            # Let the handler reject it.
+            await self.app(scope, receive, send)
+            return
+
+        user_id = (_header(request_headers, b"x-user-id") or b"").decode("latin-1").strip()
+        generation = state_versions.generation
+        version = state_versions.current(route.scope(user_id))
+        if_none_match = _header(request_headers, b"if-none-match")
+        extra = [(b"cache-control", route.cache_control)]
+        if route.per_user:
+            extra.append((b"vary", b"X-User-Id"))
+
+        if version is None:
+            await self.app(scope, receive, self._with_headers(send, extra))
+            return
+
+        key = (scope["path"], scope["query_string"], user_id if route.per_user else "")
+        # Lets the metrics middleware attribute the request to its route even
+        # when the router never sees it.
+        scope["endpoint"] = route.endpoint
+        entry = self.entries.get(key)
+        if entry is not None and entry.version == version and entry.generation == generation:
+            self.entries.move_to_end(key)
+            await self._replay(entry, if_none_match, send)
+            return
+
+        started: dict[str, Any] = {}
+        chunks: list[bytes] = []
+
+        async def capture(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                started.update(message)
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+
+        # The handler always renders the full body so it can be stored; the
+        # precondition is evaluated here against the final ETag.
+        inner = dict(scope, headers=[header for header in request_headers if header[0] != b"if-none-match"])
+        await self.app(inner, receive, capture)
+        headers = list(started.get("headers", []))
+        body = b"".join(chunks)
+        if started.get("status") != 200:
+            headers.extend(extra)
+            await send({"type": "http.response.start", "status": started.get("status", 500), "headers": headers})
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        etag = _header(headers, b"etag")
+        if etag is None:
+            # The key's checksum keeps two users at the same version from sharing a tag.
+            digest = zlib.crc32(repr(key).encode())
+            etag = f'W/"{version}-{digest:08x}"'.encode()
+            headers.append((b"etag", etag))
+        entry = CachedResponse(version, generation, etag, headers + extra, body)
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        await self._replay(entry, if_none_match, send)
+
+    @staticmethod
+    def _with_headers(send: Send, extra: list[tuple[bytes, bytes]]) -> Send:
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message = dict(message, headers=[*message.get("headers", []), *extra])
+            await send(message)
+
+        return send_wrapper
+
+    @staticmethod
+    async def _replay(entry: CachedResponse, if_none_match: bytes | None, send: Send) -> None:
+        if _etag_matches(if_none_match, entry.etag):
+            headers = [(name, value) for name, value in entry.headers if name in (b"etag", b"cache-control", b"vary")]
+            await send({"type": "http.response.start", "status": 304, "headers": headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+        await send({"type": "http.response.start", "status": 200, "headers": entry.headers})
+        await send({"type": "http.response.body", "body": entry.body})
+
+
+def install_response_cache(app: FastAPI) -> None:
+    """Feed change events into ``state_versions`` and add the middleware for ``CACHED_PATHS``."""
+    if state_versions.observe not in event_hub.observers:
+        event_hub.observers.append(state_versions.observe)
+    endpoints = {
+        route.path: route.endpoint
+        for route in app.routes
+        if isinstance(route, APIRoute) and "GET" in route.methods
+    }
+    routes = {
+        path: CachedRoute(endpoints[path], scope, cache_control(max_age), per_user)
+        for path, (scope, max_age, per_user) in CACHED_PATHS.items()
+        if path in endpoints
+    }
+    app.add_middleware(ResponseCacheMiddleware, routes=routes, max_entries=RESPONSE_CACHE_MAX_ENTRIES)
@@ -0,0 +1,22 @@
+from __future__ import annotations
+
+from typing import Any
+
+from fastapi import Response
+
+from . import codec
+
+
+class JSONBytesResponse(Response):
+    """Response for bodies that are already serialized, or serialized once here.
+
+    Returning this from a route bypasses FastAPI's ``jsonable_encoder`` pass and
+    its second ``json.dumps``.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return codec.dumps(content)
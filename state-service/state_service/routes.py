@@ -1,16 +1,68 @@
 from __future__ import annotations
 
+import asyncio
 import hmac
-import json
 import logging
-from typing import Any
+from typing import Any, AsyncIterator
 
-from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi import APIRouter, Header, HTTPException, Query, Request, Response
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
 
-from .config import CATALOG_KEY, STATE_SERVICE_SHARED_TOKEN, USERS_KEY, selection_key
-from .schemas import CatalogPayload, SelectionPayload
-from .store import memory_store, read_json, redis_client, write_json
-from .utils import now_iso
+from . import codec, embedding_cache, rate_limit
+from .catalog_cache import load_catalog, save_catalog
+from .config import (
+    BREAKER_RESET_SECONDS,
+    EMBEDDING_BATCH_MAX,
+    GATEWAY_METRICS_URL,
+    SELECTION_BATCH_MAX,
+    STATE_SERVICE_SHARED_TOKEN,
+    STREAM_HEARTBEAT_SECONDS,
+    USAGE_BATCH_MAX,
+    USAGE_RETENTION_SECONDS,
+    selection_key,
+)
+from .events import RESET_FRAME, event_hub
+from .gateway_metrics import gateway_metrics
+from .health import health_report
+from .metrics import render_latest
+from .resilience import StoreUnavailable
+from .response_cache import CATALOG_SCOPE, SELECTIONS_SCOPE, selection_scope, state_versions
+from .schemas import (
+    CatalogPayload,
+    EmbeddingFillPayload,
+    EmbeddingLookupPayload,
+    RateLimitCheckPayload,
+    SelectionBatchGetPayload,
+    SelectionBatchPutPayload,
+    SelectionPayload,
+)
+from .store import (
+    CATALOG_APPLIED,
+    CATALOG_CONFLICT,
+    CATALOG_QUEUED,
+    catalog_stats,
+    count_selections,
+    empty_selection,
+    list_selections,
+    read_selection,
+    read_selections,
+    selection_stats,
+    upsert_selection,
+    upsert_selections,
+)
+from .responses import JSONBytesResponse
+from .usage import LineTooLong, ingest_events, ingest_lines, usage_window
+from .utils import (
+    catalog_fingerprint,
+    decode_cursor,
+    encode_cursor,
+    etag_matches,
+    iso_to_epoch,
+    now_iso,
+    version_from_etag,
+)
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -25,6 +77,11 @@ def require_user_id(user_id: str | None) -> str:
     return normalized_user_id
 
 
+def require_batch_size(size: int, limit: int = SELECTION_BATCH_MAX) -> None:
+    if size > limit:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {limit} items")
+
+
 def require_trusted_proxy_token(token: str | None) -> None:
     if not STATE_SERVICE_SHARED_TOKEN:
         return
@@ -32,59 +89,123 @@ def require_trusted_proxy_token(token: str | None) -> None:
         raise HTTPException(status_code=403, detail="Forbidden")
 
 
+def build_selection(user_id: str, payload: SelectionPayload) -> dict[str, Any]:
+    return {
+        "user_id": user_id,
+        "enabled": payload.enabled,
+        "selected_model": payload.selected_model.strip() if payload.selected_model else None,
+        "updated_at": now_iso(),
+    }
+
+
+async def store_unavailable_handler(request: Request, exc: Exception) -> Response:
+    if not isinstance(exc, StoreUnavailable):
+        raise exc
+    return JSONBytesResponse(
+        {"detail": str(exc)},
+        status_code=503,
+        headers={"Retry-After": str(max(1, round(BREAKER_RESET_SECONDS)))},
+    )
+
+
 @router.get("/healthz")
-async def healthz() -> dict[str, str]:
-    return {"status": "ok", "backend": "redis" if redis_client else "memory"}
+async def healthz() -> JSONBytesResponse:
+    # Liveness: always 200 so a Redis outage doesn't get the container restarted.
+    _, report = await health_report()
+    return JSONBytesResponse(report)
+
+
+@router.get("/readyz")
+async def readyz() -> JSONBytesResponse:
+    ready, report = await health_report()
+    return JSONBytesResponse(report, status_code=200 if ready else 503)
+
+
+@router.get("/metrics")
+async def metrics() -> Response:
+    body, content_type = render_latest()
+    return Response(content=body, media_type=content_type)
+
+
+@router.get("/state/metrics/summary")
+async def get_gateway_metrics_summary(
+    if_none_match: str | None = Header(default=None, alias="If-None-Match"),
+    x_state_service_token: str | None = Header(default=None, alias="X-State-Service-Token"),
+) -> Response:
+    require_trusted_proxy_token(x_state_service_token)
+    if not GATEWAY_METRICS_URL:
+        raise HTTPException(status_code=404, detail="Gateway metrics scraping is not configured")
+    body, etag = gateway_metrics.body, gateway_metrics.etag
+    if body is None:
+        raise HTTPException(
+            status_code=503,
+            detail="No gateway metrics scrape has completed yet",
+            headers={"Retry-After": str(max(1, round(gateway_metrics.interval_seconds)))},
+        )
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return JSONBytesResponse(body, headers={"ETag": etag})
 
 
 @router.get("/state/catalog")
-async def get_catalog(x_state_service_token: str | None = Header(default=None, alias="X-State-Service-Token")) -> dict[str, Any]:
+async def get_catalog(
+    if_none_match: str | None = Header(default=None, alias="If-None-Match"),
+    x_state_service_token: str | None = Header(default=None, alias="X-State-Service-Token"),
+) -> Response:
     require_trusted_proxy_token(x_state_service_token)
-    catalog = await read_json(CATALOG_KEY)
-    return catalog or {"models": [], "status": "unavailable", "updated_at": None}
+    entry = await load_catalog()
+    if etag_matches(if_none_match, entry.etag):
+        return Response(status_code=304, headers={"ETag": entry.etag})
+    return JSONBytesResponse(entry.body, headers={"ETag": entry.etag})
 
 
 @router.put("/state/catalog")
 async def put_catalog(
     payload: CatalogPayload,
+    if_match: str | None = Header(default=None, alias="If-Match"),
     x_state_service_token: str | None = Header(default=None, alias="X-State-Service-Token"),
-) -> dict[str, Any]:
+) -> JSONBytesResponse:
     require_trusted_proxy_token(x_state_service_token)
+    expected_version = payload.expected_version
+    if if_match:
+        try:
+            expected_version = version_from_etag(if_match)
+        except ValueError as exc:
+            raise HTTPException(status_code=412, detail=str(exc)) from exc
+
     models = sorted({model.strip() for model in payload.models if model and model.strip()})
     catalog = {"models": models, "status": payload.status, "updated_at": now_iso()}
-    await write_json(CATALOG_KEY, catalog)
-    return catalog
+    watermark = state_versions.begin_write((CATALOG_SCOPE,))
+    try:
+        outcome, version, entry = await save_catalog(
+            catalog, catalog_fingerprint(models, payload.status), expected_version
+        )
+    except Exception:
+        state_versions.cancel_write((CATALOG_SCOPE,), watermark)
+        raise
+    if outcome not in (CATALOG_APPLIED, CATALOG_QUEUED):
+        state_versions.cancel_write((CATALOG_SCOPE,), watermark)
+    if outcome == CATALOG_CONFLICT or entry is None:
+        raise HTTPException(status_code=412, detail=f"Catalog is at version {version}")
+    return JSONBytesResponse(entry.body, headers={"ETag": entry.etag, "X-Catalog-Write": outcome})
+
+
+@router.get("/state/catalog/stats")
+async def get_catalog_stats(
+    x_state_service_token: str | None = Header(default=None, alias="X-State-Service-Token"),
+) -> JSONBytesResponse:
+    require_trusted_proxy_token(x_state_service_token)
+    return JSONBytesResponse(await catalog_stats())
 
 
 @router.get("/state/selection")
 async def get_selection(
     x_user_id: str | None = Header(default=None, alias="X-User-Id"),
     x_state_service_token: str | None = Header(default=None, alias="X-State-Service-Token"),
-) -> dict[str, Any]:
+) -> JSONBytesResponse:
     require_trusted_proxy_token(x_state_service_token)
     user_id = require_user_id(x_user_id)
-
-    if redis_client:
-        key = selection_key(user_id)
-        raw = await redis_client.get(key)
-        if raw:
-            try:
-                return json.loads(raw)
-            except (json.JSONDecodeError, ValueError) as exc:
-                logger.warning(
-                    "Corrupted selection payload in redis for user_id=%s key=%s: %s",
-                    user_id,
-                    key,
-                    exc,
-                )
-                try:
-                    await redis_client.delete(key)
-                except Exception:
-                    logger.exception("Failed deleting corrupted redis key=%s", key)
-    elif user_id in memory_store.users:
-        return memory_store.users[user_id]
-
-    return {"user_id": user_id, "enabled": False, "selected_model": None, "updated_at": None}
+    return JSONBytesResponse(await read_selection(user_id) or empty_selection(user_id))
 
 
 @router.put("/state/selection")
@@ -92,59 +213,248 @@ async def put_selection(
     payload: SelectionPayload,
     x_user_id: str | None = Header(default=None, alias="X-User-Id"),
     x_state_service_token: str | None = Header(default=None, alias="X-State-Service-Token"),
-) -> dict[str, Any]:
+) -> JSONBytesResponse:
     require_trusted_proxy_token(x_state_service_token)
     user_id = require_user_id(x_user_id)
-    value = {
-        "user_id": user_id,
-        "enabled": payload.enabled,
-        "selected_model": payload.selected_model.strip() if payload.selected_model else None,
-        "updated_at": now_iso(),
-    }
+    value = build_selection(user_id, payload)
+    scopes = (SELECTIONS_SCOPE, selection_scope(user_id))
+    watermark = state_versions.begin_write(scopes)
+    try:
+        await upsert_selection(value, iso_to_epoch(value["updated_at"]))
+    except Exception:
+        state_versions.cancel_write(scopes, watermark)
+        raise
+    return JSONBytesResponse(value)
+
+
+@router.post("/state/selections:batchGet")
+async def batch_get_selections(
+    payload: SelectionBatchGetPayload,
+    x_state_service_token: str | None = Header(default=None, alias="X-State-Service-Token"),
+) -> JSONBytesResponse:
+    require_trusted_proxy_token(x_state_service_token)
+    require_batch_size(len(payload.user_ids))
+
+    results: list[dict[str, Any]] = []
+    valid: dict[str, list[int]] = {}
+    for index, raw_user_id in enumerate(payload.user_ids):
+        try:
+            selection_key(raw_user_id)
+        except ValueError as exc:
+            results.append({"user_id": raw_user_id, "error": str(exc)})
+            continue
+        valid.setdefault(raw_user_id.strip(), []).append(index)
+        results.append({})
+
+    user_ids = list(valid)
+    for user_id, value in zip(user_ids, await read_selections(user_ids)):
+        for index in valid[user_id]:
+            results[index] = {"user_id": user_id, "selection": value or empty_selection(user_id)}
+    return JSONBytesResponse({"items": results})
+
+
+@router.post("/state/selections:batchPut")
+async def batch_put_selections(
+    payload: SelectionBatchPutPayload,
+    x_state_service_token: str | None = Header(default=None, alias="X-State-Service-Token"),
+) -> JSONBytesResponse:
+    require_trusted_proxy_token(x_state_service_token)
+    require_batch_size(len(payload.items))
 
-    if redis_client:
-        await redis_client.set(selection_key(user_id), json.dumps(value))
-        await redis_client.sadd(USERS_KEY, user_id)
-    else:
-        memory_store.users[user_id] = value
+    results: list[dict[str, Any]] = []
+    entries: dict[str, tuple[dict[str, Any], float]] = {}
+    for item in payload.items:
+        try:
+            selection_key(item.user_id)
+        except ValueError as exc:
+            results.append({"user_id": item.user_id, "error": str(exc)})
+            continue
+        value = build_selection(item.user_id.strip(), item)
+        entries[value["user_id"]] = (value, iso_to_epoch(value["updated_at"]))
+        results.append({"user_id": value["user_id"], "selection": value})
 
-    return value
+    scopes = [SELECTIONS_SCOPE, *map(selection_scope, entries)] if entries else []
+    watermark = state_versions.begin_write(scopes)
+    try:
+        await upsert_selections(list(entries.values()))
+    except Exception:
+        state_versions.cancel_write(scopes, watermark)
+        raise
+    return JSONBytesResponse({"items": results})
 
 
 @router.get("/state/selections")
 async def get_selections(
     limit: int = Query(default=10, ge=1, le=100),
     include_self: bool = Query(default=False),
+    cursor: str | None = Query(default=None),
     x_user_id: str | None = Header(default=None, alias="X-User-Id"),
     x_state_service_token: str | None = Header(default=None, alias="X-State-Service-Token"),
-) -> dict[str, Any]:
+) -> JSONBytesResponse:
     require_trusted_proxy_token(x_state_service_token)
     current_user = require_user_id(x_user_id)
-    items: list[dict[str, Any]] = []
-
-    if redis_client:
-        user_ids = await redis_client.smembers(USERS_KEY)
-        keys: list[str] = []
-        for user_id in user_ids:
-            try:
-                keys.append(selection_key(user_id))
-            except ValueError as exc:
-                logger.warning("Skipping invalid user_id from redis set %s: %s", user_id, exc)
-
-        if keys:
-            raw_values = await redis_client.mget(keys)
-            for key, raw in zip(keys, raw_values):
-                if not raw:
-                    continue
-                try:
-                    items.append(json.loads(raw))
-                except (json.JSONDecodeError, ValueError) as exc:
-                    logger.warning("Skipping corrupted selection JSON for key=%s: %s", key, exc)
-    else:
-        items = list(memory_store.users.values())
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+    exclude_user = None if include_self else current_user
+    items, next_position = await list_selections(limit, after, exclude_user)
+    return JSONBytesResponse(
+        {
+            "items": items,
+            "total": await count_selections(exclude_user),
+            "next_cursor": encode_cursor(next_position) if next_position else None,
+        }
+    )
+
+
+@router.get("/state/selections/stats")
+async def get_selection_stats(
+    limit: int = Query(default=10, ge=1, le=100),
+    x_state_service_token: str | None = Header(default=None, alias="X-State-Service-Token"),
+) -> JSONBytesResponse:
+    require_trusted_proxy_token(x_state_service_token)
+    return JSONBytesResponse(await selection_stats(limit))
+
+
+@router.post("/state/usage:ingest")
+async def ingest_usage_events(
+    request: Request,
+    x_state_service_token: str | None = Header(default=None, alias="X-State-Service-Token"),
+) -> JSONBytesResponse:
+    """Count gateway usage events sent as ``{"events": [...]}`` or as an NDJSON stream.
+
+    NDJSON bodies (``Content-Type: application/x-ndjson``) may be any length and
+    are counted in batches while they stream in; a line over
+    ``USAGE_LINE_MAX_BYTES`` ends the stream with 413.
+    """
+    require_trusted_proxy_token(x_state_service_token)
+    if request.headers.get("content-type", "").startswith("application/x-ndjson"):
+        try:
+            return JSONBytesResponse(await ingest_lines(request.stream()))
+        except LineTooLong as exc:
+            raise HTTPException(status_code=413, detail=str(exc)) from exc
+    try:
+        body = codec.loads(await request.body())
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail="Body must be JSON or NDJSON") from exc
+    events = body.get("events") if isinstance(body, dict) else None
+    if not isinstance(events, list):
+        raise HTTPException(status_code=422, detail="Body must be an object with an 'events' list")
+    require_batch_size(len(events), USAGE_BATCH_MAX)
+    return JSONBytesResponse(await ingest_events(events))
+
+
+@router.get("/state/usage")
+async def get_usage(
+    window: int = Query(default=3600, ge=1, le=USAGE_RETENTION_SECONDS),
+    model: str | None = Query(default=None),
+    scope: str = Query(default="self", pattern="^(self|all)$"),
+    x_user_id: str | None = Header(default=None, alias="X-User-Id"),
+    x_state_service_token: str | None = Header(default=None, alias="X-State-Service-Token"),
+) -> JSONBytesResponse:
+    require_trusted_proxy_token(x_state_service_token)
+    user_id = None if scope == "all" else require_user_id(x_user_id)
+    return JSONBytesResponse(await usage_window(user_id, window, model))
+
+
+@router.post("/state/embeddings:lookup")
+async def lookup_embeddings(
+    payload: EmbeddingLookupPayload,
+    x_state_service_token: str | None = Header(default=None, alias="X-State-Service-Token"),
+) -> JSONBytesResponse:
+    require_trusted_proxy_token(x_state_service_token)
+    require_batch_size(len(payload.inputs), EMBEDDING_BATCH_MAX)
+    return JSONBytesResponse(
+        await embedding_cache.lookup(
+            payload.deployment, payload.dimensions, payload.inputs, payload.encoding_format
+        )
+    )
 
-    if not include_self:
-        items = [item for item in items if item.get("user_id") != current_user]
 
-    items.sort(key=lambda item: item.get("updated_at") or "", reverse=True)
-    return {"items": items[:limit], "total": len(items)}
+@router.post("/state/embeddings:fill")
+async def fill_embeddings(
+    request: Request,
+    x_state_service_token: str | None = Header(default=None, alias="X-State-Service-Token"),
+) -> JSONBytesResponse:
+    """Body: ``EmbeddingFillPayload``. Decoded here with the service codec rather than
+    by FastAPI, whose stdlib JSON parse is most of the cost for float-list vectors."""
+    require_trusted_proxy_token(x_state_service_token)
+    try:
+        payload = EmbeddingFillPayload.model_validate(codec.loads(await request.body()))
+    except ValueError as exc:
+        if not isinstance(exc, ValidationError):
+            raise HTTPException(status_code=400, detail="Body must be JSON") from exc
+        errors = [{**error, "loc": ("body", *error["loc"])} for error in exc.errors(include_url=False)]
+        raise RequestValidationError(errors) from exc
+    require_batch_size(len(payload.items), EMBEDDING_BATCH_MAX)
+    return JSONBytesResponse(await embedding_cache.fill(payload.deployment, payload.dimensions, payload.items))
+
+
+@router.get("/state/embeddings/stats")
+async def get_embedding_stats(
+    x_state_service_token: str | None = Header(default=None, alias="X-State-Service-Token"),
+) -> JSONBytesResponse:
+    require_trusted_proxy_token(x_state_service_token)
+    return JSONBytesResponse(await embedding_cache.stats())
+
+
+@router.post("/state/ratelimit:check")
+async def check_rate_limit(
+    payload: RateLimitCheckPayload,
+    x_user_id: str | None = Header(default=None, alias="X-User-Id"),
+    x_state_service_token: str | None = Header(default=None, alias="X-State-Service-Token"),
+) -> JSONBytesResponse:
+    """Charge a call against the caller's and the model's limits; 429 with ``Retry-After`` when over."""
+    require_trusted_proxy_token(x_state_service_token)
+    user_id = require_user_id(x_user_id)
+    try:
+        decision = await rate_limit.check(user_id, payload.model, payload.requests, payload.tokens)
+    except rate_limit.CostExceedsLimit as exc:
+        raise HTTPException(status_code=413, detail=str(exc)) from exc
+    return JSONBytesResponse(
+        decision.body(), status_code=200 if decision.allowed else 429, headers=decision.headers()
+    )
+
+
+@router.get("/state/stream")
+async def stream_changes(
+    last_event_id: str | None = Header(default=None, alias="Last-Event-ID"),
+    x_state_service_token: str | None = Header(default=None, alias="X-State-Service-Token"),
+) -> StreamingResponse:
+    require_trusted_proxy_token(x_state_service_token)
+    try:
+        resume_from = int(last_event_id) if last_event_id else None
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail="Last-Event-ID must be an integer") from exc
+
+    subscription, backlog = event_hub.subscribe(resume_from)
+
+    async def frames() -> AsyncIterator[bytes]:
+        try:
+            yield b"retry: 3000\n\n"
+            if backlog is None:
+                yield RESET_FRAME
+            else:
+                for missed in backlog:
+                    yield missed.frame
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), STREAM_HEARTBEAT_SECONDS)
+                except TimeoutError:
+                    if subscription.overflowed:
+                        return
+                    yield b": heartbeat\n\n"
+                    continue
+                yield RESET_FRAME if event is None else event.frame
+                if subscription.overflowed and subscription.queue.empty():
+                    return
+        finally:
+            event_hub.unsubscribe(subscription)
+
+    return StreamingResponse(
+        frames(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,4 +1,7 @@
-from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import Any, Literal
+
+from pydantic import AliasChoices, BaseModel, Field
 
 
 class SelectionPayload(BaseModel):
@@ -9,3 +12,57 @@ class SelectionPayload(BaseModel):
 class CatalogPayload(BaseModel):
     models: list[str] = Field(default_factory=list)
     status: str = Field(default="live")
+    expected_version: int | None = None
+
+
+class SelectionBatchItem(SelectionPayload):
+    user_id: str
+
+
+class SelectionBatchGetPayload(BaseModel):
+    user_ids: list[str] = Field(default_factory=list)
+
+
+class SelectionBatchPutPayload(BaseModel):
+    items: list[SelectionBatchItem] = Field(default_factory=list)
+
+
+class UsageEvent(BaseModel):
+    """One completed gateway call, as found in LiteLLM spend logs or the OTEL event shape."""
+
+    request_id: str | None = None
+    user_id: str | None = Field(default=None, validation_alias=AliasChoices("user_id", "user", "end_user"))
+    model: str = Field(validation_alias=AliasChoices("model", "model_group"))
+    prompt_tokens: int = Field(default=0, ge=0)
+    completion_tokens: int = Field(default=0, ge=0)
+    total_tokens: int | None = Field(default=None, ge=0)
+    timestamp: datetime | None = Field(default=None, validation_alias=AliasChoices("timestamp", "endTime", "end_time"))
+    start_time: datetime | None = Field(default=None, validation_alias=AliasChoices("start_time", "startTime"))
+    duration_ms: float | None = Field(default=None, ge=0, validation_alias=AliasChoices("duration_ms", "latency_ms"))
+    metadata: dict[str, Any] | None = None
+
+
+class EmbeddingLookupPayload(BaseModel):
+    deployment: str = Field(pattern=r"^\S+$")
+    dimensions: int | None = Field(default=None, ge=1)
+    inputs: list[str] = Field(default_factory=list)
+    encoding_format: Literal["float", "base64"] = "float"
+
+
+class EmbeddingFillItem(BaseModel):
+    input: str
+    # A float list, or base64 little-endian float32 as returned for encoding_format=base64.
+    embedding: list[float] | str
+
+
+class EmbeddingFillPayload(BaseModel):
+    deployment: str = Field(pattern=r"^\S+$")
+    dimensions: int | None = Field(default=None, ge=1)
+    items: list[EmbeddingFillItem] = Field(default_factory=list)
+
+
+class RateLimitCheckPayload(BaseModel):
+    model: str | None = None
+    requests: int = Field(default=1, ge=0)
+    # The call's token estimate, e.g. prompt tokens plus max_tokens.
+    tokens: int = Field(default=0, ge=0)
@@ -0,0 +1,58 @@
+"""Run the state service under uvicorn; the container command.
+
+Usage (from the state-service directory):
+  python -m state_service.serve
+  SERVE_FAST_LOOP=1 SERVE_WORKERS=2 REDIS_URL=redis://localhost:6379/0 python -m state_service.serve
+
+Defaults match plain ``uvicorn state_service.main:app``: one process on
+asyncio and h11. ``SERVE_FAST_LOOP`` switches to uvloop and httptools, and
+``SERVE_WORKERS`` runs that many processes on the same port. Each worker is a
+full replica of the app with its own pub/sub listener, local caches and
+gateway metrics scraper, so workers need REDIS_URL to share state, and
+Prometheus metrics switch to prometheus_client's multiprocess mode so that
+``/metrics`` on any worker reports all of them.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import tempfile
+from pathlib import Path
+
+import uvicorn
+
+from .config import REDIS_URL, SERVE_FAST_LOOP, SERVE_HOST, SERVE_PORT, SERVE_WORKERS
+
+logger = logging.getLogger(__name__)
+
+
+def prepare_multiprocess_metrics() -> None:
+    """Point prometheus_client at an empty directory before any worker imports it."""
+    directory = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if not directory:
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="state-service-metrics-")
+        return
+    # Files left by an earlier run would be summed into this one's counters.
+    for stale in Path(directory).glob("*.db"):
+        stale.unlink()
+
+
+def main() -> None:
+    workers = SERVE_WORKERS
+    if workers > 1 and not REDIS_URL:
+        logger.warning("SERVE_WORKERS=%d needs REDIS_URL, as each worker would keep its own state; using 1", workers)
+        workers = 1
+    if workers > 1:
+        prepare_multiprocess_metrics()
+    uvicorn.run(
+        "state_service.main:app",
+        host=SERVE_HOST,
+        port=SERVE_PORT,
+        workers=workers,
+        loop="uvloop" if SERVE_FAST_LOOP else "asyncio",
+        http="httptools" if SERVE_FAST_LOOP else "h11",
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,350 @@
 from __future__ import annotations
 
-import json
+import asyncio
+import heapq
+import importlib.util
 import logging
-from typing import Any
+import math
+import time
+from bisect import bisect_left, bisect_right, insort
+from collections import OrderedDict
+from operator import attrgetter
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterator, TypeVar
 
-from .config import CATALOG_KEY, REDIS_URL
+from . import codec
+from .config import (
+    BREAKER_FAILURE_THRESHOLD,
+    BREAKER_RESET_SECONDS,
+    CATALOG_KEY,
+    CATALOG_META_KEY,
+    EMBEDDING_CACHE_MAX_ENTRIES,
+    EMBEDDING_STATS_KEY,
+    EVENTS_CHANNEL,
+    EVENTS_SEQUENCE_KEY,
+    REDIS_CLUSTER,
+    REDIS_CONNECT_TIMEOUT_SECONDS,
+    REDIS_HEALTH_CHECK_INTERVAL_SECONDS,
+    REDIS_MAX_CONNECTIONS,
+    REDIS_POOL_TIMEOUT_SECONDS,
+    REDIS_RETRIES,
+    REDIS_RETRY_BACKOFF_CAP_SECONDS,
+    REDIS_SOCKET_TIMEOUT_SECONDS,
+    REDIS_URL,
+    SELECTION_BATCH_MAX,
+    SELECTION_MODELS_KEY,
+    SELECTION_STATS_KEY,
+    SELECTIONS_INDEX_KEY,
+    SNAPSHOT_MAX_SELECTIONS,
+    USAGE_BUCKET_SECONDS,
+    USAGE_RETENTION_SECONDS,
+    USERS_KEY,
+    WRITE_BEHIND_MAX,
+    WRITE_BEHIND_REPLAY_SECONDS,
+    selection_key,
+    usage_key,
+    usage_seen_key,
+)
+from .events import CATALOG_EVENT, SELECTION_EVENT, Event, event_hub
+from .metrics import CORRUPTED_DOCUMENT, CORRUPTED_SELECTION
+from .resilience import CircuitBreaker, RecentSnapshot, StoreUnavailable, WriteBehindQueue
+from .utils import epoch_to_iso, iso_to_epoch
+
+logger = logging.getLogger(__name__)
 
-try:
-    import redis.asyncio as redis
-except Exception:  # pragma: no cover
-    redis = None
+T = TypeVar("T")
 
+# redis-py is imported by connect_redis(), on first use; until then no Redis
+# call can fail, and connect_redis() sets the errors meaning "Redis is unreachable".
+REDIS_UNAVAILABLE: tuple[type[Exception], ...] = ()
+_REDIS_INSTALLED = importlib.util.find_spec("redis") is not None
 
-logger = logging.getLogger(__name__)
+# Position of an entry in the recency index: (updated_at epoch, user_id).
+IndexPosition = tuple[float, str]
+# One usage event ready to count: (user_id, bucket start epoch, request_id or
+# None, model, prompt tokens, completion tokens, total tokens, latency ms).
+UsageRecord = tuple[str, int, str | None, str, int, int, int, int]
+
+# Outcomes of a conditional catalog write.
+CATALOG_APPLIED = "applied"
+CATALOG_UNCHANGED = "unchanged"
+CATALOG_CONFLICT = "conflict"
+# Accepted while Redis is unreachable and queued for replay.
+CATALOG_QUEUED = "queued"
+# Replay lost to a newer catalog written in the meantime.
+CATALOG_STALE = "stale"
+
+# Change events are published from inside the write scripts, atomically with
+# the write, as "<id> <type> <json>" with ids drawn from EVENTS_SEQUENCE_KEY.
+
+# KEYS: catalog, catalog meta hash, event sequence. ARGV: fingerprint, expected
+# version ("" = any), serialized catalog object without a version field, channel,
+# updated_at epoch, and "1" to skip the write if the stored catalog is newer.
+PUT_CATALOG_SCRIPT = """
+local meta = redis.call('HMGET', KEYS[2], 'version', 'fingerprint', 'updated_at')
+local version = tonumber(meta[1]) or 0
+if ARGV[2] ~= '' and tonumber(ARGV[2]) ~= version then
+  redis.call('HINCRBY', KEYS[2], 'writes_conflicted', 1)
+  return {'conflict', version}
+end
+local current = redis.call('GET', KEYS[1])
+if current and meta[2] == ARGV[1] then
+  redis.call('HINCRBY', KEYS[2], 'writes_skipped', 1)
+  return {'unchanged', version, current}
+end
+if current and ARGV[6] == '1' and (tonumber(meta[3]) or 0) > tonumber(ARGV[5]) then
+  redis.call('HINCRBY', KEYS[2], 'writes_skipped', 1)
+  return {'stale', version, current}
+end
+version = version + 1
+-- Splice the version in before the closing brace rather than round-tripping
+-- through cjson, which would turn an empty models list into an object.
+local body = string.sub(ARGV[3], 1, -2) .. ',"version":' .. version .. '}'
+redis.call('SET', KEYS[1], body)
+redis.call('HSET', KEYS[2], 'version', version, 'fingerprint', ARGV[1], 'updated_at', ARGV[5])
+redis.call('HINCRBY', KEYS[2], 'writes_applied', 1)
+local event_id = redis.call('INCR', KEYS[3])
+redis.call('PUBLISH', ARGV[4], event_id .. ' catalog ' .. body)
+return {'applied', version, body}
+"""
+
+# Shared by the selection scripts, whose first five KEYS are the users set,
+# recency index, event sequence, model counts ZSET and selection stats hash.
+# move_count moves the model counts from the previously counted model to the
+# new one ("" = none); index_selection also indexes the user and publishes the
+# change.
+_INDEX_SELECTION_LUA = """
+local function move_count(previous, model)
+  if previous == model then
+    return
+  end
+  if previous ~= '' then
+    if tonumber(redis.call('ZINCRBY', KEYS[4], -1, previous)) <= 0 then
+      redis.call('ZREM', KEYS[4], previous)
+    end
+    redis.call('HINCRBY', KEYS[5], 'enabled', -1)
+  end
+  if model ~= '' then
+    redis.call('ZINCRBY', KEYS[4], 1, model)
+    redis.call('HINCRBY', KEYS[5], 'enabled', 1)
+  end
+end
+
+local function index_selection(blob, user_id, score, previous, model, channel)
+  move_count(previous, model)
+  redis.call('SADD', KEYS[1], user_id)
+  redis.call('ZADD', KEYS[2], score, user_id)
+  local event_id = redis.call('INCR', KEYS[3])
+  redis.call('PUBLISH', channel, event_id .. ' selection ' .. blob)
+end
+"""
+
+# KEYS: the five above, then one selection key per item. ARGV: channel, "1" to
+# skip items whose indexed score is newer, then a (blob, user_id, score, counted
+# model) quadruple per selection key; the counted model is "" unless the
+# selection is enabled with a model. The model counts move by the difference
+# between the stored selection and the new one. Returns the number written.
+UPSERT_SELECTIONS_SCRIPT = _INDEX_SELECTION_LUA + """
+local function counted_model(raw)
+  if not raw then
+    return ''
+  end
+  local ok, value = pcall(cjson.decode, raw)
+  if not ok or type(value) ~= 'table' or value.enabled ~= true or type(value.selected_model) ~= 'string' then
+    return ''
+  end
+  return value.selected_model
+end
+
+local applied = 0
+for i = 6, #KEYS do
+  local base = (i - 6) * 4 + 2
+  local blob, user_id, score, model = ARGV[base + 1], ARGV[base + 2], ARGV[base + 3], ARGV[base + 4]
+  local current = ARGV[2] == '1' and redis.call('ZSCORE', KEYS[2], user_id)
+  if not current or tonumber(current) <= tonumber(score) then
+    local previous = counted_model(redis.call('GET', KEYS[i]))
+    redis.call('SET', KEYS[i], blob)
+    index_selection(blob, user_id, score, previous, model, ARGV[1])
+    applied = applied + 1
+  end
+end
+return applied
+"""
+
+# Cluster form of the upsert's bookkeeping, for selections already written to
+# their own slots. KEYS: the five above. ARGV: channel, then a (blob, user_id,
+# score, previously counted model, counted model) quintuple per selection.
+INDEX_SELECTIONS_SCRIPT = _INDEX_SELECTION_LUA + """
+local applied = 0
+for base = 2, #ARGV, 5 do
+  index_selection(ARGV[base], ARGV[base + 1], ARGV[base + 2], ARGV[base + 3], ARGV[base + 4], ARGV[1])
+  applied = applied + 1
+end
+return applied
+"""
+
+# Removal of selections by the compactor, whose blobs are already deleted or
+# were missing. KEYS: the five above. ARGV: channel, then a (user_id, indexed
+# score or "" if unindexed, counted model of the deleted blob or "") triple per
+# selection. The counts always drop by the deleted blob's model; the user is
+# only unindexed while its score is still the one given, so one written since
+# stays listed. Publishes the empty selection for every user removed and
+# returns their number.
+REMOVE_SELECTIONS_SCRIPT = _INDEX_SELECTION_LUA + """
+local removed = 0
+for base = 2, #ARGV, 3 do
+  local user_id, score, released = ARGV[base], ARGV[base + 1], ARGV[base + 2]
+  move_count(released, '')
+  local current = redis.call('ZSCORE', KEYS[2], user_id)
+  if (score == '' and not current) or (current and tonumber(current) == tonumber(score)) then
+    redis.call('SREM', KEYS[1], user_id)
+    redis.call('ZREM', KEYS[2], user_id)
+    local event_id = redis.call('INCR', KEYS[3])
+    local empty = '{"user_id":' .. cjson.encode(user_id) .. ',"enabled":false,"selected_model":null,"updated_at":null}'
+    redis.call('PUBLISH', ARGV[1], event_id .. ' selection ' .. empty)
+    removed = removed + 1
+  end
+end
+return removed
+"""
+
+# KEYS: one selection key. ARGV: the blob read from it. Sent with EVAL in a
+# pipeline, which a cluster routes per key like any other command.
+DELETE_IF_UNCHANGED_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+  return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+# Per-model counters kept in every usage bucket hash, as "<model>|<counter>"
+# fields, plus "<model>|latency_ms_max".
+USAGE_COUNTERS = ("requests", "prompt_tokens", "completion_tokens", "total_tokens", "latency_ms")
+
+# KEYS: every usage bucket hash and request-id marker the batch touches. ARGV:
+# retention seconds, then per event (user bucket index, total bucket index,
+# marker index or 0, model, prompt, completion, total tokens, latency ms).
+# Events whose request id was already counted are skipped, so a forwarder can
+# redeliver a batch after a timeout. Returns the number of events counted.
+INGEST_USAGE_SCRIPT = """
+local retention = tonumber(ARGV[1])
+local applied = 0
+local touched = {}
+for base = 2, #ARGV, 8 do
+  local marker = tonumber(ARGV[base + 2])
+  if marker == 0 or redis.call('SET', KEYS[marker], 1, 'NX', 'EX', retention) then
+    local model, latency = ARGV[base + 3], tonumber(ARGV[base + 7])
+    for offset = 0, 1 do
+      local index = tonumber(ARGV[base + offset])
+      local key = KEYS[index]
+      redis.call('HINCRBY', key, model .. '|requests', 1)
+      redis.call('HINCRBY', key, model .. '|prompt_tokens', ARGV[base + 4])
+      redis.call('HINCRBY', key, model .. '|completion_tokens', ARGV[base + 5])
+      redis.call('HINCRBY', key, model .. '|total_tokens', ARGV[base + 6])
+      redis.call('HINCRBY', key, model .. '|latency_ms', latency)
+      if latency > (tonumber(redis.call('HGET', key, model .. '|latency_ms_max')) or -1) then
+        redis.call('HSET', key, model .. '|latency_ms_max', latency)
+      end
+      touched[index] = true
+    end
+    applied = applied + 1
+  end
+end
+for index in pairs(touched) do
+  redis.call('EXPIRE', KEYS[index], retention)
+end
+return applied
+"""
+
+# GCRA over every bucket of one check. KEYS: one bucket per limit, each holding
+# its theoretical arrival time (TAT) in epoch ms. ARGV: a (limit, period ms,
+# cost) triple per key. Either every bucket admits the cost and is charged, or
+# none is. Returns the ms until the request could be admitted (0 = admitted),
+# then per bucket the remaining capacity and the ms until it is full again.
+# Buckets expire once full, so idle users and models leave no keys behind.
+RATE_LIMIT_SCRIPT = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+local current, charged = {}, {}
+local retry = 0
+for i = 1, #KEYS do
+  local base = (i - 1) * 3
+  local limit, period, cost = tonumber(ARGV[base + 1]), tonumber(ARGV[base + 2]), tonumber(ARGV[base + 3])
+  current[i] = math.max(tonumber(redis.call('GET', KEYS[i])) or now, now)
+  charged[i] = current[i] + cost * period / limit
+  retry = math.max(retry, charged[i] - period - now)
+end
+local result = {math.ceil(retry)}
+for i = 1, #KEYS do
+  local base = (i - 1) * 3
+  local limit, period = tonumber(ARGV[base + 1]), tonumber(ARGV[base + 2])
+  local tat = current[i]
+  if retry <= 0 then
+    tat = charged[i]
+    if tat > now then
+      redis.call('SET', KEYS[i], string.format('%.3f', tat), 'PX', math.ceil(tat - now))
+    end
+  end
+  result[#result + 1] = math.floor((period - (tat - now)) * limit / period)
+  result[#result + 1] = math.ceil(tat - now)
+end
+return result
+"""
+
+_scripts: dict[str, Any] = {}
+
+# One GCRA bucket to charge: (key, limit per period, period ms, cost).
+RateLimitBucket = tuple[str, int, int, int]
+# Outcome of a rate-limit check: ms until it could be admitted (0 = admitted),
+# then (remaining capacity, ms until full) per bucket.
+RateLimitOutcome = tuple[int, list[tuple[int, int]]]
+
+# Fields of EMBEDDING_STATS_KEY.
+EMBEDDING_COUNTERS = ("hits", "misses", "stored")
+
+
+def counted_model(value: dict[str, Any]) -> str | None:
+    """The model a selection counts towards in the popularity stats: only enabled ones count."""
+    model = value.get("selected_model")
+    return model if value.get("enabled") is True and isinstance(model, str) and model else None
+
+
+def empty_selection(user_id: str) -> dict[str, Any]:
+    """What a user without a stored selection reads, and what removing one publishes."""
+    return {"user_id": user_id, "enabled": False, "selected_model": None, "updated_at": None}
+
+
+class SelectionRecord:
+    """One user's selection in the memory backend.
+
+    About a third of the size of the API dict it replaces: the timestamp is
+    kept as the epoch float that also orders the recency index, and the model
+    name is shared with every other record naming that model. The ISO string
+    is only rendered, and then kept, once the record is read.
+    """
+
+    __slots__ = ("user_id", "enabled", "selected_model", "updated_at", "_updated_at_iso")
+
+    def __init__(self, user_id: str, enabled: bool, selected_model: str | None, updated_at: float) -> None:
+        self.user_id = user_id
+        self.enabled = enabled
+        self.selected_model = selected_model
+        self.updated_at = updated_at
+        self._updated_at_iso: str | None = None
+
+    def as_dict(self) -> dict[str, Any]:
+        updated_at = self._updated_at_iso
+        if updated_at is None:
+            updated_at = self._updated_at_iso = epoch_to_iso(self.updated_at)
+        return {
+            "user_id": self.user_id,
+            "enabled": self.enabled,
+            "selected_model": self.selected_model,
+            "updated_at": updated_at,
+        }
+
+
+# Sort key of a record in the recency index; the same (score, user_id) shape as IndexPosition.
+_record_position = attrgetter("updated_at", "user_id")
 
 
 class InMemoryStore:
@@ -22,33 +354,1105 @@ class InMemoryStore:
             "status": "unavailable",
             "updated_at": None,
         }
-        self.users: dict[str, dict[str, Any]] = {}
+        self.catalog_meta: dict[str, Any] = {
+            "version": 0,
+            "fingerprint": None,
+            "writes_applied": 0,
+            "writes_skipped": 0,
+            "writes_conflicted": 0,
+        }
+        self.users: dict[str, SelectionRecord] = {}
+        # The same records in ascending (updated_at, user_id) order, mirroring
+        # the Redis ZSET; pages are read by walking it backwards, never copied.
+        self.recency: list[SelectionRecord] = []
+        # One string object per model name, shared by the catalog and records.
+        self.model_names: dict[str, str] = {}
+        # Popularity counters, kept like SELECTION_MODELS_KEY and SELECTION_STATS_KEY.
+        self.model_counts: dict[str, int] = {}
+        self.enabled_selections = 0
+        self.event_seq = 0
+        # Usage bucket key -> counters, and counted request ids -> expiry epoch.
+        # Both are pruned at most once per usage bucket; an expired request id
+        # no longer deduplicates even before it is pruned.
+        self.usage: dict[str, dict[str, int]] = {}
+        self.usage_seen: dict[str, float] = {}
+        self.usage_prune_at = 0.0
+        # Embedding cache key -> (expiry epoch, packed vector), least recently used first.
+        self.embeddings: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+        self.embedding_counts = {field: 0 for field in EMBEDDING_COUNTERS}
+        # Rate-limit bucket key -> TAT epoch ms; full buckets are pruned once
+        # the dict doubles in size.
+        self.rate_limits: dict[str, float] = {}
+        self.rate_limits_prune_at = 1024
+
+    def emit(self, event_type: str, value: dict[str, Any]) -> None:
+        self.event_seq += 1
+        event_hub.publish(Event(self.event_seq, event_type, codec.dumps_str(value)))
+
+    def intern_model(self, name: str) -> str:
+        return self.model_names.setdefault(name, name)
+
+    def put_selection(self, value: dict[str, Any], score: float) -> None:
+        """Store ``value``; ``score`` is its ``updated_at`` as an epoch, as for the Redis index."""
+        user_id = value["user_id"]
+        previous = self.users.get(user_id)
+        if previous is not None:
+            del self.recency[bisect_left(self.recency, _record_position(previous), key=_record_position)]
+        model = value.get("selected_model")
+        record = SelectionRecord(user_id, bool(value.get("enabled")), model and self.intern_model(model), score)
+        self._count(previous.selected_model if previous is not None and previous.enabled else None, -1)
+        self._count(counted_model(value), 1)
+        insort(self.recency, record, key=_record_position)
+        self.users[user_id] = record
+        self.emit(SELECTION_EVENT, value)
+
+    def expire_selections(self, cutoff: float, limit: int) -> int:
+        """Remove up to ``limit`` selections last updated at or before ``cutoff``, oldest first."""
+        recency = self.recency
+        end = min(limit, bisect_right(recency, cutoff, key=attrgetter("updated_at")))
+        expired = recency[:end]
+        del recency[:end]
+        for record in expired:
+            del self.users[record.user_id]
+            self._count(record.selected_model if record.enabled else None, -1)
+            self.emit(SELECTION_EVENT, empty_selection(record.user_id))
+        return len(expired)
+
+    def _count(self, model: str | None, delta: int) -> None:
+        # An empty model counts nowhere, like counted_model and its Lua twin.
+        if not model:
+            return
+        count = self.model_counts.get(model, 0) + delta
+        if count > 0:
+            self.model_counts[model] = count
+        else:
+            self.model_counts.pop(model, None)
+        self.enabled_selections += delta
+
+    def selection(self, user_id: str) -> dict[str, Any] | None:
+        record = self.users.get(user_id)
+        return record.as_dict() if record is not None else None
+
+    def iter_recent(self, after: IndexPosition | None = None) -> Iterator[IndexPosition]:
+        recency = self.recency
+        end = len(recency) if after is None else bisect_left(recency, after, key=_record_position)
+        for index in range(end - 1, -1, -1):
+            yield _record_position(recency[index])
+
+    def get_embeddings(self, keys: list[str], ttl_seconds: int) -> list[bytes | None]:
+        now = time.time()
+        values: list[bytes | None] = []
+        for key in keys:
+            entry = self.embeddings.get(key)
+            if entry is not None and entry[0] <= now:
+                del self.embeddings[key]
+                entry = None
+            if entry is None:
+                values.append(None)
+                continue
+            self.embeddings[key] = (now + ttl_seconds, entry[1])
+            self.embeddings.move_to_end(key)
+            values.append(entry[1])
+        return values
+
+    def put_embeddings(self, entries: list[tuple[str, bytes]], ttl_seconds: int) -> int:
+        expiry = time.time() + ttl_seconds
+        for key, blob in entries:
+            self.embeddings[key] = (expiry, blob)
+            self.embeddings.move_to_end(key)
+        while len(self.embeddings) > EMBEDDING_CACHE_MAX_ENTRIES:
+            self.embeddings.popitem(last=False)
+        self.embedding_counts["stored"] += len(entries)
+        return len(entries)
+
+    def consume_rate_limits(self, buckets: list[RateLimitBucket], now_ms: float) -> RateLimitOutcome:
+        """RATE_LIMIT_SCRIPT against this process's buckets."""
+        tats = self.rate_limits
+        current = [max(tats.get(key, now_ms), now_ms) for key, _, _, _ in buckets]
+        charged = [tat + cost * period / limit for tat, (_, limit, period, cost) in zip(current, buckets)]
+        retry = max(
+            (tat - period - now_ms for tat, (_, _, period, _) in zip(charged, buckets)), default=0.0
+        )
+        if retry <= 0:
+            current = charged
+            for (key, _, _, _), tat in zip(buckets, charged):
+                if tat > now_ms:
+                    tats[key] = tat
+            if len(tats) >= self.rate_limits_prune_at:
+                self.rate_limits = tats = {key: tat for key, tat in tats.items() if tat > now_ms}
+                self.rate_limits_prune_at = max(1024, 2 * len(tats))
+        return max(0, math.ceil(retry)), [
+            (math.floor((period - (tat - now_ms)) * limit / period), math.ceil(tat - now_ms))
+            for tat, (_, limit, period, _) in zip(current, buckets)
+        ]
+
+    def add_usage(self, records: list[UsageRecord], retention_seconds: int) -> int:
+        now = time.time()
+        if now >= self.usage_prune_at:
+            self.usage_seen = {key: expiry for key, expiry in self.usage_seen.items() if expiry > now}
+            oldest = int(now) - retention_seconds
+            self.usage = {key: value for key, value in self.usage.items() if int(key.rsplit(":", 1)[1]) >= oldest}
+            self.usage_prune_at = now + USAGE_BUCKET_SECONDS
+        applied = 0
+        for user_id, bucket_start, request_id, model, *amounts in records:
+            if request_id is not None:
+                if self.usage_seen.get(request_id, 0.0) > now:
+                    continue
+                self.usage_seen[request_id] = now + retention_seconds
+            for key in (usage_key(user_id, bucket_start), usage_key(None, bucket_start)):
+                counters = self.usage.setdefault(key, {})
+                for name, amount in zip(USAGE_COUNTERS, [1, *amounts]):
+                    field = f"{model}|{name}"
+                    counters[field] = counters.get(field, 0) + amount
+                field = f"{model}|latency_ms_max"
+                counters[field] = max(counters.get(field, -1), amounts[-1])
+            applied += 1
+        return applied
 
 
 memory_store = InMemoryStore()
-redis_client = (
-    redis.from_url(REDIS_URL, decode_responses=True) if REDIS_URL and redis else None
-)
+# Created by connect_redis() from the app lifespan; None means the memory backend.
+redis_client: Any = None
+
+# Degraded mode for the Redis backend: reads fall back to what this process has
+# seen recently and writes are queued until the breaker closes again.
+breaker = CircuitBreaker(BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_SECONDS)
+snapshot = RecentSnapshot(SNAPSHOT_MAX_SELECTIONS)
+write_behind = WriteBehindQueue(WRITE_BEHIND_MAX)
+
+
+def backend_name() -> str:
+    return "redis" if REDIS_URL and _REDIS_INSTALLED else "memory"
+
+
+async def connect_redis() -> None:
+    """Create the Redis client. No connection is opened until the first command."""
+    global REDIS_UNAVAILABLE, redis_client
+    if backend_name() != "redis" or redis_client is not None:
+        return
+    from . import redis_clients as clients
+
+    REDIS_UNAVAILABLE = clients.REDIS_UNAVAILABLE
+    options: dict[str, Any] = {
+        "decode_responses": True,
+        "max_connections": REDIS_MAX_CONNECTIONS,
+        "socket_timeout": REDIS_SOCKET_TIMEOUT_SECONDS,
+        "socket_connect_timeout": REDIS_CONNECT_TIMEOUT_SECONDS,
+        "socket_keepalive": True,
+        "health_check_interval": REDIS_HEALTH_CHECK_INTERVAL_SECONDS,
+        "retry": clients.Retry(clients.ExponentialBackoff(cap=REDIS_RETRY_BACKOFF_CAP_SECONDS), REDIS_RETRIES),
+        "retry_on_error": list(clients.REDIS_UNAVAILABLE),
+    }
+    if REDIS_CLUSTER:
+        # Slots are discovered on the first command; max_connections is per node
+        # and, unlike the blocking pool, an exhausted node fails fast.
+        redis_client = clients.InstrumentedRedisCluster.from_url(REDIS_URL, **options)
+        return
+    pool = clients.redis.BlockingConnectionPool.from_url(REDIS_URL, timeout=REDIS_POOL_TIMEOUT_SECONDS, **options)
+    redis_client = clients.InstrumentedRedis.from_pool(pool)
+
+
+async def close_redis() -> None:
+    global redis_client
+    client, redis_client = redis_client, None
+    _scripts.clear()
+    if client is not None:
+        await client.aclose()
+
+
+async def subscribe(channel: str) -> Any:
+    """A pub/sub connection subscribed to ``channel``; close it with ``unsubscribe``.
+
+    The cluster client has no pub/sub, so on a cluster the subscription is held
+    on one node: PUBLISH is broadcast to every node.
+    """
+    if REDIS_CLUSTER:
+        from .redis_clients import redis
+
+        await redis_client.initialize()
+        node = redis_client.get_default_node()
+        pool = redis.ConnectionPool(connection_class=node.connection_class, **node.connection_kwargs)
+        pubsub = redis.Redis.from_pool(pool).pubsub()
+    else:
+        pubsub = redis_client.pubsub()
+    await pubsub.subscribe(channel)
+    return pubsub
+
+
+async def unsubscribe(pubsub: Any) -> None:
+    """Close a connection returned by ``subscribe``, and on a cluster the pool made for it."""
+    try:
+        await pubsub.aclose()
+    finally:
+        if REDIS_CLUSTER:
+            await pubsub.connection_pool.aclose()
+
+
+def pool_stats() -> dict[str, int] | None:
+    if redis_client is None:
+        return None
+    if REDIS_CLUSTER:
+        nodes = redis_client.get_nodes()
+        # redis-py has no public accessors for these counts either.
+        idle = sum(len(node._free) for node in nodes)
+        return {
+            "max_connections": sum(node.max_connections for node in nodes),
+            "in_use": sum(len(node._connections) for node in nodes) - idle,
+            "idle": idle,
+        }
+    pool = redis_client.connection_pool
+    return {
+        "max_connections": pool.max_connections,
+        # redis-py has no public accessors for these counts.
+        "in_use": len(pool._in_use_connections),
+        "idle": len(pool._available_connections),
+    }
+
+
+def _script(source: str) -> Any:
+    script = _scripts.get(source)
+    if script is None:
+        script = _scripts[source] = redis_client.register_script(source)
+    return script
+
+
+async def load_scripts() -> None:
+    """SCRIPT LOAD every Lua script once so request paths go straight to EVALSHA.
+
+    Runs in the background of the app lifespan, all scripts concurrently, so it
+    does not hold up startup. Failures are logged, not raised: redis-py falls
+    back to EVAL and caches the SHA on the first NOSCRIPT, so a script used
+    before it is loaded only costs one extra round trip.
+    """
+    if not redis_client:
+        return
+    upsert = INDEX_SELECTIONS_SCRIPT if REDIS_CLUSTER else UPSERT_SELECTIONS_SCRIPT
+    sources = (PUT_CATALOG_SCRIPT, upsert, REMOVE_SELECTIONS_SCRIPT, INGEST_USAGE_SCRIPT, RATE_LIMIT_SCRIPT)
+    results = await asyncio.gather(*(redis_client.script_load(source) for source in sources), return_exceptions=True)
+    for source, result in zip(sources, results):
+        if isinstance(result, Exception):
+            logger.error("Failed loading Lua script into redis", exc_info=result)
+        else:
+            _script(source).sha = result
+
+
+async def _guarded(operation: Callable[[], Awaitable[T]], fallback: Callable[[], T]) -> T:
+    """Run a Redis operation through the circuit breaker.
+
+    ``fallback`` answers instead while the breaker is open or when the call
+    fails because Redis is unreachable. Other Redis errors still propagate.
+    """
+    if not breaker.allow():
+        return fallback()
+    try:
+        result = await operation()
+    except REDIS_UNAVAILABLE as exc:
+        breaker.record_failure(exc)
+        logger.warning("Redis unavailable, serving from the local snapshot: %s", exc)
+        return fallback()
+    breaker.record_success()
+    return result
+
+
+def _unavailable(message: str) -> Callable[[], Any]:
+    def fallback() -> Any:
+        raise StoreUnavailable(message)
+
+    return fallback
+
+
+def _remember_selection(value: dict[str, Any]) -> None:
+    snapshot.remember_selection(value, iso_to_epoch(value.get("updated_at")))
+
+
+def _pending_selection(user_id: str, value: dict[str, Any] | None) -> dict[str, Any] | None:
+    # A queued write not yet replayed is newer than anything Redis holds.
+    pending = write_behind.selections.get(user_id)
+    return pending[0] if pending is not None else value
 
 
 async def read_json(key: str) -> dict[str, Any] | None:
     if redis_client:
-        raw = await redis_client.get(key)
-        if not raw:
-            return None
-        try:
-            return json.loads(raw)
-        except (json.JSONDecodeError, ValueError) as exc:
-            logger.warning("Invalid JSON in redis for key=%s: %s", key, exc)
-            return None
+        fallback = (lambda: snapshot.catalog) if key == CATALOG_KEY else (lambda: None)
+        return await _guarded(lambda: _redis_read_json(key), fallback)
     if key == CATALOG_KEY:
         return memory_store.catalog
     return None
 
 
-async def write_json(key: str, value: dict[str, Any]) -> None:
+async def _redis_read_json(key: str) -> dict[str, Any] | None:
+    raw = await redis_client.get(key)
+    if not raw:
+        return None
+    try:
+        value = codec.loads(raw)
+    except ValueError as exc:
+        CORRUPTED_DOCUMENT.inc()
+        logger.warning("Invalid JSON in redis for key=%s: %s", key, exc)
+        return None
+    if key == CATALOG_KEY:
+        snapshot.remember_catalog(value)
+    return value
+
+
+async def put_catalog_if_changed(
+    catalog: dict[str, Any], fingerprint: str, expected_version: int | None = None
+) -> tuple[str, int, dict[str, Any] | None]:
+    """Atomically write the catalog unless its content is unchanged.
+
+    Returns ``(outcome, version, stored_catalog)``. A mismatched
+    ``expected_version`` yields ``CATALOG_CONFLICT`` and no catalog. While Redis
+    is unreachable the write is queued (``CATALOG_QUEUED``) and reported at the
+    last known version; conditional writes raise ``StoreUnavailable`` instead.
+    """
+    if redis_client:
+        return await _guarded(
+            lambda: _redis_put_catalog(catalog, fingerprint, expected_version),
+            lambda: _defer_catalog(catalog, fingerprint, expected_version),
+        )
+
+    meta = memory_store.catalog_meta
+    if expected_version is not None and expected_version != meta["version"]:
+        meta["writes_conflicted"] += 1
+        return CATALOG_CONFLICT, meta["version"], None
+    if meta["fingerprint"] == fingerprint:
+        meta["writes_skipped"] += 1
+        return CATALOG_UNCHANGED, meta["version"], memory_store.catalog
+    meta["version"] += 1
+    meta["fingerprint"] = fingerprint
+    meta["writes_applied"] += 1
+    models = [memory_store.intern_model(model) for model in catalog["models"]]
+    memory_store.catalog = {**catalog, "models": models, "version": meta["version"]}
+    memory_store.emit(CATALOG_EVENT, memory_store.catalog)
+    return CATALOG_APPLIED, meta["version"], memory_store.catalog
+
+
+async def _redis_put_catalog(
+    catalog: dict[str, Any],
+    fingerprint: str,
+    expected_version: int | None,
+    only_newer: bool = False,
+) -> tuple[str, int, dict[str, Any] | None]:
+    outcome, version, *rest = await _script(PUT_CATALOG_SCRIPT)(
+        keys=[CATALOG_KEY, CATALOG_META_KEY, EVENTS_SEQUENCE_KEY],
+        args=[
+            fingerprint,
+            "" if expected_version is None else expected_version,
+            codec.dumps(catalog),
+            EVENTS_CHANNEL,
+            repr(iso_to_epoch(catalog.get("updated_at"))),
+            "1" if only_newer else "0",
+        ],
+    )
+    stored = codec.loads(rest[0]) if rest and rest[0] else None
+    if stored is not None:
+        snapshot.remember_catalog(stored)
+    return outcome, int(version), stored
+
+
+def _defer_catalog(
+    catalog: dict[str, Any], fingerprint: str, expected_version: int | None
+) -> tuple[str, int, dict[str, Any] | None]:
+    if expected_version is not None:
+        raise StoreUnavailable("Conditional catalog writes need Redis")
+    write_behind.push_catalog(catalog, fingerprint, iso_to_epoch(catalog.get("updated_at")))
+    version = (snapshot.catalog or {}).get("version") or 0
+    stored = {**catalog, "version": version}
+    snapshot.remember_catalog(stored)
+    return CATALOG_QUEUED, version, stored
+
+
+async def catalog_stats() -> dict[str, int]:
+    fields = ("version", "writes_applied", "writes_skipped", "writes_conflicted")
+    if redis_client:
+
+        async def fetch() -> dict[str, int]:
+            values = await redis_client.hmget(CATALOG_META_KEY, list(fields))
+            return {field: int(value or 0) for field, value in zip(fields, values)}
+
+        return await _guarded(fetch, _unavailable("Catalog stats need Redis"))
+    return {field: memory_store.catalog_meta[field] for field in fields}
+
+
+async def upsert_selection(value: dict[str, Any], score: float) -> None:
+    """Write a selection blob, its users-set membership and recency score atomically.
+
+    One EVALSHA round trip on Redis; a crash can no longer leave a blob without
+    an index entry or the other way round.
+    """
+    await upsert_selections([(value, score)])
+
+
+async def read_selection(user_id: str) -> dict[str, Any] | None:
+    if not redis_client:
+        return memory_store.selection(user_id)
+    value = await _guarded(
+        lambda: _redis_read_selection(user_id), lambda: snapshot.selection(user_id)
+    )
+    return _pending_selection(user_id, value)
+
+
+async def _redis_read_selection(user_id: str) -> dict[str, Any] | None:
+    key = selection_key(user_id)
+    raw = await redis_client.get(key)
+    if not raw:
+        return None
+    try:
+        value = codec.loads(raw)
+    except ValueError as exc:
+        CORRUPTED_SELECTION.inc()
+        logger.warning(
+            "Corrupted selection payload in redis for user_id=%s key=%s: %s",
+            user_id,
+            key,
+            exc,
+        )
+        try:
+            await redis_client.delete(key)
+        except Exception:
+            logger.exception("Failed deleting corrupted redis key=%s", key)
+        return None
+    _remember_selection(value)
+    return value
+
+
+async def read_selections(user_ids: list[str]) -> list[dict[str, Any] | None]:
+    """Fetch many selections with one MGET; missing or corrupted entries are ``None``."""
+    if not redis_client:
+        return [memory_store.selection(user_id) for user_id in user_ids]
+    values = await _guarded(
+        lambda: _redis_read_selections(user_ids),
+        lambda: [snapshot.selection(user_id) for user_id in user_ids],
+    )
+    return [_pending_selection(user_id, value) for user_id, value in zip(user_ids, values)]
+
+
+async def mget(keys: list[str]) -> list[Any]:
+    """``MGET`` that also works on a cluster, where keys in different slots cannot share one.
+
+    On a cluster the keys are grouped by slot, one MGET per slot, and the MGETs
+    go in one pipeline, which reaches every node concurrently; values come back
+    in the order of ``keys`` either way.
+    """
+    if not keys:
+        return []
+    if not REDIS_CLUSTER:
+        return await redis_client.mget(keys)
+    slots: dict[int, list[int]] = {}
+    for index, key in enumerate(keys):
+        slots.setdefault(redis_client.keyslot(key), []).append(index)
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for indices in slots.values():
+            # The cluster pipeline refuses pipe.mget() whatever the keys' slots.
+            pipe.execute_command("MGET", *(keys[index] for index in indices))
+        results = await pipe.execute()
+    values: list[Any] = [None] * len(keys)
+    for indices, group in zip(slots.values(), results):
+        for index, value in zip(indices, group):
+            values[index] = value
+    return values
+
+
+async def _redis_read_selections(user_ids: list[str]) -> list[dict[str, Any] | None]:
+    keys = [selection_key(user_id) for user_id in user_ids]
+    raw_values = await mget(keys)
+    values: list[dict[str, Any] | None] = []
+    for key, raw in zip(keys, raw_values):
+        value = None
+        if raw:
+            try:
+                value = codec.loads(raw)
+                _remember_selection(value)
+            except ValueError as exc:
+                CORRUPTED_SELECTION.inc()
+                logger.warning("Skipping corrupted selection JSON for key=%s: %s", key, exc)
+        values.append(value)
+    return values
+
+
+async def upsert_selections(entries: list[tuple[dict[str, Any], float]]) -> None:
+    """Batch form of ``upsert_selection``: every entry in the same EVALSHA round trip.
+
+    While Redis is unreachable the entries are queued for replay instead; a full
+    queue raises ``StoreUnavailable``.
+    """
+    if not entries:
+        return
     if redis_client:
-        await redis_client.set(key, json.dumps(value))
+        await _guarded(lambda: _redis_upsert_selections(entries), lambda: _defer_selections(entries))
         return
-    if key == CATALOG_KEY:
-        memory_store.catalog = value
+    for value, score in entries:
+        memory_store.put_selection(value, score)
+
+
+async def _redis_upsert_selections(
+    entries: list[tuple[dict[str, Any], float]], only_newer: bool = False
+) -> int:
+    if REDIS_CLUSTER:
+        return await _redis_cluster_upsert_selections(entries, only_newer)
+    keys = [USERS_KEY, SELECTIONS_INDEX_KEY, EVENTS_SEQUENCE_KEY, SELECTION_MODELS_KEY, SELECTION_STATS_KEY]
+    args: list[Any] = [EVENTS_CHANNEL, "1" if only_newer else "0"]
+    for value, score in entries:
+        keys.append(selection_key(value["user_id"]))
+        args.extend((codec.dumps(value), value["user_id"], repr(score), counted_model(value) or ""))
+    applied = await _script(UPSERT_SELECTIONS_SCRIPT)(keys=keys, args=args)
+    for value, score in entries:
+        snapshot.remember_selection(value, score)
+    return int(applied)
+
+
+async def _redis_cluster_upsert_selections(
+    entries: list[tuple[dict[str, Any], float]], only_newer: bool
+) -> int:
+    """``_redis_upsert_selections`` for a cluster, where the selection keys are spread over many slots.
+
+    No single script can write them along with the index they share, so the
+    blobs are swapped in first (``SET ... GET``, one pipeline reaching every
+    node concurrently) and the index, model counts and events follow in one
+    EVALSHA, counted from the blobs the swap replaced. A replica dying between
+    the two leaves that user unindexed until their next write and the counts
+    off until ``rebuild-selection-stats``. Replays compare with the index just
+    before writing rather than atomically with it.
+    """
+    if only_newer:
+        current = await redis_client.zmscore(SELECTIONS_INDEX_KEY, [value["user_id"] for value, _ in entries])
+        entries = [entry for entry, score in zip(entries, current) if score is None or score <= entry[1]]
+        if not entries:
+            return 0
+    blobs = [codec.dumps(value) for value, _ in entries]
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for (value, _), blob in zip(entries, blobs):
+            pipe.set(selection_key(value["user_id"]), blob, get=True)
+        replaced = await pipe.execute()
+    args: list[Any] = [EVENTS_CHANNEL]
+    for (value, score), blob, previous in zip(entries, blobs, replaced):
+        args.extend((blob, value["user_id"], repr(score), _counted_blob(previous), counted_model(value) or ""))
+    keys = [USERS_KEY, SELECTIONS_INDEX_KEY, EVENTS_SEQUENCE_KEY, SELECTION_MODELS_KEY, SELECTION_STATS_KEY]
+    applied = await _script(INDEX_SELECTIONS_SCRIPT)(keys=keys, args=args)
+    for value, score in entries:
+        snapshot.remember_selection(value, score)
+    return int(applied)
+
+
+def _counted_blob(raw: str | None) -> str:
+    """``counted_model`` of a stored blob, or "", as the Lua ``counted_model`` reads it."""
+    if not raw:
+        return ""
+    try:
+        value = codec.loads(raw)
+    except ValueError:
+        return ""
+    return (counted_model(value) if isinstance(value, dict) else None) or ""
+
+
+def _defer_selections(entries: list[tuple[dict[str, Any], float]]) -> int:
+    write_behind.push_selections(entries)
+    for value, score in entries:
+        snapshot.remember_selection(value, score)
+    return 0
+
+
+async def replay_write_behind() -> int:
+    """Push queued writes to Redis; returns how many were applied.
+
+    Replays use last-writer-wins: a catalog or selection written to Redis by
+    another replica with a newer ``updated_at`` is kept. Stops at the first
+    connection failure, leaving the rest queued.
+    """
+    if not redis_client or not len(write_behind) or not breaker.allow():
+        return 0
+    applied = 0
+    try:
+        pending = write_behind.catalog
+        if pending is not None:
+            catalog, fingerprint, _ = pending
+            outcome, _, _ = await _redis_put_catalog(catalog, fingerprint, None, only_newer=True)
+            if write_behind.catalog is pending:
+                write_behind.catalog = None
+            applied += outcome == CATALOG_APPLIED
+        while write_behind.selections:
+            entries = write_behind.peek_selections(SELECTION_BATCH_MAX)
+            applied += await _redis_upsert_selections(entries, only_newer=True)
+            write_behind.discard_selections(entries)
+    except REDIS_UNAVAILABLE as exc:
+        breaker.record_failure(exc)
+        logger.warning("Write-behind replay interrupted: %s", exc)
+        return applied
+    breaker.record_success()
+    logger.info("Replayed write-behind queue to redis, %d writes applied", applied)
+    return applied
+
+
+async def run_write_behind_replayer(interval_seconds: float = WRITE_BEHIND_REPLAY_SECONDS) -> None:
+    """Retry the write-behind queue every ``interval_seconds`` while it is non-empty."""
+    if not redis_client:
+        return
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            await replay_write_behind()
+        except Exception:
+            logger.exception("Write-behind replay failed")
+
+
+async def _redis_index_batches(
+    after: IndexPosition | None, batch_size: int
+) -> AsyncIterator[list[IndexPosition]]:
+    """Walk the recency ZSET newest-first, starting strictly after ``after``.
+
+    Pages are keyed on the last score seen rather than a global offset, so
+    concurrent writes moving users to the head of the index never shift a page.
+    The offset only counts members already walked within the current score band.
+    """
+    max_score: float | str = "+inf" if after is None else after[0]
+    offset = 0
+    while True:
+        batch = await redis_client.zrevrangebyscore(
+            SELECTIONS_INDEX_KEY, max_score, "-inf", start=offset, num=batch_size, withscores=True
+        )
+        entries = [
+            (score, member) for member, score in batch if after is None or (score, member) < after
+        ]
+        if entries:
+            yield entries
+            after = entries[-1]
+        if len(batch) < batch_size:
+            return
+        last_score = batch[-1][1]
+        if last_score == max_score:
+            offset += len(batch)
+        else:
+            max_score = last_score
+            offset = sum(1 for _, score in batch if score == last_score)
+
+
+async def list_selections(
+    limit: int,
+    after: IndexPosition | None = None,
+    exclude_user: str | None = None,
+) -> tuple[list[dict[str, Any]], IndexPosition | None]:
+    """Return up to ``limit`` selections, most recently updated first.
+
+    The returned position is the cursor for the next page, or ``None`` once the
+    index is exhausted. While Redis is unreachable only the selections in the
+    local snapshot are listed.
+    """
+    if redis_client:
+        return await _guarded(
+            lambda: _redis_list_selections(limit, after, exclude_user),
+            lambda: _page(
+                ((score, user_id) for score, user_id, _ in snapshot.recent()),
+                lambda user_id: snapshot.selections[user_id][0],
+                limit,
+                after,
+                exclude_user,
+            ),
+        )
+    return _page(
+        memory_store.iter_recent(after),
+        lambda user_id: memory_store.users[user_id].as_dict(),
+        limit,
+        after,
+        exclude_user,
+    )
+
+
+def _page(
+    positions: Iterator[IndexPosition],
+    lookup: Callable[[str], dict[str, Any]],
+    limit: int,
+    after: IndexPosition | None,
+    exclude_user: str | None,
+) -> tuple[list[dict[str, Any]], IndexPosition | None]:
+    items: list[dict[str, Any]] = []
+    position = after
+    for entry in positions:
+        if after is not None and entry >= after:
+            continue
+        if len(items) == limit:
+            return items, position
+        position = entry
+        if entry[1] != exclude_user:
+            items.append(lookup(entry[1]))
+    return items, None
+
+
+async def _redis_list_selections(
+    limit: int, after: IndexPosition | None, exclude_user: str | None
+) -> tuple[list[dict[str, Any]], IndexPosition | None]:
+    items: list[dict[str, Any]] = []
+    position = after
+    async for entries in _redis_index_batches(after, limit + 1):
+        keys: list[str] = []
+        valid: list[IndexPosition] = []
+        for score, user_id in entries:
+            try:
+                keys.append(selection_key(user_id))
+                valid.append((score, user_id))
+            except ValueError as exc:
+                logger.warning("Skipping invalid user_id from redis index %s: %s", user_id, exc)
+
+        raw_values = await mget(keys)
+        for entry, key, raw in zip(valid, keys, raw_values):
+            if len(items) == limit:
+                return items, position
+            position = entry
+            if entry[1] == exclude_user or not raw:
+                continue
+            try:
+                value = codec.loads(raw)
+            except ValueError as exc:
+                CORRUPTED_SELECTION.inc()
+                logger.warning("Skipping corrupted selection JSON for key=%s: %s", key, exc)
+                continue
+            snapshot.remember_selection(value, entry[0])
+            items.append(value)
+    return items, None
+
+
+async def count_selections(exclude_user: str | None = None) -> int:
+    if redis_client:
+
+        async def fetch() -> int:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                pipe.zcard(SELECTIONS_INDEX_KEY)
+                pipe.zscore(SELECTIONS_INDEX_KEY, exclude_user or "")
+                total, own_score = await pipe.execute()
+            return total - (1 if exclude_user and own_score is not None else 0)
+
+        def approximate() -> int:
+            total = len(snapshot.selections)
+            return total - (1 if exclude_user in snapshot.selections else 0)
+
+        return await _guarded(fetch, approximate)
+    total = len(memory_store.users)
+    return total - (1 if exclude_user in memory_store.users else 0)
+
+
+async def selection_stats(limit: int) -> dict[str, Any]:
+    """The ``limit`` most selected models and aggregate counts, read from the popularity counters.
+
+    Only enabled selections with a model count towards a model. The cost does
+    not depend on the number of users; no selection is read.
+    """
+    if redis_client:
+
+        async def fetch() -> dict[str, Any]:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                pipe.zrevrange(SELECTION_MODELS_KEY, 0, limit - 1, withscores=True)
+                pipe.zcard(SELECTION_MODELS_KEY)
+                pipe.hget(SELECTION_STATS_KEY, "enabled")
+                pipe.zcard(SELECTIONS_INDEX_KEY)
+                top, models, enabled, users = await pipe.execute()
+            return _selection_stats([(model, int(count)) for model, count in top], models, int(enabled or 0), users)
+
+        return await _guarded(fetch, _unavailable("Selection stats need Redis"))
+    counts = memory_store.model_counts
+    # Same order as ZREVRANGE: highest count first, ties by model name descending.
+    top = heapq.nlargest(limit, counts.items(), key=lambda item: (item[1], item[0]))
+    return _selection_stats(top, len(counts), memory_store.enabled_selections, len(memory_store.users))
+
+
+def _selection_stats(top: list[tuple[str, int]], models: int, enabled: int, users: int) -> dict[str, Any]:
+    return {
+        "users": users,
+        "enabled": enabled,
+        "models_selected": models,
+        "models": [{"model": model, "users": count} for model, count in top],
+    }
+
+
+async def expire_selections(cutoff: float, offset: int, limit: int) -> tuple[int, int, int]:
+    """Remove up to ``limit`` selections last updated at or before ``cutoff``, oldest first.
+
+    ``offset`` skips that many expired index entries kept by earlier calls.
+    Returns the offset for the next call, how many entries were examined and
+    how many of them removed.
+    """
+    if not redis_client:
+        removed = memory_store.expire_selections(cutoff, limit)
+        return 0, removed, removed
+    return await _redis_expire_selections(cutoff, offset, limit)
+
+
+async def _redis_expire_selections(cutoff: float, offset: int, limit: int) -> tuple[int, int, int]:
+    """Expiry against Redis, in three steps that each leave a concurrent write intact.
+
+    Each blob is deleted only if it is still the one read (``DELETE_IF_UNCHANGED_SCRIPT``),
+    then ``REMOVE_SELECTIONS_SCRIPT`` releases its counted model and unindexes
+    the user unless a write moved their score meanwhile. The same steps serve
+    standalone and cluster Redis, where the blobs sit in other slots than the
+    index. A blob newer than its index entry, left by a cluster write that died
+    before indexing, is kept.
+    """
+    batch = await redis_client.zrangebyscore(
+        SELECTIONS_INDEX_KEY, "-inf", cutoff, start=offset, num=limit, withscores=True
+    )
+    removals: list[tuple[str, float | None, str]] = []
+    keys: list[str] = []
+    indexed: list[tuple[str, float]] = []
+    for user_id, score in batch:
+        try:
+            keys.append(selection_key(user_id))
+            indexed.append((user_id, score))
+        except ValueError:
+            removals.append((user_id, score, ""))
+    candidates: list[tuple[str, str, str, float]] = []
+    for (user_id, score), key, raw in zip(indexed, keys, await mget(keys)):
+        if not raw:
+            removals.append((user_id, score, ""))
+            continue
+        try:
+            value = codec.loads(raw)
+        except ValueError:
+            value = None
+        if isinstance(value, dict) and iso_to_epoch(value.get("updated_at")) > cutoff:
+            offset += 1
+            continue
+        candidates.append((key, raw, user_id, score))
+    if candidates:
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for key, raw, _, _ in candidates:
+                pipe.execute_command("EVAL", DELETE_IF_UNCHANGED_SCRIPT, 1, key, raw)
+            deleted = await pipe.execute()
+        removals.extend(
+            (user_id, score, _counted_blob(raw))
+            for (_, raw, user_id, score), done in zip(candidates, deleted)
+            if done
+        )
+    return offset, len(batch), await _redis_remove_selections(removals)
+
+
+async def prune_dangling_selections(key: str, cursor: int, count: int) -> tuple[int, int, int]:
+    """One ``ZSCAN`` step over the recency index, or ``SSCAN`` over ``USERS_KEY``, dropping members without a selection.
+
+    Members of the users set that are indexed are left to the index scan.
+    Returns the next cursor (0 once the scan is complete), how many members
+    were examined and how many removed. Redis only: the memory backend never
+    holds a member without its selection.
+    """
+    if not redis_client:
+        return 0, 0, 0
+    if key == SELECTIONS_INDEX_KEY:
+        cursor, members = await redis_client.zscan(key, cursor, count=count)
+        examined = len(members)
+    else:
+        cursor, users = await redis_client.sscan(key, cursor, count=count)
+        scores = await redis_client.zmscore(SELECTIONS_INDEX_KEY, users) if users else []
+        members = [(user_id, score) for user_id, score in zip(users, scores) if score is None]
+        examined = len(users)
+    removals: list[tuple[str, float | None, str]] = []
+    keys: list[str] = []
+    checked: list[tuple[str, float | None]] = []
+    for user_id, score in members:
+        try:
+            keys.append(selection_key(user_id))
+            checked.append((user_id, score))
+        except ValueError:
+            removals.append((user_id, score, ""))
+    for (user_id, score), raw in zip(checked, await mget(keys)):
+        if raw is None:
+            removals.append((user_id, score, ""))
+    return int(cursor), examined, await _redis_remove_selections(removals)
+
+
+async def _redis_remove_selections(removals: list[tuple[str, float | None, str]]) -> int:
+    """Run ``REMOVE_SELECTIONS_SCRIPT`` for ``(user_id, indexed score, released model)`` triples."""
+    if not removals:
+        return 0
+    args: list[Any] = [EVENTS_CHANNEL]
+    for user_id, score, released in removals:
+        args.extend((user_id, "" if score is None else repr(score), released))
+    keys = [USERS_KEY, SELECTIONS_INDEX_KEY, EVENTS_SEQUENCE_KEY, SELECTION_MODELS_KEY, SELECTION_STATS_KEY]
+    return int(await _script(REMOVE_SELECTIONS_SCRIPT)(keys=keys, args=args))
+
+
+async def acquire_lease(key: str, seconds: float) -> bool:
+    """Take ``key`` for ``seconds`` unless another replica holds it; always granted on the memory backend."""
+    if not redis_client:
+        return True
+    return bool(await redis_client.set(key, "1", nx=True, px=max(1, int(seconds * 1000))))
+
+
+async def ingest_usage(records: list[UsageRecord], retention_seconds: int = USAGE_RETENTION_SECONDS) -> int:
+    """Add usage events to their user and all-users bucket hashes in one round trip.
+
+    Returns how many events were counted; events whose request id was already
+    seen within the retention period are skipped. Usage is not queued while
+    Redis is unreachable: ``StoreUnavailable`` tells the forwarder to retry.
+    """
+    if not records:
+        return 0
+    if not redis_client:
+        return memory_store.add_usage(records, retention_seconds)
+    return await _guarded(
+        lambda: _redis_ingest_usage(records, retention_seconds),
+        _unavailable("Usage ingestion needs Redis"),
+    )
+
+
+async def _redis_ingest_usage(records: list[UsageRecord], retention_seconds: int) -> int:
+    keys: list[str] = []
+    positions: dict[str, int] = {}
+
+    def position(key: str) -> int:
+        index = positions.get(key)
+        if index is None:
+            keys.append(key)
+            index = positions[key] = len(keys)
+        return index
+
+    args: list[Any] = [retention_seconds]
+    for user_id, bucket_start, request_id, model, prompt, completion, total, latency in records:
+        args.extend(
+            (
+                position(usage_key(user_id, bucket_start)),
+                position(usage_key(None, bucket_start)),
+                0 if request_id is None else position(usage_seen_key(request_id)),
+                model,
+                prompt,
+                completion,
+                total,
+                latency,
+            )
+        )
+    return int(await _script(INGEST_USAGE_SCRIPT)(keys=keys, args=args))
+
+
+async def read_usage(keys: list[str]) -> list[dict[str, int]]:
+    """Counters of each usage bucket hash, in order; ``{}`` for empty buckets."""
+    if not redis_client:
+        return [dict(memory_store.usage.get(key, {})) for key in keys]
+
+    async def fetch() -> list[dict[str, int]]:
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.hgetall(key)
+            buckets = await pipe.execute()
+        return [{field: int(value) for field, value in bucket.items()} for bucket in buckets]
+
+    return await _guarded(fetch, _unavailable("Usage queries need Redis"))
+
+
+# Embedding cache counts not yet added to EMBEDDING_STATS_KEY. They are sent in
+# the pipeline of the next embedding cache call instead of costing a round trip.
+_embedding_counts = {field: 0 for field in EMBEDDING_COUNTERS}
+
+
+def _queue_embedding_counts(pipe: Any) -> dict[str, int]:
+    """Add the pending counts to ``pipe``; returns them so a failed pipeline can put them back."""
+    sent = {field: count for field, count in _embedding_counts.items() if count}
+    for field, count in sent.items():
+        pipe.hincrby(EMBEDDING_STATS_KEY, field, count)
+        _embedding_counts[field] = 0
+    return sent
+
+
+def _restore_embedding_counts(sent: dict[str, int]) -> None:
+    for field, count in sent.items():
+        _embedding_counts[field] += count
+
+
+async def read_embeddings(keys: list[str], ttl_seconds: int) -> list[bytes | None]:
+    """Packed vectors for ``keys`` in order, ``None`` for misses; every hit's TTL restarts.
+
+    One pipelined round trip of ``GETEX``, read without decoding. While Redis is
+    unreachable every key is a miss.
+    """
+    if not keys:
+        return []
+    if not redis_client:
+        return memory_store.get_embeddings(keys, ttl_seconds)
+    return await _guarded(lambda: _redis_read_embeddings(keys, ttl_seconds), lambda: [None] * len(keys))
+
+
+def count_embedding_lookups(hits: int, misses: int) -> None:
+    """Add to the shared hit and miss counts; on Redis they are sent with the next embedding cache call."""
+    counts = memory_store.embedding_counts if not redis_client else _embedding_counts
+    counts["hits"] += hits
+    counts["misses"] += misses
+
+
+async def _redis_read_embeddings(keys: list[str], ttl_seconds: int) -> list[bytes | None]:
+    from .redis_clients import NEVER_DECODE
+
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for key in keys:
+            pipe.execute_command("GETEX", key, "EX", ttl_seconds, **{NEVER_DECODE: True})
+        sent = _queue_embedding_counts(pipe)
+        try:
+            results = await pipe.execute()
+        except BaseException:
+            _restore_embedding_counts(sent)
+            raise
+    return results[: len(keys)]
+
+
+async def write_embeddings(entries: list[tuple[str, bytes]], ttl_seconds: int) -> int:
+    """Store packed vectors with ``ttl_seconds`` in one pipelined round trip; returns how many were stored.
+
+    The cache is best effort: while Redis is unreachable nothing is stored.
+    """
+    if not entries:
+        return 0
+    if not redis_client:
+        return memory_store.put_embeddings(entries, ttl_seconds)
+    return await _guarded(lambda: _redis_write_embeddings(entries, ttl_seconds), lambda: 0)
+
+
+async def _redis_write_embeddings(entries: list[tuple[str, bytes]], ttl_seconds: int) -> int:
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for key, blob in entries:
+            pipe.set(key, blob, ex=ttl_seconds)
+        sent = _queue_embedding_counts(pipe)
+        try:
+            await pipe.execute()
+        except BaseException:
+            _restore_embedding_counts(sent)
+            raise
+    _embedding_counts["stored"] += len(entries)
+    return len(entries)
+
+
+async def embedding_stats() -> dict[str, int]:
+    """Embedding cache hits, misses and stored vectors, summed over every replica."""
+    if not redis_client:
+        return dict(memory_store.embedding_counts)
+
+    async def fetch() -> dict[str, int]:
+        async with redis_client.pipeline(transaction=False) as pipe:
+            sent = _queue_embedding_counts(pipe)
+            pipe.hmget(EMBEDDING_STATS_KEY, list(EMBEDDING_COUNTERS))
+            try:
+                *_, values = await pipe.execute()
+            except BaseException:
+                _restore_embedding_counts(sent)
+                raise
+        return {field: int(value or 0) for field, value in zip(EMBEDDING_COUNTERS, values)}
+
+    return await _guarded(fetch, _unavailable("Embedding cache stats need Redis"))
+
+
+async def consume_rate_limits(buckets: list[RateLimitBucket]) -> RateLimitOutcome:
+    """Charge every bucket atomically if all of them have room; one EVALSHA on Redis.
+
+    Redis's clock is used so every replica agrees on bucket state. While Redis
+    is unreachable, this process's own buckets answer, so limits still apply
+    per replica instead of failing open or closed.
+    """
+    if not buckets:
+        return 0, []
+    if not redis_client:
+        return memory_store.consume_rate_limits(buckets, time.time() * 1000)
+    return await _guarded(
+        lambda: _redis_consume_rate_limits(buckets),
+        lambda: memory_store.consume_rate_limits(buckets, time.time() * 1000),
+    )
+
+
+async def _redis_consume_rate_limits(buckets: list[RateLimitBucket]) -> RateLimitOutcome:
+    args: list[Any] = []
+    for _, limit, period, cost in buckets:
+        args.extend((limit, period, cost))
+    retry, *states = await _script(RATE_LIMIT_SCRIPT)(keys=[key for key, _, _, _ in buckets], args=args)
+    return max(0, int(retry)), [(int(states[index]), int(states[index + 1])) for index in range(0, len(states), 2)]
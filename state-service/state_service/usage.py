@@ -0,0 +1,243 @@
+"""Per-user token and latency accounting fed from gateway spend/log events.
+
+Events are counted into one hash per user per ``USAGE_BUCKET_SECONDS`` bucket,
+plus an all-users hash per bucket, each holding ``<model>|<counter>`` fields.
+A window query therefore reads one hash per bucket no matter how many
+requests the window covers.
+"""
+from __future__ import annotations
+
+import math
+import time
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Iterable
+
+from pydantic import ValidationError
+
+from . import codec
+from .config import (
+    USAGE_BATCH_MAX,
+    USAGE_BUCKET_SECONDS,
+    USAGE_CLOCK_SKEW_SECONDS,
+    USAGE_LINE_MAX_BYTES,
+    USAGE_RETENTION_SECONDS,
+    normalize_user_id,
+    usage_key,
+)
+from .metrics import observe_usage_events
+from .schemas import UsageEvent
+from .store import USAGE_COUNTERS, UsageRecord, ingest_usage, read_usage
+
+# Rejections listed individually in an ingest response; the rest are only counted.
+MAX_REPORTED_REJECTIONS = 100
+
+
+class LineTooLong(ValueError):
+    """An NDJSON line exceeds ``USAGE_LINE_MAX_BYTES``, so the stream is refused."""
+
+
+def bucket_start(epoch: float) -> int:
+    return int(epoch // USAGE_BUCKET_SECONDS) * USAGE_BUCKET_SECONDS
+
+
+def to_record(event: UsageEvent, now: float) -> UsageRecord:
+    """Validate an event against retention, clock skew and the user-id rules; raises ``ValueError``."""
+    raw_user_id = event.user_id or (event.metadata or {}).get("user_id")
+    if not isinstance(raw_user_id, str):
+        raise ValueError("event has no user_id")
+    user_id = normalize_user_id(raw_user_id)
+    model = event.model.strip()
+    if not model:
+        raise ValueError("model must be a non-empty string")
+
+    finished = event.timestamp or event.start_time
+    epoch = finished.timestamp() if finished else now
+    if epoch < now - USAGE_RETENTION_SECONDS:
+        raise ValueError("event is older than the usage retention period")
+    if epoch > now + USAGE_CLOCK_SKEW_SECONDS:
+        raise ValueError("event is in the future")
+    epoch = min(epoch, now)
+
+    duration_ms = event.duration_ms
+    if duration_ms is None and event.timestamp and event.start_time:
+        duration_ms = max(0.0, (event.timestamp - event.start_time).total_seconds() * 1000)
+    total = event.total_tokens
+    if total is None:
+        total = event.prompt_tokens + event.completion_tokens
+    return (
+        user_id,
+        bucket_start(epoch),
+        event.request_id or None,
+        model,
+        event.prompt_tokens,
+        event.completion_tokens,
+        total,
+        round(duration_ms or 0),
+    )
+
+
+class IngestReport:
+    def __init__(self) -> None:
+        self.received = 0
+        self.counted = 0
+        self.duplicates = 0
+        self.rejected = 0
+        self.rejections: list[dict[str, Any]] = []
+
+    def reject(self, index: int, error: str) -> None:
+        self.rejected += 1
+        if len(self.rejections) < MAX_REPORTED_REJECTIONS:
+            self.rejections.append({"index": index, "error": error})
+
+    def finish(self) -> dict[str, Any]:
+        """Record the outcome counters and return the ingest response body."""
+        observe_usage_events("counted", self.counted)
+        observe_usage_events("duplicate", self.duplicates)
+        observe_usage_events("rejected", self.rejected)
+        return {
+            "received": self.received,
+            "counted": self.counted,
+            "duplicates": self.duplicates,
+            "rejected": self.rejected,
+            "rejections": self.rejections,
+        }
+
+
+async def _flush(report: IngestReport, records: list[UsageRecord]) -> None:
+    counted = await ingest_usage(records)
+    report.counted += counted
+    report.duplicates += len(records) - counted
+    records.clear()
+
+
+async def ingest_events(events: Iterable[Any]) -> dict[str, Any]:
+    """Count a JSON batch of events; invalid ones are reported by index and skipped."""
+    report = IngestReport()
+    records: list[UsageRecord] = []
+    now = time.time()
+    for index, raw in enumerate(events):
+        report.received += 1
+        try:
+            records.append(to_record(UsageEvent.model_validate(raw), now))
+        except ValidationError as exc:
+            report.reject(index, _validation_message(exc))
+        except ValueError as exc:
+            report.reject(index, str(exc))
+    await _flush(report, records)
+    return report.finish()
+
+
+async def ingest_lines(chunks: AsyncIterator[bytes]) -> dict[str, Any]:
+    """Count an NDJSON stream of events, ``USAGE_BATCH_MAX`` at a time as lines arrive.
+
+    The body is never held in memory as a whole; a failure part-way through
+    leaves the batches already flushed counted, and request-id deduplication
+    makes resending the whole stream safe. A line longer than
+    ``USAGE_LINE_MAX_BYTES`` raises ``LineTooLong`` without being buffered
+    further.
+    """
+    report = IngestReport()
+    records: list[UsageRecord] = []
+    pending = b""
+    index = 0
+    now = time.time()
+
+    async def lines() -> AsyncIterator[bytes]:
+        nonlocal pending
+        async for chunk in chunks:
+            pending += chunk
+            *complete, pending = pending.split(b"\n")
+            if len(pending) > USAGE_LINE_MAX_BYTES or any(len(line) > USAGE_LINE_MAX_BYTES for line in complete):
+                raise LineTooLong(f"NDJSON lines are limited to {USAGE_LINE_MAX_BYTES} bytes")
+            for line in complete:
+                yield line
+        if pending:
+            yield pending
+
+    async for line in lines():
+        if not line.strip():
+            continue
+        report.received += 1
+        try:
+            records.append(to_record(UsageEvent.model_validate(codec.loads(line)), now))
+        except ValidationError as exc:
+            report.reject(index, _validation_message(exc))
+        except ValueError as exc:
+            report.reject(index, str(exc) or "line is not valid JSON")
+        index += 1
+        if len(records) >= USAGE_BATCH_MAX:
+            await _flush(report, records)
+    await _flush(report, records)
+    return report.finish()
+
+
+def _validation_message(exc: ValidationError) -> str:
+    error = exc.errors()[0]
+    location = ".".join(str(part) for part in error["loc"])
+    return f"{location}: {error['msg']}" if location else error["msg"]
+
+
+def _empty_counters() -> dict[str, int]:
+    counters = dict.fromkeys(USAGE_COUNTERS, 0)
+    counters["latency_ms_max"] = 0
+    return counters
+
+
+def _summary(counters: dict[str, int]) -> dict[str, Any]:
+    requests = counters["requests"]
+    summary: dict[str, Any] = {name: counters[name] for name in USAGE_COUNTERS if name != "latency_ms"}
+    summary["latency_ms_avg"] = round(counters["latency_ms"] / requests, 1) if requests else None
+    summary["latency_ms_max"] = counters["latency_ms_max"] if requests else None
+    return summary
+
+
+def _accumulate(into: dict[str, int], name: str, value: int) -> None:
+    if name == "latency_ms_max":
+        into[name] = max(into[name], value)
+    elif name in into:
+        into[name] += value
+
+
+def _iso(epoch: float) -> str:
+    return datetime.fromtimestamp(epoch, timezone.utc).isoformat()
+
+
+async def usage_window(user_id: str | None, window_seconds: int, model: str | None = None) -> dict[str, Any]:
+    """Totals, per-model totals and a per-bucket series for the last ``window_seconds``.
+
+    ``user_id=None`` aggregates all users. The window is rounded out to whole
+    buckets, so the oldest bucket may start up to one bucket before it.
+    """
+    now = time.time()
+    count = max(1, math.ceil(window_seconds / USAGE_BUCKET_SECONDS))
+    newest = bucket_start(now)
+    starts = [newest - USAGE_BUCKET_SECONDS * offset for offset in range(count - 1, -1, -1)]
+    hashes = await read_usage([usage_key(user_id, start) for start in starts])
+
+    totals = _empty_counters()
+    models: dict[str, dict[str, int]] = {}
+    series: list[dict[str, Any]] = []
+    for start, fields in zip(starts, hashes):
+        bucket = _empty_counters()
+        for field, value in fields.items():
+            field_model, _, name = field.rpartition("|")
+            if model is not None and field_model != model:
+                continue
+            _accumulate(bucket, name, value)
+            _accumulate(models.setdefault(field_model, _empty_counters()), name, value)
+        for name, value in bucket.items():
+            _accumulate(totals, name, value)
+        if bucket["requests"]:
+            series.append({"start": _iso(start), **_summary(bucket)})
+
+    return {
+        "user_id": user_id,
+        "model": model,
+        "window_seconds": window_seconds,
+        "bucket_seconds": USAGE_BUCKET_SECONDS,
+        "from": _iso(starts[0]),
+        "to": _iso(now),
+        "totals": _summary(totals),
+        "models": {name: _summary(counters) for name, counters in sorted(models.items())},
+        "buckets": series,
+    }
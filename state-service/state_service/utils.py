@@ -1,5 +1,70 @@
+import base64
+import hashlib
+import json
+import math
 from datetime import datetime, timezone
 
 
 def now_iso() -> str:
     return datetime.now(timezone.utc).isoformat()
+
+
+def catalog_fingerprint(models: list[str], status: str) -> str:
+    canonical = json.dumps([models, status], separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = {candidate.strip().removeprefix("W/") for candidate in if_none_match.split(",")}
+    return "*" in candidates or etag.removeprefix("W/") in candidates
+
+
+def version_from_etag(if_match: str) -> int | None:
+    """Parse a ``"v<version>"`` ETag as sent back in ``If-Match``; ``*`` means any."""
+    candidate = if_match.strip()
+    if candidate == "*":
+        return None
+    if len(candidate) > 3 and candidate.startswith('"v') and candidate.endswith('"'):
+        try:
+            return int(candidate[2:-1])
+        except ValueError:
+            pass
+    raise ValueError("If-Match must be a catalog ETag or '*'")
+
+
+def epoch_to_iso(epoch: float) -> str:
+    """Inverse of ``iso_to_epoch`` for UTC timestamps, exact to the microsecond."""
+    return datetime.fromtimestamp(epoch, timezone.utc).isoformat()
+
+
+def iso_to_epoch(value: str | None) -> float:
+    if not value:
+        return 0.0
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return 0.0
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def encode_cursor(position: tuple[float, str]) -> str:
+    score, user_id = position
+    raw = f"{score!r}:{user_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[float, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+        score, user_id = raw.split(":", 1)
+        position = float(score), user_id
+    except (ValueError, UnicodeDecodeError) as exc:
+        raise ValueError("cursor is malformed") from exc
+    # "nan" would compare false against every index entry and "inf" past all of them.
+    if not math.isfinite(position[0]):
+        raise ValueError("cursor is malformed")
+    return position
@@ -0,0 +1,68 @@
+"""Fixtures putting the store on a fresh memory backend, or on an in-process fakeredis.
+
+Usage (from the state-service directory):
+  pip install -r requirements.txt -r tests/requirements.txt
+  python -m pytest
+"""
+from __future__ import annotations
+
+import os
+
+# Settings are read when state_service.config is imported; keep the tests off
+# whatever Redis or token the shell points at.
+os.environ.update(REDIS_URL="", REDIS_CLUSTER="", STATE_SERVICE_SHARED_TOKEN="")
+
+from collections.abc import AsyncIterator  # noqa: E402
+from typing import Any  # noqa: E402
+
+import pytest  # noqa: E402
+from fakeredis import FakeAsyncRedis, FakeServer  # noqa: E402
+
+from state_service import store  # noqa: E402
+from state_service.events import event_hub  # noqa: E402
+from state_service.redis_clients import REDIS_UNAVAILABLE  # noqa: E402
+from state_service.resilience import CircuitBreaker, RecentSnapshot, WriteBehindQueue  # noqa: E402
+from state_service.response_cache import state_versions  # noqa: E402
+
+
+@pytest.fixture
+def anyio_backend() -> str:
+    return "asyncio"
+
+
+@pytest.fixture(autouse=True)
+def memory_store(monkeypatch: pytest.MonkeyPatch) -> store.InMemoryStore:
+    fresh = store.InMemoryStore()
+    monkeypatch.setattr(store, "memory_store", fresh)
+    return fresh
+
+
+@pytest.fixture(autouse=True)
+def change_events() -> None:
+    """Start every test from an empty event hub; a fresh store's event ids restart at 1."""
+    event_hub.replay.clear()
+    event_hub.subscriptions.clear()
+    state_versions.reset(0)
+    state_versions.listening = False
+
+
+@pytest.fixture
+def redis_server() -> FakeServer:
+    """A private fakeredis server; setting ``connected = False`` takes it down."""
+    return FakeServer()
+
+
+@pytest.fixture
+async def redis_client(monkeypatch: pytest.MonkeyPatch, redis_server: FakeServer) -> AsyncIterator[Any]:
+    """The store switched to ``redis_server``, with fresh degraded-mode state."""
+    client = FakeAsyncRedis(server=redis_server, decode_responses=True)
+    monkeypatch.setattr(store, "redis_client", client)
+    monkeypatch.setattr(store, "REDIS_UNAVAILABLE", REDIS_UNAVAILABLE)
+    monkeypatch.setattr(store, "breaker", CircuitBreaker(failure_threshold=2, reset_seconds=60))
+    monkeypatch.setattr(store, "snapshot", RecentSnapshot(100))
+    monkeypatch.setattr(store, "write_behind", WriteBehindQueue(100))
+    # Scripts are registered against the client that first ran them.
+    store._scripts.clear()
+    yield client
+    store._scripts.clear()
+    await client.aclose()
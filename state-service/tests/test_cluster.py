@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import importlib
+from collections.abc import Iterator
+from types import ModuleType
+from typing import Any
+
+import pytest
+from fakeredis import FakeAsyncRedis, FakeServer
+from fakeredis.aioredis import FakeAsyncRedisConnection
+from redis.crc import key_slot
+from redis.exceptions import ResponseError
+
+from state_service import config, store
+from state_service.config import selection_key
+
+
+def slot(key: str) -> int:
+    return key_slot(key.encode("utf-8"))
+
+
+class FakeClusterPipeline:
+    def __init__(self, data: dict[str, str], mgets: list[list[str]]) -> None:
+        self.data = data
+        self.mgets = mgets
+        self.commands: list[tuple[Any, ...]] = []
+
+    async def __aenter__(self) -> FakeClusterPipeline:
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        pass
+
+    def execute_command(self, *args: Any) -> None:
+        self.commands.append(args)
+
+    async def execute(self) -> list[Any]:
+        results = []
+        for name, *keys in self.commands:
+            assert name == "MGET"
+            if len({slot(key) for key in keys}) > 1:
+                raise ResponseError("CROSSSLOT Keys in request don't hash to the same slot")
+            self.mgets.append(keys)
+            results.append([self.data.get(key) for key in keys])
+        return results
+
+
+class FakeClusterClient:
+    """The part of ``RedisCluster`` that ``store.mget`` uses, refusing MGETs across slots as a cluster does."""
+
+    def __init__(self, data: dict[str, str]) -> None:
+        self.data = data
+        self.mgets: list[list[str]] = []
+
+    def keyslot(self, key: str) -> int:
+        return slot(key)
+
+    def pipeline(self, transaction: bool = False) -> FakeClusterPipeline:
+        return FakeClusterPipeline(self.data, self.mgets)
+
+
+@pytest.fixture
+def cluster_config(monkeypatch: pytest.MonkeyPatch) -> Iterator[ModuleType]:
+    """``state_service.config`` as loaded with REDIS_CLUSTER=1."""
+    monkeypatch.setenv("REDIS_CLUSTER", "1")
+    yield importlib.reload(config)
+    monkeypatch.delenv("REDIS_CLUSTER")
+    importlib.reload(config)
+
+
+def test_script_keys_share_a_slot_per_group(cluster_config: ModuleType) -> None:
+    bookkeeping = (
+        cluster_config.CATALOG_KEY,
+        cluster_config.CATALOG_META_KEY,
+        cluster_config.USERS_KEY,
+        cluster_config.SELECTIONS_INDEX_KEY,
+        cluster_config.SELECTION_MODELS_KEY,
+        cluster_config.SELECTION_STATS_KEY,
+        cluster_config.EVENTS_SEQUENCE_KEY,
+    )
+    usage = (cluster_config.usage_key("alice", 0), cluster_config.usage_key(None, 0), cluster_config.usage_seen_key("r1"))
+
+    assert len({slot(key) for key in bookkeeping}) == 1
+    assert len({slot(key) for key in usage}) == 1
+    assert slot(usage[0]) != slot(bookkeeping[0])
+
+
+def test_selection_keys_spread_over_slots(cluster_config: ModuleType) -> None:
+    keys = [cluster_config.selection_key(f"user{index}") for index in range(1000)]
+
+    assert cluster_config.selection_key("user1") == keys[1]
+    assert len({slot(key) for key in keys}) > 500
+    assert selection_key("user1", clustered=False) == f"{config.STATE_KEY_PREFIX}:selection:user1"
+
+
+@pytest.mark.anyio
+async def test_mget_splits_by_slot_and_keeps_order(monkeypatch: pytest.MonkeyPatch) -> None:
+    keys = [selection_key(f"user{index}", clustered=True) for index in range(300)]
+    data = {key: f"value of {key}" for key in keys[::3]}
+    client = FakeClusterClient(data)
+    monkeypatch.setattr(store, "REDIS_CLUSTER", True)
+    monkeypatch.setattr(store, "redis_client", client)
+
+    values = await store.mget(keys)
+
+    assert values == [data.get(key) for key in keys]
+    assert len(client.mgets) == len({slot(key) for key in keys})
+    assert sorted(key for group in client.mgets for key in group) == sorted(keys)
+    assert await store.mget([]) == []
+
+
+class FakeNode:
+    connection_class = FakeAsyncRedisConnection
+
+    def __init__(self) -> None:
+        self.server = FakeServer()
+        self.connection_kwargs = {"server": self.server, "decode_responses": True}
+
+
+class FakeClusterForPubSub:
+    def __init__(self) -> None:
+        self.node = FakeNode()
+
+    async def initialize(self) -> None:
+        pass
+
+    def get_default_node(self) -> FakeNode:
+        return self.node
+
+
+@pytest.mark.anyio
+async def test_cluster_subscription_closes_its_pool(monkeypatch: pytest.MonkeyPatch) -> None:
+    cluster = FakeClusterForPubSub()
+    monkeypatch.setattr(store, "REDIS_CLUSTER", True)
+    monkeypatch.setattr(store, "redis_client", cluster)
+
+    pubsub = await store.subscribe("events")
+    publisher = FakeAsyncRedis(server=cluster.node.server, decode_responses=True)
+    await publisher.publish("events", "hello")
+    message = None
+    for _ in range(10):
+        message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=0.1)
+        if message is not None:
+            break
+    pool = pubsub.connection_pool
+    await store.unsubscribe(pubsub)
+    await publisher.aclose()
+
+    assert message is not None and message["data"] == "hello"
+    assert not pool._in_use_connections
+    assert not any(connection.is_connected for connection in pool._available_connections)
@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Any
+
+import pytest
+
+from state_service import compaction, store
+from state_service.config import SELECTIONS_INDEX_KEY, USERS_KEY, selection_key
+from tests.test_store_redis import selection
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_expiry_removes_selections_older_than_the_ttl() -> None:
+    now = time.time()
+    await store.upsert_selection(selection("old", "gpt-4.1", now - 1000), now - 1000)
+    await store.upsert_selection(selection("new", "o3", now), now)
+
+    reclaimed = await compaction.compact_selections(ttl_seconds=500, pause_seconds=0)
+
+    assert reclaimed == {"expired": 1, "dangling": 0}
+    assert await store.read_selection("old") is None
+    assert (await store.selection_stats(10))["models"] == [{"model": "o3", "users": 1}]
+
+
+async def test_dangling_members_are_only_swept_when_asked(redis_client: Any) -> None:
+    now = time.time()
+    await store.upsert_selections([(selection(user, "gpt-4.1", now), now) for user in ("alice", "bob")])
+    await redis_client.delete(selection_key("alice"))
+
+    assert await compaction.compact_selections(ttl_seconds=0) == {"expired": 0, "dangling": 0}
+    reclaimed = await compaction.compact_selections(ttl_seconds=0, pause_seconds=0, sweep_dangling=True)
+
+    assert reclaimed["dangling"] > 0
+    assert await redis_client.zrange(SELECTIONS_INDEX_KEY, 0, -1) == ["bob"]
+    assert await redis_client.smembers(USERS_KEY) == {"bob"}
+
+
+async def test_compactor_returns_when_there_is_nothing_to_do(
+    redis_client: Any, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(compaction, "SELECTION_TTL_SECONDS", 0)
+
+    await asyncio.wait_for(compaction.run_selection_compactor(0.01, dangling_interval_seconds=0), 1)
+
+
+async def test_dangling_sweep_runs_once_per_its_interval(redis_client: Any, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(compaction, "SELECTION_TTL_SECONDS", 0)
+    sweeps: list[bool] = []
+
+    async def record(sweep_dangling: bool = False) -> dict[str, int]:
+        sweeps.append(sweep_dangling)
+        return {"expired": 0, "dangling": 0}
+
+    monkeypatch.setattr(compaction, "compact_selections", record)
+    task = asyncio.create_task(compaction.run_selection_compactor(0.01, dangling_interval_seconds=60))
+    await asyncio.sleep(0.2)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert len(sweeps) > 2
+    assert sweeps.count(True) == 1 and sweeps[0]
@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+import base64
+
+import pytest
+from fastapi.testclient import TestClient
+
+from state_service.main import create_app
+from state_service.utils import decode_cursor, encode_cursor
+
+
+def raw_cursor(text: str) -> str:
+    return base64.urlsafe_b64encode(text.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def test_round_trip() -> None:
+    assert decode_cursor(encode_cursor((1760000000.123456, "alice"))) == (1760000000.123456, "alice")
+
+
+@pytest.mark.parametrize("cursor", ["%%%", raw_cursor("no-separator"), raw_cursor("nan:alice"), raw_cursor("inf:alice")])
+def test_malformed_cursor_is_rejected(cursor: str) -> None:
+    with pytest.raises(ValueError, match="cursor is malformed"):
+        decode_cursor(cursor)
+
+
+@pytest.mark.parametrize("score", ["nan", "-inf"])
+def test_non_finite_cursor_is_a_bad_request(score: str) -> None:
+    client = TestClient(create_app(instrumented=False))
+    response = client.get(
+        "/state/selections", params={"cursor": raw_cursor(f"{score}:alice")}, headers={"X-User-Id": "bob"}
+    )
+
+    assert response.status_code == 400
+    assert response.json() == {"detail": "cursor is malformed"}
@@ -0,0 +1,92 @@
+"""Redis going away and coming back mid-test: the fakeredis server is disconnected, not mocked."""
+from __future__ import annotations
+
+from typing import Any
+
+import pytest
+from fakeredis import FakeAsyncRedis, FakeServer
+from fastapi.testclient import TestClient
+
+from state_service import health, store
+from state_service.main import create_app
+from state_service.resilience import BREAKER_CLOSED, BREAKER_OPEN, CircuitBreaker
+from tests.test_store_redis import selection
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(autouse=True)
+def fresh_probe(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(health, "redis_probe", health.RedisProbe(0))
+    monkeypatch.setattr(store, "backend_name", lambda: "redis")
+
+
+def revive(server: FakeServer) -> None:
+    server.connected = True
+    # Skip the breaker's reset timeout: the next call is the half-open trial.
+    store.breaker.opened_at -= store.breaker.reset_seconds
+
+
+async def test_reads_fall_back_to_the_snapshot(redis_client: Any, redis_server: FakeServer) -> None:
+    value = selection("alice", "gpt-4.1", 1000.0)
+    await store.upsert_selection(value, 1000.0)
+    redis_server.connected = False
+
+    assert await store.read_selection("alice") == value
+    assert await store.read_selections(["alice", "bob"]) == [value, None]
+    assert store.breaker.state == BREAKER_OPEN
+
+
+async def test_writes_are_queued_and_replayed(redis_client: Any, redis_server: FakeServer) -> None:
+    await store.upsert_selection(selection("alice", "gpt-4.1", 1000.0), 1000.0)
+    redis_server.connected = False
+    queued = selection("alice", "o3", 2000.0)
+    await store.upsert_selection(queued, 2000.0)
+    await store.upsert_selection(selection("bob", "o3", 2000.0), 2000.0)
+
+    assert len(store.write_behind) == 2
+    assert await store.read_selection("alice") == queued
+    assert await store.replay_write_behind() == 0
+
+    revive(redis_server)
+    assert await store.replay_write_behind() == 2
+    assert len(store.write_behind) == 0
+    assert store.breaker.state == BREAKER_CLOSED
+    assert await store._redis_read_selection("alice") == queued
+    assert (await store.selection_stats(10))["models"] == [{"model": "o3", "users": 2}]
+
+
+async def test_replay_keeps_a_newer_write_from_another_replica(redis_client: Any, redis_server: FakeServer) -> None:
+    redis_server.connected = False
+    await store.upsert_selection(selection("alice", "gpt-4.1", 1000.0), 1000.0)
+    revive(redis_server)
+    newer = selection("alice", "o3", 2000.0)
+    await store._redis_upsert_selections([(newer, 2000.0)])
+
+    assert await store.replay_write_behind() == 0
+    assert len(store.write_behind) == 0
+    assert await store.read_selection("alice") == newer
+
+
+async def test_not_ready_while_redis_is_down(redis_client: Any, redis_server: FakeServer) -> None:
+    assert (await health.health_report())[0]
+    redis_server.connected = False
+
+    ready, report = await health.health_report()
+
+    assert not ready
+    assert report["status"] == "degraded"
+    assert not report["redis"]["ok"]
+
+
+def test_unavailable_store_answers_503(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(store, "redis_client", FakeAsyncRedis())
+    monkeypatch.setattr(store, "breaker", CircuitBreaker(failure_threshold=1, reset_seconds=60))
+    store.breaker.record_failure(ConnectionError("down"))
+    client = TestClient(create_app(instrumented=False))
+
+    response = client.get("/state/selections/stats")
+
+    assert response.status_code == 503
+    assert response.json() == {"detail": "Selection stats need Redis"}
+    assert response.headers["Retry-After"]
@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any
+
+import pytest
+
+from state_service import listener, store
+from state_service.events import SELECTION_EVENT, Event, event_hub
+from state_service.response_cache import selection_scope, state_versions
+from tests.test_store_redis import selection
+
+pytestmark = pytest.mark.anyio
+
+
+def selection_event(event_id: int, user_id: str = "alice") -> Event:
+    return Event(event_id, SELECTION_EVENT, f'{{"user_id": "{user_id}"}}')
+
+
+def drain(queue: asyncio.Queue[Event | None]) -> list[Event | None]:
+    items = []
+    while not queue.empty():
+        items.append(queue.get_nowait())
+    return items
+
+
+async def test_events_after_a_sequence_restart_reach_observers_and_subscribers() -> None:
+    seen: list[int] = []
+    event_hub.observers.append(lambda event: seen.append(event.id))
+    try:
+        for event_id in range(1, 501):
+            event_hub.publish(selection_event(event_id))
+        subscription, _ = event_hub.subscribe(500)
+        seen.clear()
+
+        event_hub.rewind(0)
+        event_hub.publish(selection_event(1))
+        event_hub.publish(selection_event(2))
+    finally:
+        event_hub.observers.pop()
+
+    assert seen == [1, 2]
+    assert [item and item.id for item in drain(subscription.queue)] == [None, 1, 2]
+    assert [event.id for event in event_hub.replay] == [1, 2]
+
+
+async def test_rewind_keeps_the_replay_when_the_sequence_did_not_restart() -> None:
+    for event_id in range(1, 4):
+        event_hub.publish(selection_event(event_id))
+    subscription, _ = event_hub.subscribe(3)
+
+    event_hub.rewind(3)
+
+    assert len(event_hub.replay) == 3
+    assert drain(subscription.queue) == []
+
+
+async def test_client_ahead_of_the_replay_is_reset() -> None:
+    event_hub.publish(selection_event(1))
+
+    assert event_hub.subscribe(500)[1] is None
+    assert event_hub.subscribe(1)[1] == []
+    assert event_hub.subscribe(0)[1] == [selection_event(1)]
+
+
+async def test_listener_rewinds_when_redis_lost_its_events(redis_client: Any, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(event_hub, "observers", [state_versions.observe])
+    for event_id in range(1, 501):
+        event_hub.publish(selection_event(event_id))
+    subscription, _ = event_hub.subscribe(500)
+    task = asyncio.create_task(listener.run_change_listener())
+    try:
+        for _ in range(100):
+            if state_versions.listening:
+                break
+            await asyncio.sleep(0.01)
+        await store.upsert_selection(selection("bob", "gpt-4.1", 1000.0), 1000.0)
+        event = await asyncio.wait_for(subscription.queue.get(), 1)
+        assert event is None
+        event = await asyncio.wait_for(subscription.queue.get(), 1)
+    finally:
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    assert event is not None and event.id == 1
+    assert state_versions.versions[selection_scope("bob")] == 1
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import math
+
+import pytest
+
+from state_service.prometheus_text import iter_samples, parse_labels, sum_by_name
+
+SCRAPE = """\
+# HELP litellm_total_tokens_total Total tokens
+# TYPE litellm_total_tokens_total counter
+litellm_total_tokens_total{model="gpt-4.1",team="a"} 100
+litellm_total_tokens_total{model="o3",team="b"} 50.5 1760000000000
+litellm_total_tokens{model="gpt-4.1"} 7
+litellm_total_tokens_created{model="gpt-4.1"} 1.76e9
+litellm_requests_total 3
+litellm_spend_total{model="gpt-4.1"} NaN
+litellm_spend_total{model="o3"} 2.5
+"""
+
+
+def test_iter_samples_yields_raw_labels_and_values() -> None:
+    samples = list(iter_samples(SCRAPE))
+
+    assert samples[:3] == [
+        ("litellm_total_tokens_total", 'model="gpt-4.1",team="a"', 100.0),
+        ("litellm_total_tokens_total", 'model="o3",team="b"', 50.5),
+        ("litellm_total_tokens", 'model="gpt-4.1"', 7.0),
+    ]
+    assert ("litellm_requests_total", "", 3.0) in samples
+    assert len(samples) == 7
+
+
+def test_iter_samples_filters_by_name() -> None:
+    assert [value for _, _, value in iter_samples(SCRAPE, {"litellm_total_tokens"})] == [7.0]
+
+
+@pytest.mark.parametrize(
+    "line",
+    [
+        "litellm_requests_total",
+        'litellm_requests_total{model="a" 1',
+        "litellm_requests_total abc",
+        '{model="a"} 1',
+        " 1",
+    ],
+)
+def test_malformed_lines_are_skipped(line: str) -> None:
+    assert sum_by_name(f"{line}\nlitellm_requests_total 2\n") == {"litellm_requests_total": 2.0}
+
+
+def test_sum_by_name_does_not_match_longer_names() -> None:
+    names = {"litellm_total_tokens", "litellm_total_tokens_total", "litellm_total"}
+
+    assert sum_by_name(SCRAPE, names) == {"litellm_total_tokens": 7.0, "litellm_total_tokens_total": 150.5}
+
+
+def test_sum_by_name_finds_a_name_on_the_first_line_without_trailing_newline() -> None:
+    text = 'litellm_total_tokens_total 1\nlitellm_total_tokens{model="a"} 2'
+
+    assert sum_by_name(text, {"litellm_total_tokens"}) == {"litellm_total_tokens": 2.0}
+    assert sum_by_name(text, {"litellm_total_tokens_total"}) == {"litellm_total_tokens_total": 1.0}
+
+
+def test_sum_by_name_searches_and_walks_alike() -> None:
+    every = sum_by_name(SCRAPE)
+
+    assert sum_by_name(SCRAPE, set(every)) == every
+    assert every["litellm_spend_total"] == 2.5
+    assert math.isclose(every["litellm_total_tokens_created"], 1.76e9)
+
+
+def test_nan_only_series_is_present_as_zero() -> None:
+    text = 'litellm_spend_total{model="a"} NaN\n'
+
+    assert sum_by_name(text, {"litellm_spend_total"}) == {"litellm_spend_total": 0.0}
+    assert sum_by_name(text) == {}
+
+
+def test_label_values_may_contain_escapes_and_delimiters() -> None:
+    text = 'metric{path="/a}b",note="say \\"hi\\", \\\\ok\\nbye",empty=""} 4 1760000000000\n'
+
+    [(name, labels, value)] = iter_samples(text)
+
+    assert (name, value) == ("metric", 4.0)
+    assert parse_labels(labels) == {"path": "/a}b", "note": 'say "hi", \\ok\nbye', "empty": ""}
+
+
+def test_parse_labels_tolerates_spacing_and_trailing_comma() -> None:
+    assert parse_labels(' model = "gpt-4.1" , team="a",') == {"model": "gpt-4.1", "team": "a"}
+    assert parse_labels("") == {}
@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import asyncio
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from typing import Any
+
+import httpx
+import pytest
+
+from state_service import listener, store
+from state_service.main import create_app
+from state_service.response_cache import selection_scope, state_versions
+from tests.test_store_redis import selection
+
+pytestmark = pytest.mark.anyio
+
+
+@asynccontextmanager
+async def change_listener() -> AsyncIterator[None]:
+    task = asyncio.create_task(listener.run_change_listener())
+    for _ in range(100):
+        if state_versions.listening:
+            break
+        await asyncio.sleep(0.01)
+    try:
+        yield
+    finally:
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+
+async def wait_for_version(scope: str, version: int) -> None:
+    for _ in range(100):
+        if state_versions.current(scope) == version:
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"{scope} never reached version {version}")
+
+
+async def test_selection_is_rebuilt_after_the_event_sequence_restarts(redis_client: Any) -> None:
+    app = create_app(instrumented=False)
+    scope = selection_scope("alice")
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+
+        async def get_alice() -> httpx.Response:
+            return await client.get("/state/selection", headers={"X-User-Id": "alice"})
+
+        async with change_listener():
+            for index in range(5):
+                await store._redis_upsert_selections([(selection("alice", f"model-{index}", 1000.0 + index), 1000.0)])
+            await wait_for_version(scope, 5)
+            cached = await get_alice()
+            assert cached.json()["selected_model"] == "model-4"
+            assert (await get_alice()).headers["etag"] == cached.headers["etag"]
+
+        # Redis loses its data; the listener resubscribes to a sequence at 0.
+        await redis_client.flushall()
+        async with change_listener():
+            assert (await get_alice()).json()["selected_model"] is None
+            # Another replica's write publishes event 1, an id this one replayed before.
+            await store._redis_upsert_selections([(selection("alice", "o3", 2000.0), 2000.0)])
+            await wait_for_version(scope, 1)
+            fresh = await get_alice()
+
+    assert fresh.json()["selected_model"] == "o3"
+    assert fresh.headers["etag"] != cached.headers["etag"]
@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+from typing import Any
+
+import pytest
+from fastapi.testclient import TestClient
+
+from state_service import store
+from state_service.main import create_app
+from tests.test_store_redis import selection
+
+
+def put_selection(client: TestClient, user_id: str, model: str, enabled: bool = True) -> None:
+    response = client.put(
+        "/state/selection", headers={"X-User-Id": user_id}, json={"enabled": enabled, "selected_model": model}
+    )
+    response.raise_for_status()
+
+
+def test_blank_model_is_never_counted() -> None:
+    client = TestClient(create_app(instrumented=False))
+    put_selection(client, "alice", "  ")
+    put_selection(client, "alice", "gpt-4.1")
+    put_selection(client, "bob", "  ")
+
+    stats = client.get("/state/selections/stats").json()
+
+    assert stats["enabled"] == 1
+    assert stats["models"] == [{"model": "gpt-4.1", "users": 1}]
+
+
+def test_expiring_blank_model_keeps_counts(memory_store: store.InMemoryStore) -> None:
+    memory_store.put_selection(selection("alice", "", 1000.0), 1000.0)
+    memory_store.put_selection(selection("bob", "gpt-4.1", 2000.0), 2000.0)
+
+    assert memory_store.expire_selections(1500.0, 10) == 1
+    assert (memory_store.enabled_selections, memory_store.model_counts) == (1, {"gpt-4.1": 1})
+
+
+@pytest.mark.anyio
+async def test_redis_counts_match_memory(redis_client: Any) -> None:
+    for backend in (None, redis_client):
+        store.redis_client = backend
+        await store.upsert_selection(selection("alice", "", 1000.0), 1000.0)
+        await store.upsert_selection(selection("alice", "gpt-4.1", 2000.0), 2000.0)
+        await store.upsert_selection(selection("bob", "o3", 3000.0, enabled=False), 3000.0)
+    store.redis_client = None
+    memory = await store.selection_stats(10)
+    store.redis_client = redis_client
+
+    assert await store.selection_stats(10) == memory
+    assert memory["enabled"] == 1
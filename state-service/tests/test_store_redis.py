@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+from typing import Any
+
+import pytest
+
+from state_service import store
+from state_service.config import SELECTIONS_INDEX_KEY, USERS_KEY, selection_key
+from state_service.utils import epoch_to_iso
+
+pytestmark = pytest.mark.anyio
+
+
+def selection(user_id: str, model: str | None, score: float, enabled: bool = True) -> dict[str, Any]:
+    return {"user_id": user_id, "enabled": enabled, "selected_model": model, "updated_at": epoch_to_iso(score)}
+
+
+async def test_upsert_writes_blob_membership_and_index(redis_client: Any) -> None:
+    value = selection("alice", "gpt-4.1", 1000.0)
+    await store.upsert_selection(value, 1000.0)
+
+    assert await redis_client.sismember(USERS_KEY, "alice")
+    assert await redis_client.zscore(SELECTIONS_INDEX_KEY, "alice") == 1000.0
+    assert await redis_client.get(selection_key("alice")) is not None
+    assert await store.read_selection("alice") == value
+
+
+async def test_upsert_moves_user_to_new_score(redis_client: Any) -> None:
+    await store.upsert_selection(selection("alice", "gpt-4.1", 1000.0), 1000.0)
+    await store.upsert_selection(selection("alice", "o3", 2000.0), 2000.0)
+
+    assert await redis_client.zrange(SELECTIONS_INDEX_KEY, 0, -1, withscores=True) == [("alice", 2000.0)]
+    assert await redis_client.smembers(USERS_KEY) == {"alice"}
+    assert (await store.read_selection("alice") or {})["selected_model"] == "o3"
+
+
+async def test_batch_upsert_is_one_script_call(redis_client: Any, monkeypatch: pytest.MonkeyPatch) -> None:
+    commands: list[str] = []
+    execute_command = redis_client.execute_command
+
+    async def record(*args: Any, **options: Any) -> Any:
+        commands.append(args[0])
+        return await execute_command(*args, **options)
+
+    await store.load_scripts()
+    monkeypatch.setattr(redis_client, "execute_command", record)
+    entries = [(selection(f"user{index}", "gpt-4.1", 1000.0 + index), 1000.0 + index) for index in range(5)]
+    await store.upsert_selections(entries)
+
+    assert commands == ["EVALSHA"]
+    assert await redis_client.zcard(SELECTIONS_INDEX_KEY) == 5
+
+
+async def test_load_scripts_caches_every_script(redis_client: Any) -> None:
+    await store.load_scripts()
+
+    shas = [store._script(source).sha for source in (store.UPSERT_SELECTIONS_SCRIPT, store.PUT_CATALOG_SCRIPT)]
+    assert await redis_client.script_exists(*shas) == [True, True]
+
+
+async def test_upsert_publishes_selection_event(redis_client: Any) -> None:
+    pubsub = redis_client.pubsub()
+    await pubsub.subscribe(store.EVENTS_CHANNEL)
+    await pubsub.get_message(timeout=1)
+    await store.upsert_selection(selection("alice", "gpt-4.1", 1000.0), 1000.0)
+
+    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1)
+    await pubsub.aclose()
+    assert message is not None
+    event_id, event_type, _ = message["data"].split(" ", 2)
+    assert (event_id, event_type) == ("1", "selection")
+
+
+async def test_replay_keeps_newer_selection(redis_client: Any) -> None:
+    await store.upsert_selection(selection("alice", "o3", 2000.0), 2000.0)
+
+    applied = await store._redis_upsert_selections([(selection("alice", "gpt-4.1", 1000.0), 1000.0)], only_newer=True)
+
+    assert applied == 0
+    assert (await store.read_selection("alice") or {})["selected_model"] == "o3"
+    assert await redis_client.zscore(SELECTIONS_INDEX_KEY, "alice") == 2000.0
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import time
+from typing import Any
+
+import pytest
+from fastapi.testclient import TestClient
+
+from state_service import store, usage
+from state_service.config import USAGE_BUCKET_SECONDS, USAGE_CLOCK_SKEW_SECONDS, USAGE_LINE_MAX_BYTES
+from state_service.main import create_app
+from state_service.schemas import UsageEvent
+
+
+def event(timestamp: float, request_id: str = "r1") -> UsageEvent:
+    return UsageEvent.model_validate(
+        {"request_id": request_id, "user": "alice", "model": "gpt-4.1", "prompt_tokens": 1, "timestamp": timestamp}
+    )
+
+
+def test_future_events_are_rejected_beyond_the_clock_skew() -> None:
+    now = time.time()
+
+    with pytest.raises(ValueError, match="in the future"):
+        usage.to_record(event(now + USAGE_CLOCK_SKEW_SECONDS + 60), now)
+
+
+def test_slightly_future_events_count_at_receipt_time() -> None:
+    now = time.time()
+
+    record = usage.to_record(event(now + USAGE_CLOCK_SKEW_SECONDS / 2), now)
+
+    assert record[1] == usage.bucket_start(now)
+
+
+def ingest(client: TestClient, body: bytes) -> tuple[int, dict[str, Any]]:
+    response = client.post(
+        "/state/usage:ingest", content=body, headers={"Content-Type": "application/x-ndjson"}
+    )
+    return response.status_code, response.json()
+
+
+def test_ndjson_line_over_the_limit_is_refused() -> None:
+    client = TestClient(create_app(instrumented=False))
+    line = b'{"user": "alice", "model": "gpt-4.1", "prompt_tokens": 1}\n'
+
+    status, body = ingest(client, line + b"x" * (USAGE_LINE_MAX_BYTES + 1))
+
+    assert status == 413
+    assert str(USAGE_LINE_MAX_BYTES) in body["detail"]
+    assert ingest(client, line * 3)[1]["counted"] == 3
+
+
+def test_ndjson_future_event_is_reported_by_index() -> None:
+    client = TestClient(create_app(instrumented=False))
+    future = time.time() + USAGE_CLOCK_SKEW_SECONDS + 60
+    body = b'{"user": "alice", "model": "o3"}\n{"user": "alice", "model": "o3", "timestamp": %d}\n' % future
+
+    status, report = ingest(client, body)
+
+    assert status == 200
+    assert (report["counted"], report["rejections"]) == (1, [{"index": 1, "error": "event is in the future"}])
+
+
+def test_memory_usage_is_pruned_once_per_bucket(
+    memory_store: store.InMemoryStore, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now)
+    record = usage.to_record(event(now), now)
+    memory_store.add_usage([record], 60)
+    seen = memory_store.usage_seen
+
+    monkeypatch.setattr(time, "time", lambda: now + 61)
+    assert memory_store.add_usage([record], 60) == 1
+    assert memory_store.usage_seen is seen and memory_store.usage
+
+    monkeypatch.setattr(time, "time", lambda: now + USAGE_BUCKET_SECONDS)
+    memory_store.add_usage([], 60)
+    assert (memory_store.usage_seen, memory_store.usage) == ({}, {})